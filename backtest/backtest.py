@@ -0,0 +1,270 @@
+# Offline backtest of the Bollinger + TradingView signal strategy. Stored candles (or a synthetic
+# random walk) are replayed through the same buy rule as make_investment_decision() and the same
+# stop limit exit as place_sell_orders(), for a whole grid of (idle hours, target margin, band
+# width) combinations. Every candle of the replayed interval counts as one bot run: the candle
+# close is the current value, the lower band is computed from the 19 previous daily closes plus
+# the current value (like the in-progress DAILY candle of the live bot) and a sell order is
+# filled at its target price by the first later candle whose high reaches it.
+#
+# All products and combinations of a chunk are simulated together with numpy; the chunks are
+# spread over a process pool. No network access is needed.
+#
+# Usage (from the root of the project):
+#   python backtest/backtest.py --synthetic 20
+#   BOT_DATA_PATH=/tmp/bot-data python backtest/backtest.py --products BTC-EUR,ETH-EUR --interval DAILY
+#   python backtest/backtest.py --synthetic 20 --signals signals.csv --idle-hours 0:168:6 --margins 1:30:1
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'investment-bot'))
+import main
+
+INTERVAL_SECONDS = {'1MIN': 60, '15MIN': 900, '60MIN': 3600, 'DAILY': 86400}
+BOLLINGER_PERIODS = 20
+RESULT_COLUMNS = ['idle_hours', 'margin', 'band_width', 'buys', 'sells', 'open', 'realized_profit',
+    'unrealized_profit', 'total_profit', 'avg_hold_hours']
+
+# Market data of the worker process (set once per worker by the pool initializer)
+MARKET = {}
+
+
+def parse_values(text):
+    # "12,24,48" is taken as is, "start:stop:step" includes stop
+    if ':' in text:
+        start, stop, step = (float(value) for value in text.split(':'))
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(value) for value in text.split(',')])
+
+
+def load_stored_candles(product_ids, interval):
+    series = []
+    for product_id in product_ids:
+        stored = main.candle_store_load(product_id, interval)
+        if stored is None or len(stored['time']) == 0:
+            raise SystemExit(f'No stored {interval} candles for {product_id} in BOT_DATA_PATH')
+        # The lower band needs the closes of BOLLINGER_PERIODS days, else no candle could be bought
+        stored_days = len(np.unique(np.asarray(stored['time'], dtype=np.int64) // 86400))
+        if stored_days < BOLLINGER_PERIODS:
+            raise SystemExit(f'The stored {interval} candles of {product_id} cover {stored_days} days, but the Bollinger '
+                f'bands need at least {BOLLINGER_PERIODS}; use --interval DAILY or let the bot store more history '
+                f'(CANDLE_STORE_RETENTION_DAYS, e.g. \'{{"{interval}": 30}}\')')
+        series.append(stored)
+    return series
+
+
+def make_synthetic_candles(products, candles, seconds, seed):
+    random = np.random.default_rng(seed)
+    end_time = int(time.time()) // seconds * seconds
+    series = []
+    for _ in range(products):
+        close = 100 * np.exp(np.cumsum(random.normal(0, 0.004 * np.sqrt(seconds / 3600), candles)))
+        high = close * (1 + np.abs(random.normal(0, 0.003 * np.sqrt(seconds / 3600), candles)))
+        series.append({'time': end_time - seconds * np.arange(candles)[::-1], 'close': close, 'high': high})
+    return series
+
+
+def align_candles(series):
+    # One row per product on the union of all candle times; missing candles are NaN
+    times = np.unique(np.concatenate([np.asarray(candles['time'], dtype=np.int64) for candles in series]))
+    close = np.full((len(series), len(times)), np.nan)
+    high = np.full((len(series), len(times)), np.nan)
+    for row, candles in enumerate(series):
+        positions = np.searchsorted(times, np.asarray(candles['time'], dtype=np.int64))
+        close[row, positions] = candles['close']
+        high[row, positions] = candles['high']
+    return times, close, high
+
+
+def load_signals(path, product_ids, times):
+    # CSV with the columns time (epoch seconds), product_id and recommendation as recorded from
+    # get_trading_view_signals(). A recommendation holds until the next one of the same product.
+    import pandas as pd
+    df_signals = pd.read_csv(path).sort_values('time', kind='mergesort')
+    buy_recommended = np.zeros((len(product_ids), len(times)), dtype=bool)
+    for row, product_id in enumerate(product_ids):
+        df_product = df_signals[df_signals['product_id'] == product_id]
+        positions = np.searchsorted(df_product['time'].to_numpy(), times, side='right') - 1
+        recommended = main.is_buy_recommendation(df_product['recommendation'].to_numpy())
+        buy_recommended[row] = (positions >= 0) & recommended[np.maximum(positions, 0)] if len(df_product) else False
+    return buy_recommended
+
+
+def get_live_bollinger_inputs(times, close):
+    # SMA20 and standard deviation as seen by the live bot at every candle: the 19 previous daily
+    # closes plus the current value as close of the in-progress day
+    days = times // 86400
+    day_starts = np.r_[True, days[1:] != days[:-1]]
+    day_index = np.cumsum(day_starts) - 1
+    day_last_positions = np.r_[np.flatnonzero(day_starts)[1:] - 1, len(times) - 1]
+    daily_close = close[:, day_last_positions]
+    previous_periods = BOLLINGER_PERIODS - 1
+    daily_sum = main.get_rolling_matrix(daily_close, previous_periods, np.sum)
+    daily_sumsq = main.get_rolling_matrix(daily_close * daily_close, previous_periods, np.sum)
+    previous_sum = np.full(close.shape, np.nan)
+    previous_sumsq = np.full(close.shape, np.nan)
+    previous_day = day_index - 1
+    has_previous_day = previous_day >= 0
+    previous_sum[:, has_previous_day] = daily_sum[:, previous_day[has_previous_day]]
+    previous_sumsq[:, has_previous_day] = daily_sumsq[:, previous_day[has_previous_day]]
+    sma = (previous_sum + close) / BOLLINGER_PERIODS
+    variance = (previous_sumsq + close * close - BOLLINGER_PERIODS * sma * sma) / (BOLLINGER_PERIODS - 1)
+    return sma, np.sqrt(np.maximum(variance, 0))
+
+
+def prepare_market(times, close, high, buy_recommended):
+    sma, std = get_live_bollinger_inputs(times, close)
+    # Sparse table of the highest high per power-of-two block for the exit search
+    high_table = [np.where(np.isnan(high), -np.inf, high)]
+    while 2 ** len(high_table) <= high.shape[1]:
+        previous, width = high_table[-1], 2 ** (len(high_table) - 1)
+        high_table.append(np.maximum(previous[:, :-width], previous[:, width:]))
+    last_positions = high.shape[1] - 1 - np.argmax(~np.isnan(close[:, ::-1]), axis=1)
+    return {'times': times, 'close': close, 'buy_recommended': buy_recommended, 'sma': sma, 'std': std,
+        'high_table': high_table, 'last_close': close[np.arange(close.shape[0]), last_positions]}
+
+
+def get_exit_positions(market, products, positions, targets):
+    # First candle after each buy whose high reaches the target price (-1 if none). Blocks of
+    # candles that stay below the target are skipped from the largest to the smallest block.
+    high_table = market['high_table']
+    candle_count = high_table[0].shape[1]
+    search = positions + 1
+    for level in range(len(high_table) - 1, -1, -1):
+        width = 2 ** level
+        can_skip = search + width <= candle_count
+        block_high = np.full(len(search), np.inf)
+        block_high[can_skip] = high_table[level][products[can_skip], search[can_skip]]
+        search = np.where(block_high < targets, search + width, search)
+    found = search < candle_count
+    found[found] = high_table[0][products[found], search[found]] >= targets[found]
+    return np.where(found, search, -1)
+
+
+def simulate(market, combinations, invest, fee_rate):
+    # Returns one result row per (idle_hours, margin, band_width) combination
+    times, close = market['times'], market['close']
+    results = np.zeros((len(combinations), len(RESULT_COLUMNS)))
+    results[:, :3] = combinations
+    for band_width in np.unique(combinations[:, 2]):
+        rows = np.flatnonzero(combinations[:, 2] == band_width)
+        idle_hours = combinations[rows, 0][:, None]
+        bb_low, _ = main.get_bollinger_bands(market['sma'], market['std'], band_width)
+        # The idle hours only matter at candles where the other buy conditions are met
+        candidates = main.get_buy_decisions(close, bb_low, market['buy_recommended'], np.inf, 0)
+        last_buy_times = np.full((len(rows), close.shape[0]), -np.inf)
+        buy_rows, buy_products, buy_positions = [], [], []
+        for position in np.flatnonzero(candidates.any(axis=0)):
+            hours_since_last_buy = (times[position] - last_buy_times) / 3600
+            buys = main.get_buy_decisions(close[:, position], bb_low[:, position], candidates[:, position],
+                hours_since_last_buy, idle_hours)
+            last_buy_times[buys] = times[position]
+            combination_rows, products = np.nonzero(buys)
+            buy_rows.append(rows[combination_rows])
+            buy_products.append(products)
+            buy_positions.append(np.full(len(products), position))
+        if not buy_rows:
+            continue
+        buy_rows = np.concatenate(buy_rows)
+        buy_products = np.concatenate(buy_products)
+        buy_positions = np.concatenate(buy_positions)
+        buy_prices = close[buy_products, buy_positions]
+        targets = main.get_sell_target_prices(buy_prices, combinations[buy_rows, 1])
+        exits = get_exit_positions(market, buy_products, buy_positions, targets)
+        sold = exits >= 0
+        cost = invest * (1 + fee_rate)
+        realized = np.where(sold, invest * targets / buy_prices * (1 - fee_rate) - cost, 0)
+        unrealized = np.where(sold, 0, invest * market['last_close'][buy_products] / buy_prices * (1 - fee_rate) - cost)
+        hold_hours = np.where(sold, (times[exits] - times[buy_positions]) / 3600, 0)
+        combination_count = len(combinations)
+        results[:, 3] += np.bincount(buy_rows, minlength=combination_count)
+        results[:, 4] += np.bincount(buy_rows, weights=sold, minlength=combination_count)
+        results[:, 6] += np.bincount(buy_rows, weights=realized, minlength=combination_count)
+        results[:, 7] += np.bincount(buy_rows, weights=unrealized, minlength=combination_count)
+        results[:, 9] += np.bincount(buy_rows, weights=hold_hours, minlength=combination_count)
+    results[:, 5] = results[:, 3] - results[:, 4]
+    results[:, 8] = results[:, 6] + results[:, 7]
+    results[:, 9] = np.divide(results[:, 9], results[:, 4], out=np.zeros(len(results)), where=results[:, 4] > 0)
+    return results
+
+
+def set_market(market):
+    MARKET.update(market)
+
+
+def simulate_chunk(arguments):
+    combinations, invest, fee_rate = arguments
+    return simulate(MARKET, combinations, invest, fee_rate)
+
+
+def sweep(market, combinations, invest, fee_rate, workers):
+    # Chunks are sorted by band width so most chunks only need one band width
+    combinations = combinations[np.lexsort((combinations[:, 0], combinations[:, 1], combinations[:, 2]))]
+    chunks = np.array_split(combinations, max(1, min(len(combinations), workers * 4)))
+    if workers <= 1:
+        return np.concatenate([simulate(market, chunk, invest, fee_rate) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_market, initargs=(market,)) as executor:
+        return np.concatenate(list(executor.map(simulate_chunk, [(chunk, invest, fee_rate) for chunk in chunks])))
+
+
+def run():
+    parser = argparse.ArgumentParser(description='Offline parameter sweep of the Bollinger + signal strategy')
+    parser.add_argument('--products', help='comma separated product ids with candles stored in BOT_DATA_PATH')
+    parser.add_argument('--interval', default='60MIN', choices=list(INTERVAL_SECONDS), help='candle interval replayed as bot runs')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of random walk products used instead of stored candles')
+    parser.add_argument('--candles', type=int, default=24 * 180, help='candles per synthetic product')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--signals', help='CSV with recorded signals (time, product_id, recommendation)')
+    parser.add_argument('--signal-probability', type=float, default=1.0, help='chance of a synthetic BUY signal per candle if no signals are given')
+    parser.add_argument('--idle-hours', default='0:168:6')
+    parser.add_argument('--margins', default='1:30:1', help='target margins in percent')
+    parser.add_argument('--band-widths', default='1:3:0.25', help='Bollinger band widths in standard deviations')
+    parser.add_argument('--invest', type=float, default=float(os.environ.get('BOT_ONE_INVEST_EUR') or 100))
+    parser.add_argument('--fee-rate', type=float, default=0.006, help='Coinbase fee rate per buy and sell')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--top', type=int, default=20, help='number of best combinations printed')
+    parser.add_argument('--output', help='CSV file for the results of all combinations')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic:
+        product_ids = [f'S{product:03d}-EUR' for product in range(args.synthetic)]
+        series = make_synthetic_candles(args.synthetic, args.candles, INTERVAL_SECONDS[args.interval], args.seed)
+    else:
+        if not args.products:
+            parser.error('either --products (with BOT_DATA_PATH) or --synthetic is required')
+        if not os.environ.get('BOT_DATA_PATH'):
+            parser.error('--products replays the candles stored in BOT_DATA_PATH, but BOT_DATA_PATH is not set')
+        product_ids = args.products.split(',')
+        series = load_stored_candles(product_ids, args.interval)
+    times, close, high = align_candles(series)
+    if args.signals:
+        buy_recommended = load_signals(args.signals, product_ids, times)
+    else:
+        buy_recommended = np.random.default_rng(args.seed).random(close.shape) < args.signal_probability
+    market = prepare_market(times, close, high, buy_recommended)
+    combinations = np.array(np.meshgrid(parse_values(args.idle_hours), parse_values(args.margins),
+        parse_values(args.band_widths), indexing='ij')).reshape(3, -1).T
+    prepare_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = sweep(market, combinations, args.invest, args.fee_rate, args.workers)
+    sweep_seconds = time.perf_counter() - start
+
+    print(f'{len(product_ids)} products x {close.shape[1]} candles ({args.interval}), {len(combinations)} combinations, '
+        f'{args.workers} workers: data {prepare_seconds:.2f}s, sweep {sweep_seconds:.2f}s')
+    header = ''.join(f'{column:>18}' for column in RESULT_COLUMNS)
+    print(header)
+    for row in results[np.argsort(-results[:, 8], kind='mergesort')[:args.top]]:
+        print(''.join(f'{value:>18.2f}' for value in row))
+    if args.output:
+        np.savetxt(args.output, results, delimiter=',', header=','.join(RESULT_COLUMNS), comments='', fmt='%.6f')
+
+
+if __name__ == '__main__':
+    run()
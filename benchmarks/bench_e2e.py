@@ -0,0 +1,183 @@
+# End-to-end benchmark of investment_bot() against the local stand-ins of standin.py (Coinbase,
+# TradingView and an in-memory Firestore). Every watchlist size runs in its own Python process:
+# a cold run (fresh instance) followed by a warm run (same instance, like a warm Cloud Function).
+# For both runs the wall time and the API calls per endpoint are reported, plus the peak memory
+# (max RSS) of the process and the Coinbase connections opened and reused (keep-alive). The results are compared with a stored baseline; more API calls than
+# in the baseline or a wall time / memory above the tolerance are flagged as regression and the
+# script exits with status 1. With --strategies N, N strategies (BOT_STRATEGIES) with the same
+# watchlist but different target margins run on the shared market data; their results are stored
+# separately in the baseline.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_e2e.py [--sizes 5,50,200] [--latency-ms 20] [--strategies 1] [--update-baseline]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIRECTORY, 'baseline_e2e.json')
+RESULT_MARKER = 'BENCH_E2E_RESULT '
+
+
+def get_counter_difference(before, after):
+    return {endpoint: count - before.get(endpoint, 0) for endpoint, count in sorted(after.items()) if count - before.get(endpoint, 0)}
+
+
+def get_transport_totals(transport_stats):
+    return {name: sum(host_stats[name] for host_stats in transport_stats.values()) for name in ['connections', 'reused']}
+
+
+def get_strategy_environment(currencies, strategy_count):
+    names = ['BOT_ONE'] + [f'BOT_{number}' for number in range(2, strategy_count + 1)]
+    environment = {'BOT_STRATEGIES': json.dumps(names)}
+    for number, name in enumerate(names):
+        environment.update({f'{name}_CRYPTO_CURRENCIES': json.dumps(currencies),
+            f'{name}_INVEST_EUR': '10',
+            f'{name}_IDLE_HOURS_BEFORE_NEXT_PURCHASE': '24',
+            f'{name}_TARGET_MARGIN_PERCENTAGE': str(5 + number)})
+    return environment
+
+
+def get_baseline_key(size, strategy_count):
+    return str(size) if strategy_count == 1 else f'{size}x{strategy_count}'
+
+
+def run_one(size, strategy_count):
+    # Runs in the child process; the stand-in server URLs are passed via the environment
+    import resource
+    import requests
+    sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot'))
+    import main
+    import standin
+    currencies = [f'C{i:03d}' for i in range(size)]
+    os.environ.update({'QUOTE_CURRENCY': 'EUR',
+        'TRADING_VIEW_SYMBOLS': json.dumps([[currency, 'COINBASE', currency + 'EUR'] for currency in currencies]),
+        'API_KEY': 'standin',
+        'API_SECRET': 'standin'})
+    os.environ.update(get_strategy_environment(currencies, strategy_count))
+    firestore = standin.FakeFirestore()
+    main.FIRESTORE['client'] = firestore
+    counters_url = os.environ['STANDIN_URL'] + '/_standin'
+    runs = {}
+    for run_name in ['cold', 'warm']:
+        # The TradingView signals are cached until the next minute; they are always requested
+        # again so the call counts do not depend on when the warm run starts
+        main.TRADING_VIEW_CACHE['expires_at'] = 0
+        calls_before = requests.get(counters_url).json()['calls']
+        firestore_before = dict(firestore.stats)
+        transport_before = get_transport_totals(main.cb_get_transport_stats())
+        start = time.perf_counter()
+        main.investment_bot(None)
+        wall_seconds = time.perf_counter() - start
+        runs[run_name] = {'wall_seconds': round(wall_seconds, 3),
+            'calls': get_counter_difference(calls_before, requests.get(counters_url).json()['calls']),
+            'firestore': get_counter_difference(firestore_before, dict(firestore.stats)),
+            'transport': get_counter_difference(transport_before, get_transport_totals(main.cb_get_transport_stats()))}
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(RESULT_MARKER + json.dumps({'size': size, 'strategies': strategy_count, 'runs': runs, 'peak_rss_mb': round(peak_rss_mb, 1)}))
+
+
+def run_size(server, size, strategy_count, environment):
+    server.market.__init__([f'C{i:03d}' for i in range(size)])
+    server.reset_counters()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-one', str(size), '--strategies', str(strategy_count)],
+        env=dict(os.environ, **environment), capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            result['throttled'] = server.get_counters()['throttled']
+            return result
+    raise SystemExit(f'Benchmark run with {size} currencies failed:\n{completed.stdout[-2000:]}\n{completed.stderr[-4000:]}')
+
+
+def find_regressions(result, baseline, time_tolerance, memory_tolerance):
+    regressions = []
+    for run_name, run in result['runs'].items():
+        baseline_run = baseline['runs'].get(run_name)
+        if baseline_run is None:
+            continue
+        if run['wall_seconds'] > baseline_run['wall_seconds'] * (1 + time_tolerance):
+            regressions.append(f'{run_name} wall time {run["wall_seconds"]:.3f}s > baseline {baseline_run["wall_seconds"]:.3f}s')
+        for group in ['calls', 'firestore']:
+            for endpoint, count in run[group].items():
+                if count > baseline_run[group].get(endpoint, 0):
+                    regressions.append(f'{run_name} {group} {endpoint}: {count} > baseline {baseline_run[group].get(endpoint, 0)}')
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + memory_tolerance):
+        regressions.append(f'peak memory {result["peak_rss_mb"]}MB > baseline {baseline["peak_rss_mb"]}MB')
+    return regressions
+
+
+def run():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of investment_bot() against local stand-ins')
+    parser.add_argument('--sizes', default='5,50,200', help='comma separated watchlist sizes')
+    parser.add_argument('--latency-ms', type=float, default=20, help='latency of every stand-in response')
+    parser.add_argument('--strategies', type=int, default=1, help='number of strategies sharing the watchlist')
+    parser.add_argument('--rate-limit', type=float, default=0, help='stand-in requests per second per endpoint class (0 = unlimited)')
+    parser.add_argument('--bot-rate-limit', type=float,
+        help='CB_PUBLIC_RATE_LIMIT and CB_PRIVATE_RATE_LIMIT of the bot (default: --rate-limit, else 1000)')
+    parser.add_argument('--data-path', help='folder for BOT_DATA_PATH (one fresh subfolder per size); not set by default')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as new baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='allowed relative wall time increase')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='allowed relative peak memory increase')
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_one is not None:
+        return run_one(args.run_one, args.strategies)
+
+    sys.path.insert(0, BENCHMARK_DIRECTORY)
+    import standin
+    rate_limits = {'public': args.rate_limit, 'private': args.rate_limit, 'tradingview': args.rate_limit}
+    server = standin.StandInServer(standin.StandInMarket([]), latency=args.latency_ms / 1000, rate_limits=rate_limits).start()
+    bot_rate_limit = str(args.bot_rate_limit or args.rate_limit or 1000)
+    environment = dict(server.environment(), STANDIN_URL=server.url,
+        CB_PUBLIC_RATE_LIMIT=bot_rate_limit, CB_PRIVATE_RATE_LIMIT=bot_rate_limit)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    results = {}
+    regressions = []
+    print(f'{"size":>5} {"run":>5} {"wall (s)":>9} {"peak MB":>8}  calls per endpoint')
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            if args.data_path:
+                environment['BOT_DATA_PATH'] = os.path.join(args.data_path, f'{size}-{int(time.time())}')
+                os.makedirs(environment['BOT_DATA_PATH'])
+            result = run_size(server, size, args.strategies, environment)
+            baseline_key = get_baseline_key(size, args.strategies)
+            results[baseline_key] = result
+            for run_name, run in result['runs'].items():
+                calls = ', '.join(f'{endpoint}={count}' for endpoint, count in run['calls'].items())
+                firestore = ', '.join(f'{operation}={count}' for operation, count in run['firestore'].items())
+                transport = ', '.join(f'{name}={count}' for name, count in run.get('transport', {}).items())
+                print(f'{size:>5} {run_name:>5} {run["wall_seconds"]:>9.3f} {result["peak_rss_mb"]:>8.1f}  {calls}; firestore: {firestore or "-"}; '
+                    f'coinbase connections: {transport or "-"}')
+            if result['throttled']:
+                print(f'{"":>5} {"":>5} rejected with 429 by the stand-in: ' + ', '.join(f'{endpoint}={count}' for endpoint, count in result['throttled'].items()))
+            if baseline_key in baseline and not args.update_baseline:
+                regressions.extend(f'{size} currencies: {regression}'
+                    for regression in find_regressions(result, baseline[baseline_key], args.time_tolerance, args.memory_tolerance))
+    finally:
+        server.stop()
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f'Baseline written to {args.baseline}')
+    elif regressions:
+        print('Regressions against the baseline:')
+        for regression in regressions:
+            print(f'- {regression}')
+        sys.exit(1)
+    elif baseline:
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,54 @@
+# Benchmark for the concurrent per-currency market data fan-out in cb_get_24h_data and
+# cb_get_enhanced_history. The Coinbase public API is replaced by an in-process stand-in
+# that answers every request after a fixed latency, so no network access is needed.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_fanout.py [latency_ms]
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'investment-bot'))
+import main
+
+WATCHLIST_SIZES = [5, 10, 25, 50, 100]
+CONCURRENCY_LIMITS = ['1', '8', '100']
+
+
+class StandInResponse:
+    def __init__(self, payload):
+        self.text = json.dumps(payload)
+
+
+def make_stand_in_connect(latency):
+    def stand_in_connect(url, *args, **kwargs):
+        time.sleep(latency)
+        if url.endswith('/time'):
+            return StandInResponse({'iso': '2026-10-17T10:00:00.000Z', 'epoch': 1792231200.0})
+        if url.endswith('/stats'):
+            return StandInResponse({'open': '100', 'high': '110', 'low': '90', 'last': '105', 'volume': '1000'})
+        candles = [[1792195200 - day * 86400, 90.0, 110.0, 100.0, 105.0 + day % 7, 1000.0] for day in range(90)]
+        return StandInResponse(candles)
+    return stand_in_connect
+
+
+def run(latency):
+    main.cb_pub_connect = make_stand_in_connect(latency)
+    print(f'{"products":>8} {"limit":>6} {"24h stats (s)":>14} {"history (s)":>12}')
+    for limit in CONCURRENCY_LIMITS:
+        os.environ['CB_MAX_CONCURRENT_REQUESTS'] = limit
+        for size in WATCHLIST_SIZES:
+            currencies = [f'C{i:03d}' for i in range(size)]
+            start = time.perf_counter()
+            main.cb_get_24h_data('EUR', currencies)
+            stats_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            main.cb_get_enhanced_history('EUR', currencies)
+            history_seconds = time.perf_counter() - start
+            print(f'{size:>8} {limit:>6} {stats_seconds:>14.3f} {history_seconds:>12.3f}')
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05)
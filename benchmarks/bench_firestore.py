@@ -0,0 +1,67 @@
+# Check for the collected Firestore writes of fire_start_batch() / fire_commit_batch() in both
+# FIRESTORE_WRITE_MODE settings (batch and transaction) against the in-memory Firestore of
+# standin.py. Order records are created and updated while the batch is open (like the buy and
+# sell phases of a run) and the script checks that every document ends up with its merged data,
+# that the records are written with one commit per 500 documents without falling back to single
+# writes, and that the run summary reports the round trips saved. A failed check raises an
+# AssertionError.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_firestore.py [records]
+
+import contextlib
+import importlib
+import os
+import sys
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot'))
+import standin
+import main
+
+
+def run_mode(write_mode, record_count):
+    os.environ['FIRESTORE_WRITE_MODE'] = write_mode
+    firestore = standin.FakeFirestore()
+    main.FIRESTORE['client'] = firestore
+    main.metrics_start_run()
+    start = time.perf_counter()
+    main.fire_start_batch()
+    for number in range(record_count):
+        main.fire_create_order_record(f'order-{number:05d}', {'buy_order_id': f'order-{number:05d}', 'strategy': 'BOT_ONE', 'sell_order_id': ''})
+    for number in range(0, record_count, 2):
+        main.fire_create_order_record(f'order-{number:05d}', {'sell_order_id': f'sell-{number:05d}'})
+    error = main.fire_commit_batch()
+    seconds = time.perf_counter() - start
+    summary = main.metrics_get_summary()
+    assert error is None, f'{write_mode}: {error!r}'
+    documents = firestore.collection('coinbase-orders').documents
+    assert len(documents) == record_count, f'{write_mode}: {len(documents)} documents'
+    for number in range(record_count):
+        expected = {'buy_order_id': f'order-{number:05d}', 'strategy': 'BOT_ONE', 'sell_order_id': f'sell-{number:05d}' if number % 2 == 0 else ''}
+        assert documents[f'order-{number:05d}'] == expected, f'{write_mode}: order-{number:05d}'
+    commits = -(-record_count // main.FIRESTORE_MAX_BATCH_SIZE)
+    assert firestore.stats['commits'] == commits and firestore.stats['writes'] == record_count, f'{write_mode}: {dict(firestore.stats)}'
+    firestore_stats = summary['stats']['firestore']
+    assert firestore_stats['commits'] == commits, f'{write_mode}: {firestore_stats}'
+    assert firestore_stats['round_trips_saved'] == firestore_stats['records'] - commits, f'{write_mode}: {firestore_stats}'
+    return seconds, firestore_stats
+
+
+def run(record_count):
+    # Imported by fire_commit_batch(); kept out of the timings
+    importlib.import_module('firebase_admin.firestore')
+    results = []
+    with open(os.devnull, 'w') as log, contextlib.redirect_stdout(log):
+        for write_mode in ['batch', 'transaction']:
+            results.append((write_mode,) + run_mode(write_mode, record_count))
+    print(f'{record_count} order records, {record_count // 2 + record_count % 2} of them updated while the batch was open')
+    for write_mode, seconds, firestore_stats in results:
+        print(f'{write_mode:<12} {seconds:8.3f}s  ' + ', '.join(f'{name}={value}' for name, value in sorted(firestore_stats.items())))
+    print('Both write modes wrote all records')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1200)
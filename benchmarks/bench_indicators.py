@@ -0,0 +1,83 @@
+# Benchmark for the indicator step of cb_get_enhanced_history. It compares add_indicators(),
+# which computes all currencies and granularities in one pass, with the former loop that
+# queried, copied and sorted every (currency, granularity) pair on its own. Both results are
+# compared column by column before the timings are printed.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_indicators.py [products] [candles_per_granularity]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'investment-bot'))
+import main
+
+GRANULARITIES = {'DAILY': 86400, '60MIN': 3600, '15MIN': 900, '1MIN': 60}
+INDICATORS = ['BOLLINGER', 'EMA', 'MACD', 'ATR']
+
+
+def make_history(products, candles):
+    random = np.random.default_rng(42)
+    frames = []
+    for product in range(products):
+        for granularity, seconds in GRANULARITIES.items():
+            close = 100 * np.exp(np.cumsum(random.normal(0, 0.01, candles)))
+            frames.append(pd.DataFrame({
+                'time': 1792195200 - seconds * np.arange(candles),
+                'low': close * 0.98, 'high': close * 1.02, 'open': close * 0.99, 'close': close,
+                'volume': random.uniform(10, 1000, candles),
+                'base_currency': f'C{product:03d}', 'granularity': granularity}))
+    df_history = pd.concat(frames, ignore_index=True)
+    df_history['date'] = pd.to_datetime(df_history['time'], unit='s')
+    return df_history
+
+
+def legacy_indicator_loop(df_history):
+    AVERAGE_TRUE_RANGE_PERIODS = 14
+    currency_history_rows_enhanced = []
+    for currency in df_history['base_currency'].unique():
+        for granularity in GRANULARITIES:
+            df_history_currency = df_history.query('granularity == @granularity & base_currency == @currency').copy()
+            df_history_currency = df_history_currency.sort_values(['date'], ascending=True)
+            df_history_currency['SMA20'] = df_history_currency['close'].rolling(window=20).mean()
+            df_history_currency['SMA20_std'] = df_history_currency['close'].rolling(window=20).std()
+            df_history_currency['bb_low'] = df_history_currency['SMA20'] - 2 * df_history_currency['SMA20_std']
+            df_history_currency['bb_up'] = df_history_currency['SMA20'] + 2 * df_history_currency['SMA20_std']
+            df_history_currency['EMA12'] = df_history_currency['close'].ewm(span=12, adjust=False).mean()
+            df_history_currency['EMA26'] = df_history_currency['close'].ewm(span=26, adjust=False).mean()
+            df_history_currency['MACD'] = df_history_currency['EMA12'] - df_history_currency['EMA26']
+            df_history_currency['MACD_signal'] = df_history_currency['MACD'].ewm(span=9, adjust=False).mean()
+            df_history_currency['macd_histogram'] = df_history_currency['MACD'] - df_history_currency['MACD_signal']
+            df_history_currency['bull_bear'] = np.where(df_history_currency['macd_histogram'] < 0, 'Bear', 'Bull')
+            df_history_currency['high_low_diff'] = df_history_currency['high'] - df_history_currency['low']
+            df_history_currency['high_prev_close_abs'] = np.abs(df_history_currency['high'] - df_history_currency['close'].shift())
+            df_history_currency['low_prev_close_abs'] = np.abs(df_history_currency['low'] - df_history_currency['close'].shift())
+            df_history_currency['true_range'] = df_history_currency[['high_low_diff', 'high_prev_close_abs', 'low_prev_close_abs']].max(axis=1)
+            df_history_currency['average_true_range'] = df_history_currency['true_range'].ewm(alpha=1/AVERAGE_TRUE_RANGE_PERIODS, min_periods=AVERAGE_TRUE_RANGE_PERIODS, adjust=False).mean()
+            currency_history_rows_enhanced.append(df_history_currency)
+    df_history_enhanced = pd.concat(currency_history_rows_enhanced, ignore_index=True)
+    return df_history_enhanced.sort_values(['base_currency', 'granularity', 'date'], ascending=True)
+
+
+def run(products, candles):
+    df_history = make_history(products, candles)
+    start = time.perf_counter()
+    df_legacy = legacy_indicator_loop(df_history).reset_index(drop=True)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    df_engine = main.add_indicators(df_history, INDICATORS)
+    engine_seconds = time.perf_counter() - start
+    for column in ['SMA20', 'SMA20_std', 'bb_low', 'bb_up', 'EMA12', 'EMA26', 'MACD', 'MACD_signal', 'macd_histogram', 'true_range', 'average_true_range']:
+        np.testing.assert_allclose(df_engine[column], df_legacy[column], rtol=1e-9, equal_nan=True, err_msg=column)
+    assert (df_engine['bull_bear'] == df_legacy['bull_bear']).all()
+    print(f'{products} products x {len(GRANULARITIES)} granularities x {candles} candles, indicators {INDICATORS}')
+    print(f'former loop:     {legacy_seconds:8.3f}s')
+    print(f'add_indicators:  {engine_seconds:8.3f}s ({legacy_seconds / engine_seconds:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100, int(sys.argv[2]) if len(sys.argv) > 2 else 300)
@@ -0,0 +1,165 @@
+# Check and benchmark for cb_get_last_buy_fill_dates() against the local Coinbase stand-in of
+# standin.py. A fills history of several pages is created with products without fills, products
+# with sell fills only, products whose newest buy is not a settled fill and products with buys at
+# different ages. The last buy fill dates and the resulting idle-hours decisions are compared with
+# the former per-product code (one full fills download per product, copied from the original
+# cb_get_last_buy_fill_date, cb_get_aggregated_fills and cb_get_fills), once with the paged
+# download and once served from the fills ledger. The timings and the number of fills requests are
+# printed; a mismatch raises an AssertionError.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_last_fills.py [products] [fills] [latency_ms]
+
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot'))
+import standin
+import main
+
+IDLE_HOURS = [1, 24, 72]
+
+
+def make_market(products, fill_count):
+    # Every fifth product has no fills, every fifth sells only and every fifth has a newest buy
+    # that was reversed; all fills are spread over the last 60 days (oldest first like add_fill)
+    currencies = [f'C{i:03d}' for i in range(products)]
+    market = standin.StandInMarket(currencies, filled_every=0)
+    random.seed(42)
+    now = time.time()
+    product_ids = market.product_ids()
+    fills = []
+    for number in range(fill_count):
+        index = random.randrange(products)
+        if index % 5 == 0:
+            continue
+        side = 'SELL' if index % 5 == 1 else random.choice(['BUY', 'SELL'])
+        fills.append((now - random.uniform(0, 60 * 86400), product_ids[index], side))
+    for index in range(2, products, 5):
+        fills.append((now - random.uniform(0, 3600), product_ids[index], 'BUY'))
+    for epoch, product_id, side in sorted(fills):
+        market.add_fill(product_id, f'order-{len(market.fills) // 3}', side, market.price(product_id, epoch), 10.0, epoch)
+    for fill in market.fills[::-1]:
+        if fill['product_id'] in product_ids[2::5] and fill['side'] == 'BUY':
+            fill['trade_type'] = 'REVERSAL'
+    return market
+
+
+def legacy_get_fills(product_id='', order_id=''):
+    import pandas as pd
+    has_next = True
+    cursor = ''
+    lst_fills = []
+    url_path = '/api/v3/brokerage/orders/historical/fills'
+    try:
+        while has_next:
+            params = {'limit':200, 'cursor':cursor, 'product_id':product_id, 'order_id':order_id}
+            response = main.cb_auth_get_connect(url_path=url_path, param = params)
+            json_fills = json.loads(response.text)
+            tmp_df_fills = pd.json_normalize(json_fills, record_path =['fills'])
+            tmp_lst_fills = tmp_df_fills.values.tolist()
+            lst_fills.extend(tmp_lst_fills)
+            cursor = json_fills['cursor']
+            if cursor == '':
+                has_next = False
+        df_fills = pd.DataFrame(lst_fills)
+        df_fills.columns = tmp_df_fills.columns.values.tolist()
+        return df_fills
+    except:
+        return None
+
+
+def legacy_get_aggregated_fills(product_id='', order_id=''):
+    import pandas as pd
+    df_fills = legacy_get_fills(product_id=product_id, order_id=order_id)
+    try:
+        df_fills['price'] = df_fills['price'].astype(float)
+        df_fills['size'] = df_fills['size'].astype(float)
+        df_fills['commission'] = df_fills['commission'].astype(float)
+        df_fills['total_price'] = df_fills['size'] + df_fills['commission']
+        df_fills['date'] = pd.to_datetime(df_fills['trade_time']).dt.floor('Min')
+        df_fills_agg = df_fills.groupby(['order_id','trade_type','product_id','price','size_in_quote', 'side', 'date'], as_index =False)[['size','commission','total_price']].sum()
+        return df_fills_agg
+    except:
+        return None
+
+
+def legacy_get_last_buy_fill_date(product_id):
+    from datetime import datetime
+    try:
+        df_fills = legacy_get_aggregated_fills(product_id)
+        df_fills = df_fills.sort_values(['date'], ascending=False) #newest to oldest
+        df_fills = df_fills.query('side == \'BUY\' and trade_type == \'FILL\'').head(1)
+        last_fill_date = df_fills['date'].iloc[0]
+        last_fill_date = datetime.fromisoformat(str(last_fill_date)).replace(tzinfo=None)
+        return last_fill_date
+    except:
+        return None
+
+
+def idle_hours_reached(server_time_now, last_buy_fill_date, idle_hours):
+    # Same rule as make_investment_decision()
+    if last_buy_fill_date is None:
+        return True
+    last_fill_delta = ((server_time_now - last_buy_fill_date).days*86400 + (server_time_now - last_buy_fill_date).seconds)/3600
+    return last_fill_delta >= idle_hours
+
+
+def check(name, product_ids, server_time_now, legacy_dates, dates):
+    assert set(dates) == set(product_ids), name
+    for product_id in product_ids:
+        assert dates[product_id] == legacy_dates[product_id], f'{name}: {product_id} {dates[product_id]} != {legacy_dates[product_id]}'
+        for idle_hours in IDLE_HOURS:
+            assert idle_hours_reached(server_time_now, dates[product_id], idle_hours) == \
+                idle_hours_reached(server_time_now, legacy_dates[product_id], idle_hours), f'{name}: {product_id} {idle_hours}h'
+
+
+def run(products, fill_count, latency):
+    market = make_market(products, fill_count)
+    server = standin.StandInServer(market, latency=latency).start()
+    os.environ.update(server.environment())
+    os.environ.update({'API_KEY': 'standin', 'API_SECRET': 'standin'})
+    os.environ.pop('BOT_DATA_PATH', None)
+    product_ids = market.product_ids()
+    try:
+        with open(os.devnull, 'w') as log, contextlib.redirect_stdout(log):
+            server_time_now = main.cb_get_server_time()
+            results = []
+            server.reset_counters()
+            start = time.perf_counter()
+            legacy_dates = {product_id: legacy_get_last_buy_fill_date(product_id) for product_id in product_ids}
+            results.append(('former per-product code', time.perf_counter() - start, server.get_counters()['calls'].get('fills', 0)))
+            assert any(date is None for date in legacy_dates.values()) and any(date is not None for date in legacy_dates.values())
+
+            server.reset_counters()
+            start = time.perf_counter()
+            dates = main.cb_get_last_buy_fill_dates(product_ids)
+            results.append(('paged download', time.perf_counter() - start, server.get_counters()['calls'].get('fills', 0)))
+            check('paged download', product_ids, server_time_now, legacy_dates, dates)
+
+            main.fills_ledger_sync(full_resync=True)
+            server.reset_counters()
+            start = time.perf_counter()
+            dates = main.cb_get_last_buy_fill_dates(product_ids)
+            results.append(('fills ledger', time.perf_counter() - start, server.get_counters()['calls'].get('fills', 0)))
+            check('fills ledger', product_ids, server_time_now, legacy_dates, dates)
+    finally:
+        server.stop()
+    decisions = {idle_hours: sum(idle_hours_reached(server_time_now, date, idle_hours) for date in legacy_dates.values()) for idle_hours in IDLE_HOURS}
+    print(f'{products} products, {len(market.fills)} fills ({-(-len(market.fills) // 200)} pages), latency {latency * 1000:.0f}ms')
+    print('idle hours reached per setting: ' + ', '.join(f'{idle_hours}h: {count}/{products}' for idle_hours, count in decisions.items()))
+    for name, seconds, calls in results:
+        print(f'{name:<24} {seconds:8.3f}s {calls:>5} fills requests')
+    print('Last buy fill dates and idle-hours decisions match the former code')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3000,
+        float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02)
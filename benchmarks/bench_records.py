@@ -0,0 +1,89 @@
+# Memory and time benchmark for the compact fill records. A synthetic fills history is parsed
+# page by page (200 fills per page like the Coinbase response) once the former way (one
+# DataFrame per page via json_normalize, converted to lists and rebuilt into one DataFrame)
+# and once into fill records. Memory is reported as the size of the result (deep size of the
+# DataFrame, array sizes plus category strings for the records) and as the peak traced by
+# tracemalloc while parsing.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_records.py [fills]
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'investment-bot'))
+import main
+
+PAGE_SIZE = 200
+PRODUCTS = ['BTC-EUR', 'ETH-EUR', 'DOGE-EUR', 'AVAX-EUR', 'SOL-EUR', 'LINK-EUR']
+
+
+def make_pages(fill_count):
+    random.seed(42)
+    fills = []
+    order_id = str(uuid.uuid4())
+    for number in range(fill_count):
+        if number % 3 == 0:
+            order_id = str(uuid.uuid4())
+        timestamp = f'2026-{1 + number % 12:02d}-{1 + number % 28:02d}T{number % 24:02d}:{number % 60:02d}:{number % 60:02d}.{number % 1000000:06d}Z'
+        fills.append({'entry_id': str(uuid.uuid4()), 'trade_id': str(uuid.uuid4()), 'order_id': order_id,
+                      'trade_time': timestamp, 'trade_type': 'FILL', 'price': f'{random.uniform(1, 50000):.2f}',
+                      'size': f'{random.uniform(1, 500):.8f}', 'commission': f'{random.uniform(0, 3):.8f}',
+                      'product_id': random.choice(PRODUCTS), 'sequence_timestamp': timestamp,
+                      'liquidity_indicator': 'TAKER', 'size_in_quote': True, 'user_id': 'user',
+                      'side': random.choice(['BUY', 'SELL'])})
+    return [{'fills': fills[start:start + PAGE_SIZE]} for start in range(0, fill_count, PAGE_SIZE)]
+
+
+def parse_dataframes(pages):
+    lst_fills = []
+    for json_fills in pages:
+        tmp_df_fills = pd.json_normalize(json_fills, record_path=['fills'])
+        lst_fills.extend(tmp_df_fills.values.tolist())
+    df_fills = pd.DataFrame(lst_fills)
+    df_fills.columns = tmp_df_fills.columns.values.tolist()
+    return df_fills
+
+
+def parse_records(pages):
+    return main.concat_fill_records([main.fills_to_records(json_fills['fills']) for json_fills in pages])
+
+
+def records_size(records):
+    category_size = sum(sys.getsizeof(value) for values in main.FILL_CATEGORIES['values'].values() for value in values)
+    return sum(values.nbytes for values in records.values()) + category_size
+
+
+def measure(function, pages):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(pages)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run(fill_count):
+    pages = make_pages(fill_count)
+    df_fills, df_seconds, df_peak = measure(parse_dataframes, pages)
+    records, records_seconds, records_peak = measure(parse_records, pages)
+    start = time.perf_counter()
+    df_records = main.fill_records_to_dataframe(records)
+    to_pandas_seconds = time.perf_counter() - start
+    assert len(df_records) == len(df_fills) and (df_records['entry_id'] == df_fills['entry_id']).all()
+    print(f'{fill_count} fills in {len(pages)} pages')
+    print(f'{"format":<16} {"parse (s)":>10} {"result (MB)":>12} {"peak (MB)":>10}')
+    print(f'{"DataFrames":<16} {df_seconds:>10.3f} {df_fills.memory_usage(deep=True).sum() / 1e6:>12.1f} {df_peak / 1e6:>10.1f}')
+    print(f'{"fill records":<16} {records_seconds:>10.3f} {records_size(records) / 1e6:>12.1f} {records_peak / 1e6:>10.1f}')
+    print(f'fill records to pandas on request: {to_pandas_seconds:.3f}s')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
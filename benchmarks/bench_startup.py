@@ -0,0 +1,89 @@
+# Startup benchmark for the investment bot. Every measurement runs in a fresh Python process
+# to get a real cold start against the local stand-ins of standin.py (Coinbase and TradingView
+# served by this process, an in-memory Firestore in the child process). It reports the time to
+# import main.py and the wall time of the first investment_bot() call, which includes the cold
+# start work (heavy imports, Firestore client, first Coinbase connection), once without and once
+# with the background pre-warm (BOT_PREWARM=true). The second call of the same instance is
+# reported as reference for a warm instance.
+#
+# The Firestore client is created by fire_get_client() as usual, but firebase_admin is replaced
+# by a module that returns the in-memory Firestore, so the creation of the real client (gRPC
+# channel, credentials) is not part of the measurement.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_startup.py [seconds_until_first_request] [currencies] [latency_ms]
+
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BOT_FOLDER = os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot')
+
+MEASUREMENT = '''
+import contextlib, json, os, sys, time, types
+sys.path.insert(0, os.environ['BENCHMARK_DIRECTORY'])
+import standin
+firestore = types.ModuleType('firebase_admin.firestore')
+firestore.client = standin.FakeFirestore
+firebase_admin = types.ModuleType('firebase_admin')
+firebase_admin.firestore = firestore
+firebase_admin.get_app = lambda: None
+sys.modules.update({'firebase_admin': firebase_admin, 'firebase_admin.firestore': firestore})
+started = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - started
+time.sleep(float(sys.argv[1]))
+calls = []
+with open(os.devnull, 'w') as log, contextlib.redirect_stdout(log):
+    for call in range(2):
+        main.TRADING_VIEW_CACHE['expires_at'] = 0
+        started = time.perf_counter()
+        main.investment_bot(None)
+        calls.append(time.perf_counter() - started)
+print(json.dumps({'import': import_seconds, 'first_request': calls[0], 'second_request': calls[1]}))
+'''
+
+
+def measure(environment, prewarm, seconds_until_first_request):
+    environment = dict(environment, BOT_PREWARM='true' if prewarm else 'false')
+    output = subprocess.run([sys.executable, '-c', MEASUREMENT, str(seconds_until_first_request)], cwd=BOT_FOLDER,
+                            env=environment, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(seconds_until_first_request, currency_count, latency):
+    sys.path.insert(0, BENCHMARK_DIRECTORY)
+    import standin
+    currencies = [f'C{i:03d}' for i in range(currency_count)]
+    environment = dict(os.environ, BENCHMARK_DIRECTORY=BENCHMARK_DIRECTORY,
+        QUOTE_CURRENCY='EUR',
+        TRADING_VIEW_SYMBOLS=json.dumps([[currency, 'COINBASE', currency + 'EUR'] for currency in currencies]),
+        API_KEY='standin',
+        API_SECRET='standin',
+        BOT_STRATEGIES='["BOT_ONE"]',
+        BOT_ONE_CRYPTO_CURRENCIES=json.dumps(currencies),
+        BOT_ONE_INVEST_EUR='10',
+        BOT_ONE_IDLE_HOURS_BEFORE_NEXT_PURCHASE='24',
+        BOT_ONE_TARGET_MARGIN_PERCENTAGE='5',
+        CB_PUBLIC_RATE_LIMIT='1000',
+        CB_PRIVATE_RATE_LIMIT='1000',
+        BOT_METRICS_EXPORTERS='[]')
+    environment.pop('BOT_DATA_PATH', None)
+    print(f'{currency_count} currencies, latency {latency * 1000:.0f}ms, first request after {seconds_until_first_request}s')
+    print(f'{"mode":<12} {"import (s)":>10} {"first request (s)":>18} {"second request (s)":>19}')
+    for prewarm in [False, True]:
+        # Fresh account state per mode, so both first requests place the same orders
+        server = standin.StandInServer(standin.StandInMarket(currencies), latency=latency).start()
+        try:
+            result = measure(dict(environment, **server.environment()), prewarm, seconds_until_first_request)
+        finally:
+            server.stop()
+        print(f'{"prewarm" if prewarm else "lazy":<12} {result["import"]:>10.3f} {result["first_request"]:>18.3f} {result["second_request"]:>19.3f}')
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 2,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02)
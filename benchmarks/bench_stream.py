@@ -0,0 +1,142 @@
+# Exercises the streaming worker (bot_stream_worker()) against the local stand-ins of standin.py:
+# the Coinbase APIs, the Coinbase WebSocket feed, TradingView and an in-memory Firestore. The
+# worker runs in a thread of this process while the script drives the stand-in market:
+# 1. start-up: products already below their lower Bollinger band are bought and sold on fill
+# 2. crossing: the price of a product with a buy signal drops below its band; the reaction time
+#    until the buy order and until the sell order (after the fill event) is measured
+# 3. dropped connection, lost message (sequence gap) and a silent feed (heartbeat timeout): the
+#    worker has to reconnect or resync without placing any order twice
+# The script prints the timings and the worker statistics and exits with status 1 if a step fails.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_stream.py [--currencies 20] [--latency-ms 20] [--log stream.log]
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for(condition, timeout):
+    # Returns the seconds until condition() was true, or None after the timeout
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if condition():
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    return None
+
+
+def get_orders(market, side, product_id=None):
+    with market.lock:
+        return [order for order in market.orders.values()
+            if order['payload']['side'] == side and product_id in (None, order['payload']['product_id'])]
+
+
+def run():
+    parser = argparse.ArgumentParser(description='Streaming worker against local stand-ins')
+    parser.add_argument('--currencies', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=20, help='latency of every stand-in HTTP response')
+    parser.add_argument('--interval-ms', type=float, default=200, help='interval of the stand-in ticker updates')
+    parser.add_argument('--timeout', type=float, default=20, help='seconds to wait for each step')
+    parser.add_argument('--log', default=os.devnull, help='file for the output of the worker')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCHMARK_DIRECTORY)
+    sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot'))
+    import standin
+    currencies = [f'C{i:03d}' for i in range(args.currencies)]
+    market = standin.StandInMarket(currencies)
+    server = standin.StandInServer(market, latency=args.latency_ms / 1000).start()
+    websocket_server = standin.StandInWebSocketServer(market, interval=args.interval_ms / 1000).start()
+    os.environ.update(server.environment())
+    os.environ.update(websocket_server.environment())
+    os.environ.update({'QUOTE_CURRENCY': 'EUR',
+        'BOT_ONE_CRYPTO_CURRENCIES': json.dumps(currencies),
+        'TRADING_VIEW_SYMBOLS': json.dumps([[currency, 'COINBASE', currency + 'EUR'] for currency in currencies]),
+        'API_KEY': 'standin',
+        'API_SECRET': 'standin',
+        'BOT_ONE_INVEST_EUR': '10',
+        'BOT_ONE_IDLE_HOURS_BEFORE_NEXT_PURCHASE': '24',
+        'BOT_ONE_TARGET_MARGIN_PERCENTAGE': '5',
+        'CB_PUBLIC_RATE_LIMIT': '1000',
+        'CB_PRIVATE_RATE_LIMIT': '1000',
+        'BOT_METRICS_EXPORTERS': '[]',
+        'BOT_STREAM_HEARTBEAT_TIMEOUT_SECONDS': '2',
+        'BOT_STREAM_SELL_DELAY_SECONDS': '0.2'})
+    import main
+    main.FIRESTORE['client'] = standin.FakeFirestore()
+    failures = []
+    results = []
+    def check(name, seconds):
+        if seconds is None:
+            failures.append(name)
+            results.append(f'{name}: failed')
+        else:
+            results.append(f'{name}: {seconds:.3f}s')
+
+    stop_event = threading.Event()
+    with open(args.log, 'w') as log, contextlib.redirect_stdout(log):
+        worker = threading.Thread(target=main.bot_stream_worker, args=(stop_event,), daemon=True)
+        worker.start()
+        try:
+            # 1. Start-up: every product below its band with a buy signal is bought and then sold
+            # (the worker handles one message after the other, so the snapshot is done once the next update arrives)
+            check('start-up until the snapshot is handled', wait_for(lambda: main.STREAM['stats']['tickers'] > len(currencies), args.timeout))
+            initial_buys = {order['payload']['product_id'] for order in get_orders(market, 'BUY')}
+            check(f'start-up: {len(initial_buys)} buys sold', wait_for(lambda: len(get_orders(market, 'SELL')) >= len(initial_buys), args.timeout))
+
+            # 2. Crossing: a product with a buy signal that was not bought yet drops by 30%
+            candidates = [product_id for product_id in market.product_ids() if product_id not in initial_buys
+                and market.recommend_all('COINBASE:' + product_id.replace('-', '')) > 0.1]
+            if candidates:
+                product_id = candidates[0]
+                market.set_price_factor(product_id, 0.7)
+                crossed_at = time.perf_counter()
+                check(f'{product_id} crossing until buy order', wait_for(lambda: get_orders(market, 'BUY', product_id), args.timeout))
+                check(f'{product_id} crossing until sell order', wait_for(lambda: get_orders(market, 'SELL', product_id), args.timeout)
+                    and time.perf_counter() - crossed_at)
+            else:
+                results.append('crossing: no product with a buy signal left, step skipped')
+
+            # 3. Feed failures
+            orders_before = len(market.orders)
+            connects = main.STREAM['stats']['connects']
+            websocket_server.drop_connections()
+            check('dropped connection until resubscribed', wait_for(lambda: main.STREAM['stats']['connects'] > connects, args.timeout))
+            gaps = main.STREAM['stats']['sequence_gaps']
+            sell_runs = main.STREAM['stats']['sell_runs']
+            websocket_server.skip_sequence()
+            check('lost message until sell reconciliation', wait_for(lambda: main.STREAM['stats']['sequence_gaps'] > gaps
+                and main.STREAM['stats']['sell_runs'] > sell_runs, args.timeout))
+            connects = main.STREAM['stats']['connects']
+            websocket_server.silence = True
+            silent_reconnect = wait_for(lambda: main.STREAM['stats']['reconnects'] > 0 and main.STREAM['stats']['connects'] > connects
+                or main.STREAM['stats']['connects'] > connects, args.timeout)
+            websocket_server.silence = False
+            check('silent feed until reconnected', silent_reconnect)
+            time.sleep(1)
+            if len(market.orders) != orders_before:
+                failures.append('orders placed during the feed failures')
+                results.append(f'feed failures: {len(market.orders) - orders_before} orders placed again')
+        finally:
+            stop_event.set()
+            worker.join(args.timeout)
+            websocket_server.stop()
+            server.stop()
+    for result in results:
+        print(result)
+    print('worker statistics: ' + ', '.join(f'{name}={count}' for name, count in sorted(main.STREAM['stats'].items())))
+    print('stand-in calls: ' + ', '.join(f'{name}={count}' for name, count in sorted(server.get_counters()['calls'].items())))
+    if failures:
+        print('Failed: ' + ', '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,79 @@
+# Check for the Trading View signals (get_trading_view_signals() and
+# get_trading_view_recommendations()) against the TradingView scanner stand-in of standin.py:
+# 1. all symbols are requested with one multi-symbol request
+# 2. repeated calls within the same minute are served from the cache
+# 3. the cache expires at the start of the next minute (the clock is moved forward)
+# 4. in case the multi-symbol request fails, the symbols are requested one by one with the same result
+# A failed check raises an AssertionError.
+#
+# Usage (from the root of the project):
+#   python benchmarks/bench_tradingview.py [symbols] [latency_ms]
+
+import contextlib
+import os
+import sys
+import time
+from unittest import mock
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, '..', 'investment-bot'))
+import standin
+import main
+
+
+def get_signals(server, trading_view_symbols, now=None):
+    # Returns the signals and the number of stand-in TradingView requests of one call
+    server.reset_counters()
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if now is not None:
+            stack.enter_context(mock.patch('time.time', return_value=now))
+        df_signals = main.get_trading_view_signals(trading_view_symbols)
+    seconds = time.perf_counter() - start
+    return df_signals, server.get_counters()['calls'].get('tradingview', 0), seconds
+
+
+def run(symbol_count, latency):
+    currencies = [f'C{i:03d}' for i in range(symbol_count)]
+    trading_view_symbols = [[currency, 'COINBASE', currency + 'EUR'] for currency in currencies]
+    market = standin.StandInMarket(currencies)
+    server = standin.StandInServer(market, latency=latency).start()
+    os.environ.update(server.environment())
+    try:
+        with open(os.devnull, 'w') as log, contextlib.redirect_stdout(log):
+            # 1. One multi-symbol request
+            df_batch, calls, batch_seconds = get_signals(server, trading_view_symbols)
+            assert calls == 1, f'multi-symbol request: {calls} requests'
+            assert list(df_batch.index) == currencies
+            expires_at = main.TRADING_VIEW_CACHE['expires_at']
+
+            # 2. Served from the cache until the minute is over
+            df_cached, calls, cached_seconds = get_signals(server, trading_view_symbols, expires_at - 0.001)
+            assert calls == 0, f'cached call: {calls} requests'
+            assert df_cached.equals(df_batch)
+
+            # 3. Expired at the start of the next minute
+            assert expires_at % 60 == 0
+            df_expired, calls, _ = get_signals(server, trading_view_symbols, expires_at)
+            assert calls == 1, f'expired cache: {calls} requests'
+            assert main.TRADING_VIEW_CACHE['expires_at'] == expires_at + 60
+
+            # 4. Per-symbol fallback after a failed multi-symbol request
+            server.fail_tradingview_batches = True
+            df_fallback, calls, fallback_seconds = get_signals(server, trading_view_symbols, expires_at + 60)
+            assert calls == 1 + symbol_count, f'fallback: {calls} requests'
+            assert df_fallback.equals(df_batch)
+    finally:
+        server.stop()
+    print(f'{symbol_count} symbols, latency {latency * 1000:.0f}ms')
+    print(f'multi-symbol request:   {batch_seconds:8.3f}s')
+    print(f'cached call:            {cached_seconds:8.3f}s')
+    print(f'per-symbol fallback:    {fallback_seconds:8.3f}s')
+    print('recommendations: ' + ', '.join(f'{signal}={count}' for signal, count in df_batch['1min_recommendation'].value_counts().items()))
+    print('All Trading View checks passed')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 25,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02)
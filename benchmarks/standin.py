@@ -0,0 +1,737 @@
+# Local stand-ins for the services used by investment_bot(): an HTTP server that answers like
+# the Coinbase exchange API (/time, /products, /products/*/stats, /products/*/candles), the
+# Coinbase brokerage API (fills and orders) and the TradingView scanner, a WebSocket server that
+# streams like the Coinbase Advanced Trade feed (ticker, user and heartbeats channels) for the
+# streaming worker (bot_stream_worker()), and an in-memory fake of the Firestore client. Responses are generated from a deterministic price curve per product,
+# or replayed from recorded JSON files. Every request can be delayed by a fixed latency and each
+# endpoint class (public, private, tradingview) can be rate limited; requests over the limit get
+# a 429 with a Retry-After header like from Coinbase. The server counts the calls per endpoint.
+#
+# Usage (from the root of the project):
+#   python benchmarks/standin.py [port] [products] [latency_ms]
+#
+# then point the bot at it with CB_EXCHANGE_API_URL=http://127.0.0.1:<port>/exchange,
+# CB_BROKERAGE_API_URL=http://127.0.0.1:<port>/brokerage and
+# TRADING_VIEW_SCAN_URL=http://127.0.0.1:<port>/tradingview/ (see bench_e2e.py) and
+# CB_WEBSOCKET_API_URL=ws://127.0.0.1:<port+1>/ (see bench_stream.py).
+
+import base64
+import calendar
+import collections
+import hashlib
+import http.server
+import json
+import math
+import os
+import socketserver
+import struct
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+# Recommend.All values that tradingview_ta turns into STRONG_BUY, BUY, NEUTRAL and SELL
+RECOMMEND_ALL_VALUES = [0.6, 0.3, 0.0, -0.3]
+
+
+class StandInMarket:
+    # Deterministic market data and account state of the stand-in
+
+    def __init__(self, currencies, quote_currency='EUR', seed=42, dip_every=3, filled_every=2):
+        self.currencies = list(currencies)
+        self.currency_numbers = {currency: index for index, currency in enumerate(self.currencies)}
+        self.product_numbers = {}
+        self.quote_currency = quote_currency
+        self.seed = seed
+        # Every dip_every-th currency trades far below its lower Bollinger band today
+        self.dip_every = dip_every
+        # Every filled_every-th currency has a settled buy fill from three days ago
+        self.filled_every = filled_every
+        # Live price multipliers per product (see set_price_factor()) and callbacks for order updates
+        self.price_factors = {}
+        self.order_listeners = []
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.fills = []
+            self.orders = {}
+            now = time.time()
+            for index, currency in enumerate(self.currencies):
+                if self.filled_every and index % self.filled_every == 0:
+                    product_id = f'{currency}-{self.quote_currency}'
+                    self.add_fill(product_id, f'history-{index}', 'BUY', self.price(product_id, now - 3 * 86400), 100.0, now - 3 * 86400)
+
+    def product_ids(self):
+        return [f'{currency}-{self.quote_currency}' for currency in self.currencies]
+
+    def product_number(self, product_id):
+        number = self.product_numbers.get(product_id)
+        if number is None:
+            number = int(hashlib.sha256(f'{self.seed}:{product_id}'.encode()).hexdigest()[:8], 16)
+            self.product_numbers[product_id] = number
+        return number
+
+    def price(self, product_id, epoch):
+        number = self.product_number(product_id)
+        base = 1 + number % 50000
+        price = base * (1 + 0.05 * math.sin(epoch / 86400 / 3 + number % 97) + 0.01 * math.sin(epoch / 3600 + number % 13))
+        currency_index = self.currency_numbers.get(product_id.split('-')[0], 1)
+        if self.dip_every and currency_index % self.dip_every == 0 and epoch >= time.time() // 86400 * 86400:
+            price *= 0.8
+        factor, since = self.price_factors.get(product_id, (1.0, 0))
+        if epoch >= since:
+            price *= factor
+        return round(price, 6)
+
+    def set_price_factor(self, product_id, factor):
+        # Multiplies the price of the product from now on, e.g. to push it below its Bollinger band
+        self.price_factors[product_id] = (factor, time.time())
+
+    def candles(self, product_id, start, end, granularity):
+        # Newest to oldest like Coinbase: [time, low, high, open, close, volume]
+        candles = []
+        first = int(math.ceil(start / granularity) * granularity)
+        for candle_time in range(first, int(min(end, time.time())) + 1, granularity):
+            open_price = self.price(product_id, candle_time)
+            close_price = self.price(product_id, min(candle_time + granularity, time.time()))
+            candles.append([candle_time, min(open_price, close_price) * 0.995, max(open_price, close_price) * 1.005,
+                open_price, close_price, 1000.0 + candle_time % 7])
+        return candles[::-1]
+
+    def stats(self, product_id):
+        now = time.time()
+        last = self.price(product_id, now)
+        return {'open': str(self.price(product_id, now - 86400)), 'high': str(last * 1.02), 'low': str(last * 0.98),
+            'last': str(last), 'volume': '1000', 'volume_30day': '30000'}
+
+    def product(self, product_id):
+        base_currency, quote_currency = product_id.split('-')
+        return {'id': product_id, 'base_currency': base_currency, 'quote_currency': quote_currency,
+            'base_increment': '0.00000001', 'quote_increment': '0.01', 'status': 'online'}
+
+    def add_fill(self, product_id, order_id, side, price, quote_size, epoch):
+        trade_time = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch)) + f'.{int(epoch % 1 * 1e6):06d}Z'
+        self.fills.append({'entry_id': uuid.uuid4().hex, 'trade_id': uuid.uuid4().hex, 'order_id': order_id,
+            'trade_time': trade_time, 'trade_type': 'FILL', 'price': str(price), 'size': str(quote_size),
+            'commission': str(round(quote_size * 0.006, 6)), 'product_id': product_id, 'sequence_timestamp': trade_time,
+            'liquidity_indicator': 'TAKER', 'size_in_quote': True, 'user_id': 'standin', 'side': side})
+
+    def get_fills(self, params):
+        # Newest to oldest (sort_by=TRADE_TIME orders by trade time, otherwise in the order the
+        # fills were added), filtered like the brokerage fills endpoint; the cursor is the offset
+        with self.lock:
+            fills = self.fills[::-1]
+        if (params.get('sort_by') or [''])[0] == 'TRADE_TIME':
+            fills = sorted(fills, key=lambda fill: fill['trade_time'], reverse=True)
+        if params.get('product_id'):
+            fills = [fill for fill in fills if fill['product_id'] == params['product_id'][0]]
+        if params.get('order_ids'):
+            order_ids = set(params['order_ids'])
+            fills = [fill for fill in fills if fill['order_id'] in order_ids]
+        if params.get('start_sequence_timestamp'):
+            fills = [fill for fill in fills if fill['sequence_timestamp'] >= params['start_sequence_timestamp'][0]]
+        offset = int((params.get('cursor') or ['0'])[0] or 0)
+        limit = int((params.get('limit') or ['100'])[0])
+        page = fills[offset:offset + limit]
+        cursor = str(offset + limit) if offset + limit < len(fills) else ''
+        return {'fills': page, 'cursor': cursor}
+
+    def create_order(self, payload):
+        # Known client_order_ids return the existing order like Coinbase; market buys fill at once
+        filled_order = None
+        with self.lock:
+            order = self.orders.get(payload['client_order_id'])
+            if order is None:
+                order = {'order_id': uuid.uuid4().hex, 'payload': payload}
+                self.orders[payload['client_order_id']] = order
+                if payload['side'] == 'BUY':
+                    quote_size = float(payload['order_configuration']['market_market_ioc']['quote_size'])
+                    now = time.time()
+                    price = self.price(payload['product_id'], now)
+                    self.add_fill(payload['product_id'], order['order_id'], 'BUY', price, quote_size, now)
+                    filled_order = {'order_id': order['order_id'], 'client_order_id': payload['client_order_id'],
+                        'cumulative_quantity': str(quote_size / price), 'leaves_quantity': '0', 'avg_price': str(price),
+                        'total_fees': str(round(quote_size * 0.006, 6)), 'status': 'FILLED', 'product_id': payload['product_id'],
+                        'order_side': 'BUY', 'order_type': 'Market'}
+        if filled_order is not None:
+            for listener in list(self.order_listeners):
+                listener(filled_order)
+        return {'success': True, 'order_id': order['order_id'], 'success_response': {'order_id': order['order_id'],
+            'product_id': payload['product_id'], 'side': payload['side'], 'client_order_id': payload['client_order_id']}}
+
+    def recommend_all(self, symbol):
+        return RECOMMEND_ALL_VALUES[self.product_number(symbol) % len(RECOMMEND_ALL_VALUES)]
+
+
+class StandInServer:
+    # Threaded HTTP server around a StandInMarket with latency, rate limits and call counters
+
+    def __init__(self, market, port=0, latency=0.0, rate_limits=None, recordings=None):
+        self.market = market
+        self.latency = latency
+        # Requests per second per endpoint class; None or 0 means unlimited
+        self.rate_limits = rate_limits or {}
+        self.recordings = recordings
+        # If set, TradingView requests with more than one symbol fail (to exercise the per-symbol fallback)
+        self.fail_tradingview_batches = False
+        self.calls = collections.Counter()
+        self.throttled = collections.Counter()
+        self.buckets = {}
+        self.lock = threading.Lock()
+        handler = type('StandInHandler', (StandInHandler,), {'standin': self})
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def environment(self):
+        return {'CB_EXCHANGE_API_URL': self.url + '/exchange',
+            'CB_BROKERAGE_API_URL': self.url + '/brokerage',
+            'TRADING_VIEW_SCAN_URL': self.url + '/tradingview/'}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls.clear()
+            self.throttled.clear()
+
+    def get_counters(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'throttled': dict(self.throttled)}
+
+    def take_token(self, endpoint_class):
+        # Returns 0 if the request may be served, else the seconds until the next token
+        rate = self.rate_limits.get(endpoint_class)
+        if not rate:
+            return 0.0
+        with self.lock:
+            tokens, updated_at = self.buckets.get(endpoint_class, (rate, time.monotonic()))
+            now = time.monotonic()
+            tokens = min(rate, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self.buckets[endpoint_class] = (tokens, now)
+                return (1 - tokens) / rate
+            self.buckets[endpoint_class] = (tokens - 1, now)
+            return 0.0
+
+    def load_recording(self, method, path):
+        # Recorded responses are stored as <method>_<path with / replaced by _>.json
+        if not self.recordings:
+            return None
+        file_path = os.path.join(self.recordings, method + path.replace('/', '_') + '.json')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path) as file:
+            return json.load(file)
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    standin = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        standin = self.standin
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        body = None
+        if method == 'POST':
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'null')
+        parts = [part for part in url.path.split('/') if part]
+        # /_standin returns the call counters, /_standin/reset also resets the account state
+        if parts[:1] == ['_standin']:
+            if parts[1:] == ['reset']:
+                standin.market.reset()
+                standin.reset_counters()
+            return self.send_json(200, standin.get_counters())
+        endpoint, endpoint_class = self.get_endpoint(method, parts)
+        if endpoint is None:
+            return self.send_json(404, {'message': 'NotFound'})
+        wait = standin.take_token(endpoint_class)
+        with standin.lock:
+            standin.calls[endpoint] += 1
+            if wait > 0:
+                standin.throttled[endpoint] += 1
+        if wait > 0:
+            return self.send_json(429, {'message': 'Too Many Requests'}, {'Retry-After': f'{wait:.3f}'})
+        if standin.latency:
+            time.sleep(standin.latency)
+        if endpoint == 'tradingview' and standin.fail_tradingview_batches and len(body['symbols']['tickers']) > 1:
+            return self.send_json(500, {'message': 'Internal Server Error'})
+        recording = standin.load_recording(method, url.path)
+        if recording is not None:
+            return self.send_json(200, recording)
+        return self.send_json(200, self.get_response(endpoint, parts, params, body))
+
+    def get_endpoint(self, method, parts):
+        if parts[:1] == ['exchange']:
+            if parts[1:] == ['time']:
+                return 'time', 'public'
+            if parts[1:] == ['products']:
+                return 'products', 'public'
+            if len(parts) == 3 and parts[1] == 'products':
+                return 'product', 'public'
+            if len(parts) == 4 and parts[1] == 'products' and parts[3] in ('stats', 'candles'):
+                return parts[3], 'public'
+        if parts[:1] == ['brokerage']:
+            if method == 'GET' and parts[1:] == ['api', 'v3', 'brokerage', 'orders', 'historical', 'fills']:
+                return 'fills', 'private'
+            if method == 'POST' and parts[1:] == ['api', 'v3', 'brokerage', 'orders']:
+                return 'orders', 'private'
+        if parts[:1] == ['tradingview'] and method == 'POST':
+            return 'tradingview', 'tradingview'
+        return None, None
+
+    def get_response(self, endpoint, parts, params, body):
+        market = self.standin.market
+        if endpoint == 'time':
+            now = time.time()
+            return {'iso': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)) + f'.{int(now % 1 * 1000):03d}Z', 'epoch': now}
+        if endpoint == 'products':
+            return [market.product(product_id) for product_id in market.product_ids()]
+        if endpoint == 'product':
+            return market.product(parts[2])
+        if endpoint == 'stats':
+            return market.stats(parts[2])
+        if endpoint == 'candles':
+            granularity = int(params['granularity'][0])
+            start = calendar.timegm(time.strptime(params['start'][0][:19], '%Y-%m-%dT%H:%M:%S'))
+            end = calendar.timegm(time.strptime(params['end'][0][:19], '%Y-%m-%dT%H:%M:%S'))
+            return market.candles(parts[2], start, end, granularity)
+        if endpoint == 'fills':
+            return market.get_fills(params)
+        if endpoint == 'orders':
+            return market.create_order(body)
+        if endpoint == 'tradingview':
+            columns = body['columns']
+            return {'data': [{'s': ticker, 'd': [market.recommend_all(ticker) if column.startswith('Recommend.All') else 1.0
+                for column in columns]} for ticker in body['symbols']['tickers']], 'totalCount': len(body['symbols']['tickers'])}
+
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class StandInWebSocketServer:
+    # Minimal WebSocket server (RFC 6455, text frames only) that streams like the Coinbase Advanced
+    # Trade feed: after a subscribe message it sends a snapshot and then ticker updates of the
+    # subscribed products every interval seconds, one heartbeat per interval and an update on the
+    # user channel for every filled market buy of the market. The sequence_num counts the messages
+    # per connection. drop_connections(), skip_sequence() and silence simulate feed failures.
+
+    def __init__(self, market, port=0, interval=0.2):
+        self.market = market
+        self.interval = interval
+        self.connections = []
+        self.counters = collections.Counter()
+        # While silence is set, nothing is sent (like a dead connection that is not closed)
+        self.silence = False
+        self.lock = threading.Lock()
+        handler = type('StandInWebSocketHandler', (StandInWebSocketHandler,), {'standin': self})
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', port), handler)
+        self.server.daemon_threads = True
+        self.running = threading.Event()
+
+    @property
+    def url(self):
+        return f'ws://127.0.0.1:{self.server.server_address[1]}/'
+
+    def environment(self):
+        return {'CB_WEBSOCKET_API_URL': self.url}
+
+    def start(self):
+        self.market.order_listeners.append(self.send_order_update)
+        self.running.set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.stream, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running.clear()
+        self.drop_connections()
+        self.server.shutdown()
+        self.server.server_close()
+        if self.send_order_update in self.market.order_listeners:
+            self.market.order_listeners.remove(self.send_order_update)
+
+    def get_counters(self):
+        with self.lock:
+            return dict(self.counters, open_connections=len(self.connections))
+
+    def drop_connections(self):
+        # Closes all connections without a close frame, like a network failure
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+
+    def skip_sequence(self):
+        # The next message of every connection skips one sequence_num, like a lost message
+        with self.lock:
+            for connection in self.connections:
+                connection.sequence_num += 1
+
+    def send_all(self, channel, get_events):
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            if channel in connection.channels and not self.silence:
+                events = get_events(connection)
+                if events:
+                    connection.send_message(channel, events)
+
+    def get_tickers(self, connection):
+        now = time.time()
+        return [{'type': 'ticker', 'product_id': product_id, 'price': str(self.market.price(product_id, now))}
+            for product_id in connection.product_ids]
+
+    def stream(self):
+        while self.running.is_set():
+            time.sleep(self.interval)
+            self.send_all('ticker', lambda connection: [{'type': 'update', 'tickers': self.get_tickers(connection)}])
+            self.send_all('heartbeats', lambda connection: [{'current_time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'heartbeat_counter': str(connection.sequence_num)}])
+
+    def send_order_update(self, order):
+        self.send_all('user', lambda connection: [{'type': 'update', 'orders': [order]}])
+
+
+class StandInWebSocketConnection:
+    # One client connection of the StandInWebSocketServer
+
+    def __init__(self, standin, socket):
+        self.standin = standin
+        self.socket = socket
+        self.channels = set()
+        self.product_ids = []
+        self.sequence_num = 0
+        # Reentrant since a message is numbered and sent under the same lock
+        self.send_lock = threading.RLock()
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self.send_lock:
+            self.socket.sendall(header + payload)
+
+    def send_message(self, channel, events):
+        with self.send_lock:
+            message = {'channel': channel, 'client_id': '', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'sequence_num': self.sequence_num, 'events': events}
+            self.sequence_num += 1
+            try:
+                self.send_frame(0x1, json.dumps(message).encode('utf-8'))
+            except OSError:
+                self.close()
+                return
+        with self.standin.lock:
+            self.standin.counters['messages'] += 1
+
+    def read_exactly(self, count):
+        data = b''
+        while len(data) < count:
+            chunk = self.socket.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError('connection closed')
+            data += chunk
+        return data
+
+    def read_frame(self):
+        first, second = self.read_exactly(2)
+        length = second & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self.read_exactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.read_exactly(8))[0]
+        # Frames from clients are always masked
+        mask = self.read_exactly(4) if second & 0x80 else b'\0\0\0\0'
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(self.read_exactly(length)))
+        return first & 0x0f, payload
+
+    def subscribe(self, message):
+        standin = self.standin
+        channel = message['channel']
+        with standin.lock:
+            standin.counters['subscribes'] += 1
+        self.channels.add(channel)
+        if message.get('product_ids'):
+            self.product_ids = list(dict.fromkeys(self.product_ids + message['product_ids']))
+        self.send_message('subscriptions', [{'subscriptions': {channel: list(message.get('product_ids') or [])
+            for channel in self.channels}}])
+        if channel == 'ticker':
+            self.send_message('ticker', [{'type': 'snapshot', 'tickers': standin.get_tickers(self)}])
+        elif channel == 'user':
+            self.send_message('user', [{'type': 'snapshot', 'orders': []}])
+
+    def close(self):
+        try:
+            self.socket.shutdown(2)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+class StandInWebSocketHandler(socketserver.BaseRequestHandler):
+    standin = None
+
+    def handle(self):
+        standin = self.standin
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        headers = dict(line.split(': ', 1) for line in request.decode('latin-1').split('\r\n')[1:] if ': ' in line)
+        key = {name.lower(): value for name, value in headers.items()}['sec-websocket-key'].strip()
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.request.sendall(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode())
+        connection = StandInWebSocketConnection(standin, self.request)
+        with standin.lock:
+            standin.counters['connections'] += 1
+            standin.connections.append(connection)
+        try:
+            while True:
+                opcode, payload = connection.read_frame()
+                if opcode == 0x8:
+                    connection.send_frame(0x8, payload[:2])
+                    break
+                if opcode == 0x9:
+                    connection.send_frame(0xa, payload)
+                elif opcode == 0x1:
+                    message = json.loads(payload)
+                    if message.get('type') == 'subscribe':
+                        connection.subscribe(message)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with standin.lock:
+                if connection in standin.connections:
+                    standin.connections.remove(connection)
+            connection.close()
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, doc_data, merge=False):
+        self.collection.client.count('writes')
+        self.collection.client.count('commits')
+        self.collection.write(self.id, doc_data, merge)
+
+    def get(self):
+        self.collection.client.count('reads')
+        return FakeDocumentSnapshot(self.id, self.collection.documents.get(self.id))
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), fields=None, limit=None, start_after=None):
+        self.collection = collection
+        self.filters = list(filters)
+        self.fields = fields
+        self.limit_count = limit
+        self.start_after_id = start_after
+
+    def copy(self, **changes):
+        values = {'filters': self.filters, 'fields': self.fields, 'limit': self.limit_count, 'start_after': self.start_after_id}
+        values.update(changes)
+        return FakeQuery(self.collection, **values)
+
+    def where(self, field, operator, value):
+        if operator != '==':
+            raise ValueError(f'Fake Firestore only supports == filters, not {operator}')
+        return self.copy(filters=self.filters + [(field, value)])
+
+    def select(self, fields):
+        return self.copy(fields=list(fields))
+
+    def order_by(self, field):
+        # Documents are always returned in document id order
+        return self
+
+    def limit(self, count):
+        return self.copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self.copy(start_after=snapshot.id)
+
+    def stream(self):
+        client = self.collection.client
+        client.count('queries')
+        with client.lock:
+            documents = sorted(self.collection.documents.items())
+        results = []
+        for doc_id, data in documents:
+            if self.start_after_id is not None and doc_id <= self.start_after_id:
+                continue
+            if all(data.get(field) == value for field, value in self.filters):
+                if self.fields is not None:
+                    data = {field: data[field] for field in self.fields if field in data}
+                results.append(FakeDocumentSnapshot(doc_id, data))
+                if self.limit_count is not None and len(results) >= self.limit_count:
+                    break
+        client.count('reads', len(results))
+        return iter(results)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.documents = {}
+        super().__init__(self)
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or uuid.uuid4().hex[:20])
+
+    def write(self, doc_id, doc_data, merge):
+        with self.client.lock:
+            if merge and doc_id in self.documents:
+                self.documents[doc_id].update(doc_data)
+            else:
+                self.documents[doc_id] = dict(doc_data)
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, doc_data, merge=False):
+        self.writes.append((ref, doc_data, merge))
+
+    def commit(self):
+        if len(self.writes) > 500:
+            raise ValueError('A write batch can contain at most 500 operations')
+        self.client.count('commits')
+        self.client.count('writes', len(self.writes))
+        for ref, doc_data, merge in self.writes:
+            ref.collection.write(ref.id, doc_data, merge)
+        self.writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    # Write-only transaction for the transactional decorator of google-cloud-firestore, which
+    # begins the transaction, calls the wrapped function, commits and rolls back on errors
+
+    def __init__(self, client, max_attempts=5):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+
+    def _clean_up(self):
+        self.writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        self.commit()
+        self._clean_up()
+        return []
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class FakeFirestore:
+    # In-memory replacement of the Firestore client for the calls made by the bot (documents,
+    # merge writes, write batches, transactions, batched reads and paged queries). It counts reads,
+    # writes, queries and commits.
+
+    def __init__(self):
+        self.collections = {}
+        self.stats = collections.Counter()
+        self.lock = threading.RLock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts=5):
+        return FakeTransaction(self, max_attempts)
+
+    def get_all(self, references, field_paths=None):
+        for ref in references:
+            self.count('reads')
+            with self.lock:
+                data = ref.collection.documents.get(ref.id)
+            if data is not None and field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            yield FakeDocumentSnapshot(ref.id, data)
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8700
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0
+    market = StandInMarket([f'C{i:03d}' for i in range(products)])
+    server = StandInServer(market, port=port, latency=latency).start()
+    websocket_server = StandInWebSocketServer(market, port=port + 1).start()
+    for name, value in dict(server.environment(), **websocket_server.environment()).items():
+        print(f'export {name}={value}')
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        websocket_server.stop()
+        server.stop()
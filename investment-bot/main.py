@@ -1,155 +1,817 @@
-import firebase_admin
-from firebase_admin import firestore
+import collections
+import os
+import threading
 
-# Will automatically pull credentials from environment variable
-firebase_admin.initialize_app() 
+# Metrics of the current bot run: timing spans per stage, counters and latency histograms (e.g.
+# per Coinbase endpoint). investment_bot() resets them at the start of a run and hands a JSON
+# summary to the exporters in BOT_METRICS_EXPORTERS at the end of the run.
+METRICS = {'run_started_at': None, 'spans': [], 'counters': collections.Counter(), 'histograms': {},
+    'stats_before': None, 'local': threading.local(), 'lock': threading.Lock()}
+METRICS_HISTOGRAM_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
 
-def cb_pub_connect(url, *args, **kwargs):
+def metrics_get_stats():
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Returns the cumulative statistics of the caches, the request scheduler, the pooled Coinbase
+    # connections per host and Firestore writes (including the round trips saved by collecting
+    # order records)
+
+    with TRADING_VIEW_CACHE['lock']:
+        trading_view_stats = dict(TRADING_VIEW_CACHE['stats'])
+    return {'product_cache': cb_get_product_cache_stats(),
+        'candle_store': candle_store_get_stats(),
+        'trading_view_cache': trading_view_stats,
+        'scheduler': cb_get_scheduler_stats(),
+        'transport': cb_get_transport_stats(),
+        'firestore': fire_get_write_stats()}
+
+def get_stats_difference(before, after):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Returns after - before for the numbers in the given (nested) statistics dictionaries
+
+    difference = {}
+    for name, value in after.items():
+        if isinstance(value, dict):
+            difference[name] = get_stats_difference(before.get(name) or {}, value)
+        else:
+            difference[name] = value - before.get(name, 0)
+    return difference
+
+def metrics_start_run():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Clears the metrics of the previous run and remembers the current cache statistics. The
+    # metrics are shared by the whole process, so only one run may collect them at a time (see
+    # BOT_RUN).
+
+    import time
+    with METRICS['lock']:
+        METRICS['run_started_at'] = time.time()
+        METRICS['spans'] = []
+        METRICS['counters'] = collections.Counter()
+        METRICS['histograms'] = {}
+    METRICS['stats_before'] = metrics_get_stats()
+
+def metrics_span(name, **attributes):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a context manager that records the duration of the enclosed stage as timing span.
+    # Spans started inside another span of the same thread get that span as parent.
+
+    import contextlib
+    import time
+    @contextlib.contextmanager
+    def span():
+        stack = METRICS['local'].__dict__.setdefault('stack', [])
+        record = {'name': name, 'parent': stack[-1]['name'] if stack else None, 'start': time.time(),
+            'duration_seconds': None, 'attributes': attributes}
+        started_at = time.perf_counter()
+        stack.append(record)
+        try:
+            yield record
+        except BaseException as err:
+            record['attributes']['error'] = repr(err)
+            raise
+        finally:
+            stack.pop()
+            record['duration_seconds'] = time.perf_counter() - started_at
+            with METRICS['lock']:
+                METRICS['spans'].append(record)
+    return span()
+
+def metrics_increment(name, value=1):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Adds the given value to the counter with the given name
+
+    with METRICS['lock']:
+        METRICS['counters'][name] += value
+
+def metrics_observe(name, value):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Adds the given value (in seconds) to the histogram with the given name
+
+    import bisect
+    with METRICS['lock']:
+        histogram = METRICS['histograms'].get(name)
+        if histogram is None:
+            histogram = {'counts': [0] * (len(METRICS_HISTOGRAM_BUCKETS) + 1), 'count': 0, 'sum': 0.0, 'max': 0.0}
+            METRICS['histograms'][name] = histogram
+        histogram['counts'][bisect.bisect_left(METRICS_HISTOGRAM_BUCKETS, value)] += 1
+        histogram['count'] += 1
+        histogram['sum'] += value
+        histogram['max'] = max(histogram['max'], value)
+
+def get_histogram_quantile(histogram, quantile):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the upper bucket bound below which the given quantile of the histogram values lie
+    # (the maximum for the overflow bucket)
+
+    rank = quantile * histogram['count']
+    seen = 0
+    for bound, count in zip(METRICS_HISTOGRAM_BUCKETS + [histogram['max']], histogram['counts']):
+        seen += count
+        if seen >= rank and count > 0:
+            return min(bound, histogram['max'])
+    return histogram['max']
+
+def metrics_get_summary():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the metrics of the current run as JSON serializable dictionary: the spans, the total
+    # seconds per stage, counters, histograms (with p50/p95/p99 estimates) and the cache hit rates
+    # and other statistics of this run
+
+    import time
+    with METRICS['lock']:
+        spans = [dict(span) for span in METRICS['spans']]
+        counters = dict(METRICS['counters'])
+        histograms = {name: dict(histogram) for name, histogram in METRICS['histograms'].items()}
+    stage_seconds = collections.OrderedDict()
+    for span in sorted(spans, key=lambda span: span['start']):
+        stage_seconds[span['name']] = stage_seconds.get(span['name'], 0) + span['duration_seconds']
+    for histogram in histograms.values():
+        histogram['buckets'] = METRICS_HISTOGRAM_BUCKETS + ['inf']
+        for quantile in [0.5, 0.95, 0.99]:
+            histogram[f'p{int(quantile * 100)}'] = get_histogram_quantile(histogram, quantile)
+    stats = get_stats_difference(METRICS['stats_before'] or {}, metrics_get_stats())
+    def get_hit_rate(hits, misses):
+        return hits / (hits + misses) if hits + misses > 0 else None
+    cache_hit_rates = {'product_cache': get_hit_rate(stats['product_cache']['hits'], stats['product_cache']['misses']),
+        'candle_store': get_hit_rate(stats['candle_store']['cache'], stats['candle_store']['network']),
+        'trading_view_cache': get_hit_rate(stats['trading_view_cache']['hits'], stats['trading_view_cache']['misses'])}
+    run_started_at = METRICS['run_started_at'] or time.time()
+    return {'run_started_at': run_started_at,
+        'duration_seconds': time.time() - run_started_at,
+        'stage_seconds': stage_seconds,
+        'spans': spans,
+        'counters': counters,
+        'histograms': histograms,
+        'cache_hit_rates': cache_hit_rates,
+        'stats': stats}
+
+def metrics_export_stdout(summary):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Prints the metrics summary as one JSON line (a structured log entry in Cloud Logging)
+
+    import json
+    print(json.dumps({'message': 'investment_bot run metrics', 'metrics': summary}, default=str))
+
+def metrics_export_file(summary):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Appends the metrics summary as one JSON line to BOT_METRICS_FILE
+
+    import json
+    import os
+    with open(os.environ.get('BOT_METRICS_FILE') or '/tmp/investment-bot-metrics.jsonl', 'a') as file:
+        file.write(json.dumps(summary, default=str) + '\n')
+
+def metrics_export_opentelemetry(summary):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Hands the spans, counters and histograms to the OpenTelemetry API (package opentelemetry-api,
+    # optional). Where they are sent to is configured by the OpenTelemetry SDK of the environment.
+
+    from opentelemetry import trace, metrics
+    tracer = trace.get_tracer('investment-bot')
+    spans = sorted(summary['spans'], key=lambda span: span['start'])
+    open_spans = {}
+    for span in spans:
+        parent = open_spans.get(span['parent'])
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        start_time = int(span['start'] * 1e9)
+        otel_span = tracer.start_span(span['name'], context=context, start_time=start_time,
+            attributes={name: str(value) for name, value in span['attributes'].items()})
+        open_spans[span['name']] = otel_span
+        otel_span.end(end_time=start_time + int(span['duration_seconds'] * 1e9))
+    meter = metrics.get_meter('investment-bot')
+    for name, value in summary['counters'].items():
+        meter.create_counter(name).add(value)
+    for name, histogram in summary['histograms'].items():
+        # Only the bucket counts are known, so every value is recorded as its bucket bound
+        otel_histogram = meter.create_histogram(name, unit='s')
+        for bound, count in zip(METRICS_HISTOGRAM_BUCKETS + [histogram['max']], histogram['counts']):
+            for _ in range(count):
+                otel_histogram.record(bound)
+
+# Exporters by name; further exporters can be added with metrics_register_exporter()
+METRICS_EXPORTERS = {'stdout': metrics_export_stdout,
+    'file': metrics_export_file,
+    'opentelemetry': metrics_export_opentelemetry}
+
+def metrics_register_exporter(name, export_function):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Registers a function that receives the metrics summary of every run under the given name
+
+    METRICS_EXPORTERS[name] = export_function
+
+def metrics_finish_run():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Hands the metrics summary of the run to the exporters chosen in BOT_METRICS_EXPORTERS
+    # (JSON list, default '["stdout"]') and returns it. Exporter errors are only printed.
+
+    import json
+    import os
+    summary = metrics_get_summary()
+    for exporter in json.loads(os.environ.get('BOT_METRICS_EXPORTERS') or '["stdout"]'):
+        try:
+            METRICS_EXPORTERS[exporter](summary)
+        except Exception as err:
+            print(f'Metrics exporter {exporter} failed: {err!r}')
+    return summary
+
+def get_endpoint_name(url):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the URL path with product ids replaced, e.g. /products/{product_id}/candles
+
+    import re
+    from urllib.parse import urlsplit
+    return re.sub(r'/products/[^/]+', '/products/{product_id}', urlsplit(url).path)
+
+# Shared HTTP transport for all Coinbase calls. It is kept at module level so that warm
+# Cloud Function instances keep their keep-alive connections and decoded credentials
+# between invocations instead of doing a new TCP+TLS handshake for every request.
+CB_TRANSPORT = {'sessions': {}, 'credentials': None, 'lock': threading.Lock()}
+
+def cb_get_session(url):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns the pooled requests session for the host of the given URL (one session per host,
+    # e.g. api.exchange.coinbase.com and coinbase.com). Sessions are created on first use; the
+    # lock makes sure that parallel first requests to a host share one session.
+
+    import os
+    import requests
+    from urllib.parse import urlsplit
+    host = urlsplit(url).netloc
+    with CB_TRANSPORT['lock']:
+        session = CB_TRANSPORT['sessions'].get(host)
+        if session is None:
+            pool_size = int(os.environ.get('CB_HTTP_POOL_SIZE') or 10)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'accept': 'application/json'})
+            CB_TRANSPORT['sessions'][host] = session
+    return session
+
+def cb_get_api_url(api):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns the base URL of the public 'exchange' or the private 'brokerage' Coinbase API or of
+    # the 'websocket' feed. They can be changed via CB_EXCHANGE_API_URL, CB_BROKERAGE_API_URL and
+    # CB_WEBSOCKET_API_URL (e.g. to a local stand-in).
+
+    import os
+    if api == 'exchange':
+        return (os.environ.get('CB_EXCHANGE_API_URL') or 'https://api.exchange.coinbase.com').rstrip('/')
+    if api == 'websocket':
+        return os.environ.get('CB_WEBSOCKET_API_URL') or 'wss://advanced-trade-ws.coinbase.com'
+    return (os.environ.get('CB_BROKERAGE_API_URL') or 'https://coinbase.com').rstrip('/')
+
+def cb_get_timeout():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the (connect, read) timeout in seconds used for all Coinbase requests
+
+    import os
+    return (float(os.environ.get('CB_HTTP_CONNECT_TIMEOUT') or 5), float(os.environ.get('CB_HTTP_READ_TIMEOUT') or 20))
+
+def cb_get_credentials():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the Coinbase API key and the encoded API secret. Both are read from the
+    # environment once and then cached for the lifetime of the instance.
+
+    import os
+    if CB_TRANSPORT['credentials'] is None:
+        CB_TRANSPORT['credentials'] = (os.environ.get('API_KEY'), os.environ.get('API_SECRET').encode('utf-8'))
+    return CB_TRANSPORT['credentials']
+
+def cb_auth_headers(method, url_path, body):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the signed authentication headers for the given method, URL path and serialized body
+
+    import hmac
+    import hashlib
+    import time
+    api_key, secret_key = cb_get_credentials()
+    timestamp = str(int(time.time()))
+    message = timestamp + method + url_path.split('?')[0] + body
+    signature = hmac.new(secret_key, message.encode('utf-8'), digestmod=hashlib.sha256).digest()
+    headers = {'CB-ACCESS-SIGN':signature.hex(),
+        'CB-ACCESS-KEY':api_key,
+        'CB-ACCESS-TIMESTAMP': timestamp}
+    return headers
+
+def cb_get_transport_stats():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the number of requests, opened connections and reused connections
+    # per host. A growing "reused" count confirms that keep-alive connections are being used.
+
+    stats = {}
+    with CB_TRANSPORT['lock']:
+        sessions = list(CB_TRANSPORT['sessions'].items())
+    for host, session in sessions:
+        requests_sent = 0
+        connections = 0
+        adapter = session.get_adapter(f'https://{host}')
+        for pool_key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools.get(pool_key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        stats[host] = {'requests': requests_sent, 'connections': connections, 'reused': requests_sent - connections}
+    return stats
+
+# Central scheduler for all Coinbase requests. Every endpoint class (public exchange API and
+# private brokerage API) has its own token bucket so bursts of parallel requests stay below the
+# Coinbase rate limits. Waiting requests are served by priority, so order placement never waits
+# behind bulk data fetches. Requests rejected with 429/5xx are retried with jittered backoff.
+CB_PRIORITY_ORDER = 0
+CB_PRIORITY_DATA = 1
+CB_RETRY_STATUSES = (429, 500, 502, 503, 504)
+CB_SCHEDULER = {'buckets': {}, 'stats': {}, 'lock': threading.Lock()}
+
+def cb_get_rate_bucket(endpoint_class):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the token bucket of the given endpoint class ('public' or 'private'). The rates in
+    # requests per second are read from CB_PUBLIC_RATE_LIMIT and CB_PRIVATE_RATE_LIMIT.
+
+    import os
+    import time
+    with CB_SCHEDULER['lock']:
+        bucket = CB_SCHEDULER['buckets'].get(endpoint_class)
+        if bucket is None:
+            if endpoint_class == 'public':
+                rate = float(os.environ.get('CB_PUBLIC_RATE_LIMIT') or 10)
+            else:
+                rate = float(os.environ.get('CB_PRIVATE_RATE_LIMIT') or 30)
+            bucket = {'rate': rate, 'tokens': rate, 'updated_at': time.monotonic(), 'blocked_until': 0.0,
+                'waiting': [], 'sequence': 0, 'condition': threading.Condition()}
+            CB_SCHEDULER['buckets'][endpoint_class] = bucket
+            CB_SCHEDULER['stats'][endpoint_class] = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0, 'retries': 0}
+        return bucket
+
+def cb_acquire_rate_token(endpoint_class, priority):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Blocks until a request of the given endpoint class may be sent. Waiting requests are
+    # served by priority (lowest first) and in arrival order within the same priority.
+
+    import heapq
+    import time
+    bucket = cb_get_rate_bucket(endpoint_class)
+    stats = CB_SCHEDULER['stats'][endpoint_class]
+    started_at = time.monotonic()
+    with bucket['condition']:
+        bucket['sequence'] += 1
+        ticket = (priority, bucket['sequence'])
+        heapq.heappush(bucket['waiting'], ticket)
+        while True:
+            now = time.monotonic()
+            bucket['tokens'] = min(bucket['rate'], bucket['tokens'] + (now - bucket['updated_at']) * bucket['rate'])
+            bucket['updated_at'] = now
+            if bucket['waiting'][0] == ticket:
+                if now >= bucket['blocked_until'] and bucket['tokens'] >= 1:
+                    heapq.heappop(bucket['waiting'])
+                    bucket['tokens'] -= 1
+                    bucket['condition'].notify_all()
+                    break
+                # Only the first request in line waits for the next token, all others wait for their turn
+                bucket['condition'].wait(max(bucket['blocked_until'] - now, (1 - bucket['tokens']) / bucket['rate'], 0.001))
+            else:
+                bucket['condition'].wait()
+    waited = time.monotonic() - started_at
+    with CB_SCHEDULER['lock']:
+        stats['requests'] += 1
+        if waited > 0.001:
+            stats['throttled'] += 1
+            stats['wait_seconds'] += waited
+    metrics_observe(f'rate_limit_wait_seconds {endpoint_class}', waited)
+
+def cb_get_retry_delay(response, attempt):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the seconds to wait before retrying a rejected request: the Retry-After header if
+    # Coinbase sent one, otherwise an exponential backoff with full jitter (capped at 30 seconds).
+    # response is None if the request failed without a response (e.g. a connection error).
+
+    import random
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+def cb_send_request(endpoint_class, priority, send_request, retry_statuses, retry_errors=()):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Sends a request through the scheduler: waits for a token of the endpoint class, calls
+    # send_request() and retries responses with one of the given retry_statuses (and exceptions
+    # of the given retry_errors types) up to CB_HTTP_MAX_RETRIES times. After a 429 the whole
+    # endpoint class is paused for the retry delay. Returns the last response.
+
+    import os
+    import time
+    max_retries = int(os.environ.get('CB_HTTP_MAX_RETRIES') or 5)
+    attempt = 0
+    while True:
+        cb_acquire_rate_token(endpoint_class, priority)
+        started_at = time.perf_counter()
+        try:
+            response = send_request()
+        except Exception as err:
+            metrics_increment(f'http_errors {endpoint_class} {type(err).__name__}')
+            if not isinstance(err, retry_errors) or attempt >= max_retries:
+                raise
+            delay = cb_get_retry_delay(None, attempt)
+            print(f'Request error {err}, retrying in {delay:.2f}s')
+            with CB_SCHEDULER['lock']:
+                CB_SCHEDULER['stats'][endpoint_class]['retries'] += 1
+            attempt += 1
+            time.sleep(delay)
+            continue
+        endpoint = get_endpoint_name(response.url)
+        metrics_increment(f'http_requests {endpoint} {response.status_code}')
+        metrics_observe(f'http_latency_seconds {endpoint}', time.perf_counter() - started_at)
+        if response.status_code not in retry_statuses or attempt >= max_retries:
+            return response
+        delay = cb_get_retry_delay(response, attempt)
+        if response.status_code == 429:
+            bucket = cb_get_rate_bucket(endpoint_class)
+            with bucket['condition']:
+                bucket['blocked_until'] = max(bucket['blocked_until'], time.monotonic() + delay)
+        print(f'HTTP status {response.status_code} for {response.url}, retrying in {delay:.2f}s')
+        with CB_SCHEDULER['lock']:
+            CB_SCHEDULER['stats'][endpoint_class]['retries'] += 1
+        attempt += 1
+        time.sleep(delay)
+
+def cb_get_scheduler_stats():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary per endpoint class with the number of requests sent, how many of them
+    # had to wait for the rate limit, the total seconds waited and the number of retries
+
+    with CB_SCHEDULER['lock']:
+        return {endpoint_class: dict(stats) for endpoint_class, stats in CB_SCHEDULER['stats'].items()}
+
+def cb_pub_connect(url, *args, **kwargs):
+
+    # Version: 1.03
+    # Last Updated: Oct-17-2026
 
     # Establishes a connection to the public coinbase API with the given URL and arguments
+    # Errors (e.g. requests.HTTPError once the retries are used up or for a 4xx response) are
+    # printed and raised again, so the caller never receives None.
 
     import requests
-    from urllib.error import HTTPError
+    session = cb_get_session(url)
+    priority = kwargs.get('priority', CB_PRIORITY_DATA)
     try:
         if kwargs.get('param', None) is not None:
             params = kwargs.get('param')
-            response = requests.get(url,params)
+            response = cb_send_request('public', priority,
+                lambda: session.get(url, params=params, timeout=cb_get_timeout()), CB_RETRY_STATUSES)
         else:
-            response = requests.get(url)
+            response = cb_send_request('public', priority,
+                lambda: session.get(url, timeout=cb_get_timeout()), CB_RETRY_STATUSES)
         response.raise_for_status()
         print(f'HTTP connection {url} successful!')
         return response
-    except HTTPError as http_err:
+    except requests.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
-        #return http_err
+        raise
     except Exception as err:
         print(f'Other error occurred: {err}')
-        #return err
+        raise
 
 def cb_auth_get_connect(url_path, *args, **kwargs):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.04
+    # Last Updated: Oct-17-2026
 
     # Establishes an authenticated connection to the coinbase API with the given URL, limit and cursor
+    # Errors are printed and raised again like in cb_pub_connect().
 
-    import hmac
-    import hashlib
-    import requests
-    import time
     import json
-    import os
-    from urllib.error import HTTPError
-    CB_API_KEY = os.environ.get('API_KEY')
-    CB_SECRET_KEY = os.environ.get('API_SECRET')
-    url_prefix = 'https://coinbase.com'
+    import requests
+    url_prefix = cb_get_api_url('brokerage')
     url = url_prefix + url_path
-    secret_key = CB_SECRET_KEY
-    api_key = CB_API_KEY
-    timestamp = str(int(time.time()))
-    method = 'GET'
     body = ''
     if kwargs.get('body', None) is not None:
             body = kwargs.get('body')
             body = json.dumps(body)
-    message = timestamp + method + url_path.split('?')[0] + body
-    signature = hmac.new(secret_key.encode('utf-8'), message.encode('utf-8'), digestmod=hashlib.sha256).digest()
-    headers = {'accept': 'application/json',
-        'CB-ACCESS-SIGN':signature.hex(),
-        'CB-ACCESS-KEY':api_key,
-        'CB-ACCESS-TIMESTAMP': timestamp}
+    cb_get_credentials()
+    session = cb_get_session(url)
+    priority = kwargs.get('priority', CB_PRIORITY_DATA)
+    # The request is signed again for every attempt since the signature timestamp expires
     try:
         if kwargs.get('param', None) is not None:
             params = kwargs.get('param')
-            response = requests.get(url, params, headers=headers)
+            response = cb_send_request('private', priority,
+                lambda: session.get(url, params=params, headers=cb_auth_headers('GET', url_path, body), timeout=cb_get_timeout()), CB_RETRY_STATUSES)
         else:
-            response = requests.get(url, headers=headers)
+            response = cb_send_request('private', priority,
+                lambda: session.get(url, headers=cb_auth_headers('GET', url_path, body), timeout=cb_get_timeout()), CB_RETRY_STATUSES)
         response.raise_for_status()
         print(f'HTTP connection {url} successful!')
         return response
-    except HTTPError as http_err:
+    except requests.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
-        #return http_err
+        raise
     except Exception as err:
         print(f'Other error occurred: {err}')
-        #return err
+        raise
 
 def cb_auth_post_connect(url_path, *args, **kwargs):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.05
+    # Last Updated: Oct-17-2026
 
     # Establishes an authenticated connection to the coinbase API with the given URL, limit and cursor
+    # Errors are printed and raised again like in cb_pub_connect().
 
-    import hmac
-    import hashlib
-    import requests
-    import time
-    import os
-    from urllib.error import HTTPError
     import json
-    CB_API_KEY = os.environ.get('API_KEY')
-    CB_SECRET_KEY = os.environ.get('API_SECRET')
-    url_prefix = 'https://coinbase.com'
+    import requests
+    url_prefix = cb_get_api_url('brokerage')
     url = url_prefix + url_path
-    secret_key = CB_SECRET_KEY
-    api_key = CB_API_KEY
-    timestamp = str(int(time.time()))
-    method = 'POST'
     body = ''
     if kwargs.get('body', None) is not None:
         body = kwargs.get('body')
-    message = timestamp + method + url_path.split('?')[0] + json.dumps(body)
-    signature = hmac.new(secret_key.encode('utf-8'), message.encode('utf-8'), digestmod=hashlib.sha256).digest()
-    headers = {'accept': 'application/json',
-        'CB-ACCESS-SIGN':signature.hex(),
-        'CB-ACCESS-KEY':api_key,
-        'CB-ACCESS-TIMESTAMP': timestamp}
+    cb_get_credentials()
+    session = cb_get_session(url)
+    priority = kwargs.get('priority', CB_PRIORITY_DATA)
+    # A POST may already have been processed when a 5xx or a connection error occurs, so only
+    # requests rejected by the rate limit (429) are retried unless the caller marks the request
+    # as idempotent (e.g. an order with a deterministic client_order_id)
+    retry_statuses, retry_errors = (429,), ()
+    if kwargs.get('idempotent', False):
+        retry_statuses, retry_errors = CB_RETRY_STATUSES, (requests.ConnectionError, requests.Timeout)
     try:
         if kwargs.get('param', None) is not None:
             params = kwargs.get('param')
-            response = requests.post(url, params, headers=headers, json=body)
+            response = cb_send_request('private', priority,
+                lambda: session.post(url, params=params, headers=cb_auth_headers('POST', url_path, json.dumps(body)), json=body, timeout=cb_get_timeout()), retry_statuses, retry_errors)
         else:
-            response = requests.post(url, headers=headers, json=body)
+            response = cb_send_request('private', priority,
+                lambda: session.post(url, headers=cb_auth_headers('POST', url_path, json.dumps(body)), json=body, timeout=cb_get_timeout()), retry_statuses, retry_errors)
         response.raise_for_status()
         print(f'HTTP connection {url} successful!')
         return response
-    except HTTPError as http_err:
+    except requests.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
-        #return http_err
+        raise
     except Exception as err:
         print(f'Other error occurred: {err}')
-        #return err
+        raise
 
-def cb_get_product_info(product_id):
+# Product metadata (increments etc.) rarely changes, so it is kept per product_id for
+# PRODUCT_CACHE_TTL_SECONDS. The least recently used entries are evicted once the cache holds
+# more than PRODUCT_CACHE_MAX_ENTRIES products. The precision of each product is precomputed.
+PRODUCT_CACHE = {'products': collections.OrderedDict(), 'stats': {'hits': 0, 'misses': 0}, 'lock': threading.Lock()}
+
+def cb_load_product_cache():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Fills the product cache in bulk from the Coinbase product listing
+
+    import json
+    import time
+    products = json.loads(cb_pub_connect(cb_get_api_url('exchange')+'/products').text)
+    with PRODUCT_CACHE['lock']:
+        for product in products:
+            cb_put_product_cache(product, time.monotonic())
+
+def cb_put_product_cache(product, loaded_at):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Adds the given product to the product cache together with its precision (base/quote decimals)
+
+    import os
+    max_entries = int(os.environ.get('PRODUCT_CACHE_MAX_ENTRIES') or 1000)
+    PRODUCT_CACHE['products'][product['id']] = {'product': product,
+        'base_decimals': get_decimal_places(product['base_increment']),
+        'quote_decimals': get_decimal_places(product['quote_increment']),
+        'loaded_at': loaded_at}
+    PRODUCT_CACHE['products'].move_to_end(product['id'])
+    while len(PRODUCT_CACHE['products']) > max_entries:
+        PRODUCT_CACHE['products'].popitem(last=False)
+
+def cb_get_product_cache_entry(product_id):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Returns the product cache entry for the given product_id. Expired entries are evicted.
+    # On a miss, the whole product listing is loaded once; only if the product is still missing
+    # afterwards, the single product is requested. The request is sent without holding the cache
+    # lock, so lookups of other products do not wait for it.
+
+    import json
+    import os
+    import time
+    ttl_seconds = float(os.environ.get('PRODUCT_CACHE_TTL_SECONDS') or 3600)
+    with PRODUCT_CACHE['lock']:
+        entry = PRODUCT_CACHE['products'].get(product_id)
+        if entry is not None and time.monotonic() - entry['loaded_at'] < ttl_seconds:
+            PRODUCT_CACHE['stats']['hits'] += 1
+            PRODUCT_CACHE['products'].move_to_end(product_id)
+            return entry
+        PRODUCT_CACHE['stats']['misses'] += 1
+        PRODUCT_CACHE['products'].pop(product_id, None)
+    cb_load_product_cache()
+    with PRODUCT_CACHE['lock']:
+        entry = PRODUCT_CACHE['products'].get(product_id)
+    if entry is not None:
+        return entry
+    product = json.loads(cb_pub_connect(cb_get_api_url('exchange')+f'/products/{product_id}').text)
+    with PRODUCT_CACHE['lock']:
+        cb_put_product_cache(product, time.monotonic())
+        return PRODUCT_CACHE['products'][product_id]
+
+def cb_get_product_cache_stats():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the number of hits and misses of the product cache
+
+    return dict(PRODUCT_CACHE['stats'])
+
+def cb_get_product_info(product_id):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
 
     # Returns basic product related information for the given product_id
 
+    return cb_get_product_cache_entry(product_id)['product']
+
+def cb_get_product_precision(product_id):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the number of decimals of the base and the quote increment for the given product_id
+
+    entry = cb_get_product_cache_entry(product_id)
+    return entry['base_decimals'], entry['quote_decimals']
+
+# Offset between the local clock and the Coinbase server clock. It is measured once and then
+# only refreshed after CB_CLOCK_SYNC_INTERVAL_SECONDS. While a bot run is in progress, run_time
+# holds the server time at the start of the run so that all currencies use the same "now".
+CLOCK_SYNC = {'offset': None, 'synced_at': None, 'run_time': None, 'lock': threading.Lock()}
+
+def cb_sync_server_clock(force=False):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Measures the offset in seconds between the Coinbase server clock and the local clock.
+    # The server time is assumed to be taken half way through the request (round trip time / 2).
+
     import json
-    product = json.loads(cb_pub_connect(f'https://api.exchange.coinbase.com/products/{product_id}').text)
-    return product
+    import os
+    import time
+    sync_interval = float(os.environ.get('CB_CLOCK_SYNC_INTERVAL_SECONDS') or 900)
+    with CLOCK_SYNC['lock']:
+        if not force and CLOCK_SYNC['offset'] is not None and time.monotonic() - CLOCK_SYNC['synced_at'] < sync_interval:
+            return CLOCK_SYNC['offset']
+        request_sent = time.time()
+        server_time = json.loads(cb_pub_connect(cb_get_api_url('exchange')+'/time').text)
+        response_received = time.time()
+        CLOCK_SYNC['offset'] = float(server_time['epoch']) - (request_sent + response_received) / 2
+        CLOCK_SYNC['synced_at'] = time.monotonic()
+        return CLOCK_SYNC['offset']
 
 def cb_get_server_time():
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
     # Returns the current time of the server as datetime (typically UK timezone).
+    # The time is derived from the local clock and the measured server clock offset. During a bot
+    # run, the server time at the start of the run is returned.
 
-    from datetime import datetime
-    import json
-    server_time = json.loads(cb_pub_connect('https://api.exchange.coinbase.com/time').text)
-    return datetime.fromisoformat(server_time['iso'].replace('T', ' ', 1)[0:19])
+    from datetime import datetime, timezone
+    import time
+    if CLOCK_SYNC['run_time'] is not None:
+        return CLOCK_SYNC['run_time']
+    server_epoch = time.time() + cb_sync_server_clock()
+    return datetime.fromtimestamp(int(server_epoch), tz=timezone.utc).replace(tzinfo=None)
 
-def cb_get_24h_data(quote_currency, crypto_currencies):
+def cb_start_run_clock():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Freezes the server time for the current bot run and returns it. The frozen time is shared by
+    # the whole process, so only one run may hold it at a time (see BOT_RUN).
+
+    CLOCK_SYNC['run_time'] = None
+    CLOCK_SYNC['run_time'] = cb_get_server_time()
+    return CLOCK_SYNC['run_time']
+
+def cb_stop_run_clock():
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Releases the server time frozen by cb_start_run_clock()
+
+    CLOCK_SYNC['run_time'] = None
+
+def cb_fetch_concurrent(fetch_function, items):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Calls fetch_function once per item with at most CB_MAX_CONCURRENT_REQUESTS calls in flight
+    # and returns the results as a list in the same order as the given items. With a limit of 1
+    # the calls are made one after the other like before.
+
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    max_workers = int(os.environ.get('CB_MAX_CONCURRENT_REQUESTS') or 8)
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fetch_function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(fetch_function, items))
+
+def cb_get_24h_data(quote_currency, crypto_currencies):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
 
     # Returns a pandas dataframe which contains one row per chosen crypto currency
     # For each currency, basic information such as open, high, low, volume is returned
@@ -157,10 +819,9 @@ def cb_get_24h_data(quote_currency, crypto_currencies):
 
     import pandas as pd
     import json
-    currency_rows = []
-    for currency in crypto_currencies:
-        data = json.loads(cb_pub_connect('https://api.exchange.coinbase.com/products/'+currency+'-'+quote_currency+'/stats').text)
-        currency_rows.append(data)
+    def get_stats(currency):
+        return json.loads(cb_pub_connect(cb_get_api_url('exchange')+'/products/'+currency+'-'+quote_currency+'/stats').text)
+    currency_rows = cb_fetch_concurrent(get_stats, crypto_currencies)
     df_24h_data = pd.DataFrame(currency_rows, index = crypto_currencies)
     df_24h_data['base_currency'] = df_24h_data.index
     df_24h_data['quote_currency'] = quote_currency
@@ -177,138 +838,1067 @@ def cb_get_24h_data(quote_currency, crypto_currencies):
 
 def cb_get_last_buy_fill_date(product_id):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
 
     # Returns the date of the last settled buy order for the given product id.
     # In case no settled buy order is found, None is returned. 
+    # Fills are read newest to oldest page by page and the download stops at the first page that
+    # contains a settled buy fill of the product (typically the first page).
 
-    from datetime import datetime
-    import pandas as pd
     try:
-        #fills_gen = cbp_client.get_fills(product_id)
-        #all_fills = list(fills_gen)
-        df_fills = cb_get_aggregated_fills(product_id)
-        df_fills = df_fills.sort_values(['date'], ascending=False) #newest to oldest
-        df_fills = df_fills.query('side == \'BUY\' and trade_type == \'FILL\'').head(1)
-        last_fill_date = df_fills['date'].iloc[0]
-        # Must remove timezone awareness to do a comparison in the investment decision later on
-        last_fill_date = datetime.fromisoformat(str(last_fill_date)).replace(tzinfo=None)
-        return last_fill_date
+        last_fill_dates = {}
+        for fills in cb_iter_fills({'product_id': product_id}):
+            last_fill_dates = get_last_buy_fill_dates_from_records(fills, [product_id])
+            if len(last_fill_dates) > 0:
+                break
+        return last_fill_dates.get(product_id)
     except:
         return None
 
+def cb_get_last_buy_fill_dates(product_ids):
 
-def cb_get_fills(product_id='', order_id=''):
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the date of the last settled buy order per given product id.
+    # All fills are fetched once and reduced in one pass instead of one fills download per product.
+    # In case no settled buy order is found for a product, its date is None.
+    # If the fills ledger is in use (in memory or stored in BOT_DATA_PATH), the fills are read from
+    # it; else fills are read newest to oldest until a settled buy fill was found for every product.
+
+    import os
+    last_fill_dates = dict.fromkeys(product_ids)
+    try:
+        if FILLS_LEDGER['fills'] is not None or os.environ.get('BOT_DATA_PATH'):
+            last_fill_dates.update(get_last_buy_fill_dates_from_records(cb_get_fill_records(), product_ids))
+        else:
+            for fills in cb_iter_fills({}):
+                for product_id, last_fill_date in get_last_buy_fill_dates_from_records(fills, product_ids).items():
+                    if last_fill_dates[product_id] is None or last_fill_date > last_fill_dates[product_id]:
+                        last_fill_dates[product_id] = last_fill_date
+                if None not in last_fill_dates.values():
+                    break
+    except:
+        pass
+    return last_fill_dates
+
+def get_last_buy_fill_dates_from_records(fills, product_ids):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the date (rounded down to the minute, without timezone) of the
+    # newest settled buy fill per product id for the given fill records. Products without a
+    # settled buy fill in the records are left out.
+
+    import pandas as pd
+    product_codes = [get_fill_category_code('product_id', product_id) for product_id in product_ids]
+    is_buy_fill = (fills['side'] == get_fill_category_code('side', 'BUY')) & (fills['trade_type'] == get_fill_category_code('trade_type', 'FILL'))
+    last_fill_dates = {}
+    for product_id, product_code in zip(product_ids, product_codes):
+        trade_times = fills['trade_time'][is_buy_fill & (fills['product_id'] == product_code)]
+        if product_code >= 0 and len(trade_times) > 0:
+            # Must remove timezone awareness to do a comparison in the investment decision later on
+            last_fill_dates[product_id] = pd.Timestamp(trade_times.max()).floor('min').to_pydatetime()
+    return last_fill_dates
+
+def cb_get_recent_buy_fill_dates(product_ids, since):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
 
-    # Returns a pandas dataframe which contains all fills. One line per fill
-    # Optionally, can pass the product_id (like BTC-EUR)
+    # Returns a dictionary per given product id that maps the order id of every settled buy fill
+    # at or after since (datetime without timezone) to the date of its newest fill (rounded down to
+    # the minute). If the fills ledger is in use, the fills are read from it; else fills are read
+    # newest to oldest until the first page that reaches back before since.
 
-    import json
+    import os
+    import numpy as np
+    buy_fill_dates = {product_id: {} for product_id in product_ids}
+    try:
+        if FILLS_LEDGER['fills'] is not None or os.environ.get('BOT_DATA_PATH'):
+            pages = [cb_get_fill_records()]
+        else:
+            pages = cb_iter_fills({})
+        for fills in pages:
+            for product_id, order_dates in get_buy_fill_dates_by_order_from_records(fills, product_ids, since).items():
+                for order_id, fill_date in order_dates.items():
+                    if order_id not in buy_fill_dates[product_id] or fill_date > buy_fill_dates[product_id][order_id]:
+                        buy_fill_dates[product_id][order_id] = fill_date
+            if len(fills['trade_time']) == 0 or fills['trade_time'].min() < np.datetime64(since, 'ns'):
+                break
+    except:
+        pass
+    return buy_fill_dates
+
+def get_buy_fill_dates_by_order_from_records(fills, product_ids, since):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary per product id that maps the order id of every settled buy fill at or
+    # after since in the given fill records to the date of its newest fill (rounded down to the
+    # minute, without timezone). Products without such a fill are left out.
+
+    import numpy as np
+    import pandas as pd
+    is_buy_fill = (fills['side'] == get_fill_category_code('side', 'BUY')) & (fills['trade_type'] == get_fill_category_code('trade_type', 'FILL')) \
+        & (fills['trade_time'] >= np.datetime64(since, 'ns'))
+    order_ids = FILL_CATEGORIES['values']['order_id']
+    buy_fill_dates = {}
+    for product_id in product_ids:
+        product_code = get_fill_category_code('product_id', product_id)
+        if product_code < 0:
+            continue
+        is_product_fill = is_buy_fill & (fills['product_id'] == product_code)
+        for order_code, trade_time in zip(fills['order_id'][is_product_fill], fills['trade_time'][is_product_fill]):
+            order_dates = buy_fill_dates.setdefault(product_id, {})
+            fill_date = pd.Timestamp(trade_time).floor('min').to_pydatetime()
+            order_id = order_ids[order_code]
+            if order_id not in order_dates or fill_date > order_dates[order_id]:
+                order_dates[order_id] = fill_date
+    return buy_fill_dates
+
+# Fills are kept as compact records: a dictionary with one numpy array per field. Repeating text
+# fields (order_id, product_id, side etc.) are stored as int32 codes into FILL_CATEGORIES, which
+# is shared by all fill records so that codes can be compared and combined directly.
+FILL_COLUMNS = ['entry_id','trade_id','order_id','trade_time','trade_type','price','size','commission',
+    'product_id','sequence_timestamp','liquidity_indicator','size_in_quote','user_id','side']
+FILL_ID_COLUMNS = ['entry_id','trade_id']
+FILL_NUMBER_COLUMNS = ['price','size','commission']
+FILL_TIME_COLUMNS = ['trade_time','sequence_timestamp']
+FILL_CATEGORY_COLUMNS = ['order_id','trade_type','product_id','liquidity_indicator','user_id','side']
+FILL_CATEGORIES = {'values': {column: [] for column in FILL_CATEGORY_COLUMNS},
+    'codes': {column: {} for column in FILL_CATEGORY_COLUMNS}, 'lock': threading.Lock()}
+
+def encode_fill_categories(column, values):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the int32 codes of the given values of a category column; new values are added
+
+    import numpy as np
+    with FILL_CATEGORIES['lock']:
+        codes = FILL_CATEGORIES['codes'][column]
+        category_values = FILL_CATEGORIES['values'][column]
+        encoded = np.empty(len(values), dtype='int32')
+        for position, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(category_values)
+                category_values.append(value)
+            encoded[position] = code
+        return encoded
+
+def get_fill_category_code(column, value):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the code of the given value of a category column or -1 if the value is unknown
+
+    return FILL_CATEGORIES['codes'][column].get(value, -1)
+
+def parse_utc_timestamps(values):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the given RFC 3339 UTC timestamps (e.g. 2023-02-06T10:00:00.123Z) as datetime64[ns]
+
+    import numpy as np
+    return np.array([np.datetime64(value[:-1] if value.endswith('Z') else value.replace('+00:00', ''), 'ns') for value in values], dtype='datetime64[ns]')
+
+def fills_to_records(fills):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the given fills (list of dictionaries as returned by Coinbase) as fill records
+
+    import numpy as np
+    records = {}
+    for column in FILL_ID_COLUMNS:
+        records[column] = np.array([fill.get(column, '') for fill in fills], dtype='S')
+    for column in FILL_NUMBER_COLUMNS:
+        records[column] = np.array([fill.get(column) or 'nan' for fill in fills], dtype='float64')
+    for column in FILL_TIME_COLUMNS:
+        records[column] = parse_utc_timestamps([fill[column] for fill in fills])
+    for column in FILL_CATEGORY_COLUMNS:
+        records[column] = encode_fill_categories(column, [fill.get(column, '') for fill in fills])
+    records['size_in_quote'] = np.array([bool(fill.get('size_in_quote')) for fill in fills], dtype=bool)
+    return records
+
+def concat_fill_records(records_list):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns one set of fill records containing all given sets of fill records in the given order
+
+    import numpy as np
+    if len(records_list) == 0:
+        return fills_to_records([])
+    return {column: np.concatenate([records[column] for records in records_list]) for column in FILL_COLUMNS}
+
+def take_fill_records(records, positions):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the fill records at the given positions (array of positions or boolean mask)
+
+    return {column: values[positions] for column, values in records.items()}
+
+def fill_records_to_dataframe(records):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the given fill records as pandas dataframe with one line per fill and the same
+    # columns as the Coinbase fills response. Numbers are floats and times are UTC timestamps.
+
+    import numpy as np
     import pandas as pd
+    df_fills = pd.DataFrame(index=pd.RangeIndex(len(records['entry_id'])))
+    for column in FILL_COLUMNS:
+        values = records[column]
+        if column in FILL_ID_COLUMNS:
+            df_fills[column] = np.char.decode(values, 'utf-8').astype(object)
+        elif column in FILL_CATEGORY_COLUMNS:
+            df_fills[column] = np.array(FILL_CATEGORIES['values'][column] + [None], dtype=object)[values]
+        elif column in FILL_TIME_COLUMNS:
+            df_fills[column] = pd.to_datetime(values, utc=True)
+        else:
+            df_fills[column] = values
+    return df_fills
+
+def cb_iter_fills(params):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Yields the fills matching the given query parameters page by page as fill records (newest to
+    # oldest). The order is requested explicitly with sort_by=TRADE_TIME, since the callers stop
+    # at the first page that is older than what they need. The next page is only requested once
+    # the caller asks for it, so a caller can stop as soon as it found what it needs.
+
+    import json
     # Attention: unlike with other Coinbase calls, the json does not return a has_next parameter!
     has_next = True
     cursor = ''
-    lst_fills = []
     url_path = '/api/v3/brokerage/orders/historical/fills'
+    while has_next:
+        page_params = dict(params, limit=200, cursor=cursor, sort_by='TRADE_TIME')
+        response = cb_auth_get_connect(url_path=url_path, param = page_params)
+        json_fills = json.loads(response.text)
+        yield fills_to_records(json_fills['fills'])
+        cursor = json_fills['cursor']
+        if cursor == '':
+            has_next = False
+
+def cb_download_fills(params):
+
+    # Version: 1.03
+    # Last Updated: Oct-17-2026
+
+    # Downloads all fills matching the given query parameters by following the cursor and
+    # returns them as fill records (newest to oldest, see cb_iter_fills)
+
+    return concat_fill_records(list(cb_iter_fills(params)))
+
+# Local copy of all fills of the account. Fills are kept as fill records (newest to oldest)
+# together with indexes (positions per product_id and per order_id code). The watermark is the
+# newest sequence timestamp in the ledger; a sync only downloads fills from that point onwards.
+FILLS_LEDGER = {'fills': None, 'watermark': None, 'by_product': {}, 'by_order': {}, 'synced_at': None, 'lock': threading.Lock()}
+
+def group_positions(codes):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the positions of every code in the given array of codes
+
+    import numpy as np
+    order = np.argsort(codes, kind='stable')
+    unique_codes, starts = np.unique(codes[order], return_index=True)
+    return dict(zip(unique_codes.tolist(), np.split(order, starts[1:])))
+
+def fills_ledger_index(fills):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Replaces the fills in the ledger and rebuilds the product_id and order_id indexes
+
+    import numpy as np
+    FILLS_LEDGER['fills'] = fills
+    FILLS_LEDGER['by_product'] = group_positions(fills['product_id'])
+    FILLS_LEDGER['by_order'] = group_positions(fills['order_id'])
+    if len(fills['sequence_timestamp']) > 0:
+        # Truncated to microseconds, the fill at the watermark is downloaded again and dropped as duplicate
+        FILLS_LEDGER['watermark'] = np.datetime_as_string(fills['sequence_timestamp'].max(), unit='us') + 'Z'
+    else:
+        FILLS_LEDGER['watermark'] = None
+
+def fills_ledger_load():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns the fills stored in BOT_DATA_PATH or None if there is no (readable) ledger
+
+    import io
+    import os
+    import numpy as np
+    if not os.environ.get('BOT_DATA_PATH'):
+        return None
+    data = bot_data_read_blob('fills/ledger.npz')
+    if data is None:
+        return None
     try:
-        while has_next:
-            #params = {'limit':200, 'cursor':cursor, 'product_id':product_id, 'order_id':order_id}
-            params = {'limit':200, 'cursor':cursor, 'product_id':product_id, 'order_id':order_id}
-            response = cb_auth_get_connect(url_path=url_path, param = params)
-            json_fills = json.loads(response.text)
-            tmp_df_fills = pd.json_normalize(json_fills, record_path =['fills'])
-            tmp_lst_fills = tmp_df_fills.values.tolist() 
-            lst_fills.extend(tmp_lst_fills)
-            cursor = json_fills['cursor']
-            if cursor == '':
-                has_next = False
-        df_fills = pd.DataFrame(lst_fills)
-        df_fills.columns = tmp_df_fills.columns.values.tolist()
-        return df_fills
+        with np.load(io.BytesIO(data)) as npz:
+            fills = {column: npz[column] for column in FILL_COLUMNS}
+            for column in FILL_CATEGORY_COLUMNS:
+                # Stored codes refer to the stored categories, so they are mapped to the current ones
+                stored_categories = npz[f'categories_{column}'].tolist()
+                fills[column] = np.append(encode_fill_categories(column, stored_categories), -1)[fills[column]]
+        return fills
+    except Exception as err:
+        print(f'Fills ledger could not be read, full resync needed: {err}')
+        return None
+
+def fills_ledger_save():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Writes the fills of the ledger to BOT_DATA_PATH (if set)
+
+    import io
+    import os
+    import numpy as np
+    if os.environ.get('BOT_DATA_PATH'):
+        buffer = io.BytesIO()
+        categories = {f'categories_{column}': np.array(FILL_CATEGORIES['values'][column], dtype=str) for column in FILL_CATEGORY_COLUMNS}
+        np.savez_compressed(buffer, **FILLS_LEDGER['fills'], **categories)
+        bot_data_write_blob('fills/ledger.npz', buffer.getvalue())
+
+def fills_ledger_sync(full_resync=False, max_age_seconds=None):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Brings the fills ledger up to date. Only fills at or after the watermark are downloaded and
+    # merged into the ledger (duplicates are dropped by entry_id). A sync is skipped in case the
+    # last sync is younger than max_age_seconds. With full_resync the ledger is thrown away and the
+    # whole fills history is downloaded again, e.g. in case the stored ledger is corrupted.
+
+    import os
+    import time
+    import numpy as np
+    if max_age_seconds is None:
+        max_age_seconds = float(os.environ.get('FILLS_LEDGER_MAX_AGE_SECONDS') or 60)
+    if os.environ.get('FILLS_LEDGER_FULL_RESYNC', '').lower() == 'true':
+        full_resync = True
+    with FILLS_LEDGER['lock']:
+        if not full_resync and FILLS_LEDGER['synced_at'] is not None and time.monotonic() - FILLS_LEDGER['synced_at'] < max_age_seconds:
+            return
+        if not full_resync and FILLS_LEDGER['fills'] is None:
+            stored_fills = fills_ledger_load()
+            if stored_fills is None:
+                full_resync = True
+            else:
+                fills_ledger_index(stored_fills)
+        if full_resync:
+            fills_ledger_index(cb_download_fills({}))
+        else:
+            if FILLS_LEDGER['watermark'] is not None:
+                new_fills = cb_download_fills({'start_sequence_timestamp': FILLS_LEDGER['watermark']})
+                new_fills = take_fill_records(new_fills, ~np.isin(new_fills['entry_id'], FILLS_LEDGER['fills']['entry_id']))
+                if len(new_fills['entry_id']) > 0:
+                    fills_ledger_index(concat_fill_records([new_fills, FILLS_LEDGER['fills']]))
+        fills_ledger_save()
+        FILLS_LEDGER['synced_at'] = time.monotonic()
+
+def cb_get_fill_records(product_id='', order_id=''):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the fill records for the given product_id and/or order_id (all fills if none is
+    # given). Fills are served from the fills ledger which is synced incrementally before the lookup.
+
+    import numpy as np
+    fills_ledger_sync()
+    if order_id != '' and get_fill_category_code('order_id', order_id) not in FILLS_LEDGER['by_order']:
+        # Order might have been filled after the last sync
+        fills_ledger_sync(max_age_seconds=0)
+    positions = None
+    empty_positions = np.zeros(0, dtype='int64')
+    if product_id != '':
+        positions = FILLS_LEDGER['by_product'].get(get_fill_category_code('product_id', product_id), empty_positions)
+    if order_id != '':
+        order_positions = FILLS_LEDGER['by_order'].get(get_fill_category_code('order_id', order_id), empty_positions)
+        positions = order_positions if positions is None else np.intersect1d(positions, order_positions)
+    if positions is None:
+        return FILLS_LEDGER['fills']
+    return take_fill_records(FILLS_LEDGER['fills'], np.sort(positions))
+
+def cb_get_fills(product_id='', order_id=''):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Returns a pandas dataframe which contains all fills. One line per fill
+    # Optionally, can pass the product_id (like BTC-EUR)
+    # Fills are served from the fills ledger which is synced incrementally before the lookup.
+
+    try:
+        return fill_records_to_dataframe(cb_get_fill_records(product_id=product_id, order_id=order_id))
     except:
         return None
 
 def cb_get_aggregated_fills(product_id='', order_id=''):
 
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns a pandas dataframe which contains all fills in a nicer aggregated way.
+    # One line per fill. Optionally, can pass the product_id (like BTC-EUR)
+
+    df_fills = cb_get_fills(product_id=product_id, order_id=order_id)
+    return aggregate_fills(df_fills)
+
+def aggregate_fills(df_fills):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the given fills dataframe aggregated per order, price, side and minute (None if the
+    # fills cannot be aggregated)
+
+    import pandas as pd
+    try:
+        df_fills['price'] = df_fills['price'].astype(float)
+        df_fills['size'] = df_fills['size'].astype(float)
+        df_fills['commission'] = df_fills['commission'].astype(float)
+        df_fills['total_price'] = df_fills['size'] + df_fills['commission']
+        df_fills['date'] = pd.to_datetime(df_fills['trade_time']).dt.floor('Min')
+        df_fills_agg = df_fills.groupby(['order_id','trade_type','product_id','price','size_in_quote', 'side', 'date'], as_index =False)[['size','commission','total_price']].sum()
+        return df_fills_agg
+    except:
+        return None
+
+def cb_get_aggregated_fills_by_order_ids(order_ids):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the first aggregated fill line (like cb_get_aggregated_fills(order_id=...)
+    # .iloc[0]) per given order id. Orders without fills are left out. The fills of all orders are
+    # read in one go: from the fills ledger if it is in use, else with multi-order requests of up to
+    # FILLS_ORDER_IDS_PER_REQUEST order ids each. All fills are aggregated in one groupby.
+
+    import os
+    import numpy as np
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) == 0:
+        return {}
+    if FILLS_LEDGER['fills'] is not None or os.environ.get('BOT_DATA_PATH'):
+        fills = cb_get_fill_records()
+        if not all(get_fill_category_code('order_id', order_id) in FILLS_LEDGER['by_order'] for order_id in order_ids):
+            # Orders might have been filled after the last sync
+            fills_ledger_sync(max_age_seconds=0)
+            fills = FILLS_LEDGER['fills']
+    else:
+        ids_per_request = int(os.environ.get('FILLS_ORDER_IDS_PER_REQUEST') or 50)
+        fills = concat_fill_records([page for chunk_start in range(0, len(order_ids), ids_per_request)
+            for page in cb_iter_fills({'order_ids': order_ids[chunk_start:chunk_start+ids_per_request]})])
+    order_codes = [get_fill_category_code('order_id', order_id) for order_id in order_ids]
+    fills = take_fill_records(fills, np.isin(fills['order_id'], order_codes))
+    df_fills_agg = aggregate_fills(fill_records_to_dataframe(fills))
+    if df_fills_agg is None:
+        return {}
+    df_fills_agg = df_fills_agg.drop_duplicates('order_id', keep='first')
+    return {row['order_id']: row for _, row in df_fills_agg.iterrows()}
+
+def bot_data_read_blob(blob_name):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the bytes stored under the given blob name in the bot data location BOT_DATA_PATH
+    # or None if the blob does not exist. BOT_DATA_PATH is either a local folder (e.g. /tmp/bot-data)
+    # or a Google Cloud Storage location (e.g. gs://my-bucket/bot-data).
+
+    import os
+    data_path = os.environ.get('BOT_DATA_PATH')
+    if data_path.startswith('gs://'):
+        from google.cloud import storage
+        from google.api_core.exceptions import NotFound
+        bucket_name, _, prefix = data_path[5:].partition('/')
+        blob = storage.Client().bucket(bucket_name).blob('/'.join(filter(None, [prefix, blob_name])))
+        try:
+            return blob.download_as_bytes()
+        except NotFound:
+            return None
+    file_path = os.path.join(data_path, blob_name)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+def bot_data_write_blob(blob_name, data):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Stores the given bytes under the given blob name in the bot data location BOT_DATA_PATH.
+    # Local files are replaced atomically so that a crash never leaves a half written blob.
+
+    import os
+    data_path = os.environ.get('BOT_DATA_PATH')
+    if data_path.startswith('gs://'):
+        from google.cloud import storage
+        bucket_name, _, prefix = data_path[5:].partition('/')
+        blob = storage.Client().bucket(bucket_name).blob('/'.join(filter(None, [prefix, blob_name])))
+        blob.upload_from_string(data)
+        return
+    file_path = os.path.join(data_path, blob_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_file_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_file_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_file_path, file_path)
+
+# History period in seconds the bot loads per interval (see cb_get_enhanced_history()); the candle
+# store keeps the same period by default
+HISTORY_PERIOD_SECONDS = {'1MIN': 2 * 3600, '15MIN': 75 * 3600, '60MIN': 300 * 3600, 'DAILY': 90 * 86400}
+
+# Candles already downloaded per (product_id, interval). Each series is stored column by column
+# as numpy arrays sorted from oldest to newest, so the last time value is the high-water mark.
+CANDLE_STORE = {'series': {}, 'stats': {'cache': 0, 'network': 0}, 'lock': threading.Lock()}
+CANDLE_COLUMNS = ['time','low','high','open','close','volume']
+CANDLES_PER_REQUEST = 300
+
+def candle_store_load(product_id, interval):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the stored candle series for the given product and interval as a dictionary of
+    # numpy arrays. On a cold start the series is read from BOT_DATA_PATH; None if nothing is stored.
+
+    import io
+    import numpy as np
+    key = (product_id, interval)
+    if key not in CANDLE_STORE['series']:
+        data = bot_data_read_blob(f'candles/{product_id}_{interval}.npz')
+        if data is None:
+            return None
+        with np.load(io.BytesIO(data)) as npz:
+            CANDLE_STORE['series'][key] = {column: npz[column] for column in CANDLE_COLUMNS}
+    return CANDLE_STORE['series'][key]
+
+def candle_store_save(product_id, interval, series):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Keeps the given candle series in memory and writes it to BOT_DATA_PATH
+
+    import io
+    import numpy as np
+    CANDLE_STORE['series'][(product_id, interval)] = series
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **series)
+    bot_data_write_blob(f'candles/{product_id}_{interval}.npz', buffer.getvalue())
+
+def candle_store_get_retention_seconds(interval, requested_seconds):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the seconds of candles the candle store keeps for the given interval: the history
+    # period the bot loads for the interval (see HISTORY_PERIOD_SECONDS) or the requested range if
+    # it is longer. Longer retention (e.g. for the backtest) is opt-in via
+    # CANDLE_STORE_RETENTION_DAYS, a JSON object with the days per interval like '{"60MIN": 30}'.
+
+    import json
+    import os
+    retention_days = json.loads(os.environ.get('CANDLE_STORE_RETENTION_DAYS') or '{}')
+    if interval in retention_days:
+        return float(retention_days[interval]) * 86400
+    return max(HISTORY_PERIOD_SECONDS[interval], requested_seconds)
+
+def candle_store_get_stats():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns how many candles were served from the candle store and how many were downloaded
+
+    return dict(CANDLE_STORE['stats'])
+
+def to_epoch_seconds(value):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the unix timestamp for the given datetime or ISO string. Timestamps without
+    # timezone are treated as UTC like the Coinbase server time.
+
+    from datetime import datetime, timezone
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def cb_get_historic_data(start_date, end_date, interval, base_currency, quote_currency):
+
+    # Version: 1.06
+    # Last Updated: Oct-17-2026
+
+    # Returns candle records with historic information for the given currency and interval: one
+    # numpy array per candle column (oldest to newest) plus the base_currency and granularity tags.
+    # Use candle_records_to_dataframe() to convert them into a pandas dataframe.
+    # Any time range can be requested; it is fetched in windows of up to 300 candles.
+    # In case BOT_DATA_PATH is set, candles are kept in the candle store and only candles newer than
+    # the stored high-water mark are downloaded. The newest stored candle is always downloaded
+    # again since it may still have been open when it was stored. The store keeps the candles of
+    # the retention period of the interval (see candle_store_get_retention_seconds()), also if a
+    # request asks for a shorter range.
+
+    import json
+    import os
+    import numpy as np
+    from datetime import datetime, timezone
+    VALID_INTERVAL = {'DAILY', '60MIN', '15MIN', '1MIN'}
+    if interval not in VALID_INTERVAL:
+        raise ValueError("results: interval must be one of %r." % VALID_INTERVAL)
+    if interval == '1MIN':
+        granularity = '60'
+    elif interval == '15MIN':
+        granularity = '900'
+    elif interval == '60MIN':
+        granularity = '3600'
+    else: # DAILY as the default
+        granularity = '86400'
+    product_id = quote_currency+'-'+base_currency
+    series = None
+    if os.environ.get('BOT_DATA_PATH'):
+        series = candle_store_load(product_id, interval)
+    start_epoch = to_epoch_seconds(start_date)
+    if series is not None and len(series['time']) > 0 and series['time'][-1] < start_epoch:
+        # The stored candles end before the requested range; keeping them would leave a gap
+        series = None
+    if series is not None and len(series['time']) > 0 and series['time'][0] < start_epoch + int(granularity):
+        fetch_start_date = datetime.fromtimestamp(int(series['time'][-1]), tz=timezone.utc).replace(tzinfo=None).isoformat()
+    else:
+        fetch_start_date = start_date
+    # Coinbase returns at most 300 candles per request, so longer ranges are split into windows of
+    # 300 candles which are requested in parallel and merged (duplicate candles dropped)
+    fetch_start_epoch = to_epoch_seconds(fetch_start_date)
+    end_epoch = to_epoch_seconds(end_date)
+    window_seconds = CANDLES_PER_REQUEST * int(granularity)
+    windows = [(window_start, min(window_start + window_seconds, end_epoch)) for window_start in range(fetch_start_epoch, max(end_epoch, fetch_start_epoch + 1), window_seconds)]
+    def get_window(window):
+        params = {'start':datetime.fromtimestamp(window[0], tz=timezone.utc).replace(tzinfo=None).isoformat(),
+            'end':datetime.fromtimestamp(window[1], tz=timezone.utc).replace(tzinfo=None).isoformat(),
+            'granularity':granularity}
+        data = json.loads(cb_pub_connect(cb_get_api_url('exchange')+'/products/'+product_id+'/candles',
+            param = params).text)
+        return np.array(data, dtype=float).reshape(-1, len(CANDLE_COLUMNS))
+    network_candles = np.concatenate(cb_fetch_concurrent(get_window, windows))
+    network_candles = network_candles[np.unique(network_candles[:, 0], return_index=True)[1]]
+    if os.environ.get('BOT_DATA_PATH'):
+        # The downloaded candles are merged into the whole stored series (stored candles outside
+        # the downloaded range are kept); only the returned candles are limited to the range
+        if series is None:
+            kept_rows = np.zeros(0, dtype=bool)
+        elif len(network_candles) > 0:
+            kept_rows = (series['time'] < network_candles[0, 0]) | (series['time'] > network_candles[-1, 0])
+        else:
+            kept_rows = np.ones(len(series['time']), dtype=bool)
+        new_series = {}
+        for position, column in enumerate(CANDLE_COLUMNS):
+            stored_values = series[column][kept_rows] if series is not None else np.zeros(0)
+            new_series[column] = np.concatenate([stored_values, network_candles[:, position]]).astype('int64' if column == 'time' else 'float64')
+        order = np.argsort(new_series['time'], kind='stable')
+        new_series = {column: values[order] for column, values in new_series.items()}
+        in_range = (new_series['time'] >= start_epoch) & (new_series['time'] <= end_epoch)
+        candles = {column: new_series[column][in_range] for column in CANDLE_COLUMNS}
+        retained = new_series['time'] >= end_epoch - candle_store_get_retention_seconds(interval, end_epoch - start_epoch)
+        candle_store_save(product_id, interval, {column: values[retained] for column, values in new_series.items()})
+        with CANDLE_STORE['lock']:
+            CANDLE_STORE['stats']['cache'] += int((kept_rows & (series['time'] >= start_epoch)).sum()) if series is not None else 0
+            CANDLE_STORE['stats']['network'] += len(network_candles)
+    else:
+        candles = {column: network_candles[:, position].astype('int64' if column == 'time' else 'float64') for position, column in enumerate(CANDLE_COLUMNS)}
+    candles['base_currency'] = quote_currency
+    candles['granularity'] = interval
+    return candles
+
+def candle_records_to_dataframe(candles_list):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the given list of candle records as one pandas dataframe with the columns time, low,
+    # high, open, close, volume, base_currency and granularity
+
+    import numpy as np
+    import pandas as pd
+    df_candles = pd.DataFrame({column: np.concatenate([np.zeros(0, dtype='int64' if column == 'time' else 'float64')] + [candles[column] for candles in candles_list])
+        for column in CANDLE_COLUMNS})
+    candle_counts = [len(candles['time']) for candles in candles_list]
+    for column in ['base_currency', 'granularity']:
+        df_candles[column] = np.repeat(np.array([candles[column] for candles in candles_list], dtype=object), candle_counts)
+    return df_candles
+
+def get_indicator_matrix(values, group_ids, group_positions, group_count, group_length):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a 2D numpy array with one row per (currency, granularity) group and one column per
+    # period (oldest to newest). Groups shorter than the longest group are padded with NaN at the end.
+
+    import numpy as np
+    matrix = np.full((group_count, group_length), np.nan)
+    matrix[group_ids, group_positions] = values
+    return matrix
+
+def get_rolling_matrix(matrix, window, function):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Applies the given numpy function (e.g. np.mean) to a rolling window along every row of the
+    # given matrix. The first window-1 periods of each row are NaN like with pandas rolling().
+
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    result = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] >= window:
+        result[:, window-1:] = function(sliding_window_view(matrix, window, axis=1), axis=2)
+    return result
+
+def get_ewm_matrix(matrix, alpha, min_periods=0):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the exponentially weighted mean along every row of the given matrix like pandas
+    # ewm(alpha=alpha, adjust=False).mean(). All groups are updated together per period.
+
+    import numpy as np
+    result = np.empty(matrix.shape)
+    result[:, 0] = matrix[:, 0]
+    for period in range(1, matrix.shape[1]):
+        result[:, period] = (1 - alpha) * result[:, period-1] + alpha * matrix[:, period]
+    if min_periods > 1:
+        result[:, :min_periods-1] = np.nan
+    return result
+
+def get_bollinger_bands(sma, std, band_width=2):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the lower and upper Bollinger band for the given moving average and standard
+    # deviation (scalars or numpy arrays). The bot trades with a band width of 2 standard
+    # deviations; other widths are used by the backtest.
+
+    return sma - band_width * std, sma + band_width * std
+
+# Indicator columns per indicator of BOT_INDICATORS (see get_indicator_selection()) and the
+# smoothing periods of the average true range
+INDICATOR_COLUMNS = {'BOLLINGER': ['SMA20','SMA20_std','bb_low','bb_up'],
+    'EMA': ['EMA12','EMA26'],
+    'MACD': ['EMA12','EMA26','MACD','MACD_signal','macd_histogram'],
+    'ATR': ['true_range','average_true_range']}
+AVERAGE_TRUE_RANGE_PERIODS = 14
+
+def get_indicator_selection(indicators=None):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the list of indicators to calculate: the given list or else the environment variable
+    # BOT_INDICATORS. The Bollinger bands always come first, since the buy rule needs them; the
+    # setting only adds further indicators.
+
+    import json
+    import os
+    if indicators is None:
+        indicators = json.loads(os.environ.get('BOT_INDICATORS') or '["BOLLINGER"]')
+    if not set(indicators) <= set(INDICATOR_COLUMNS):
+        raise ValueError("results: indicators must be part of %r." % set(INDICATOR_COLUMNS))
+    return ['BOLLINGER'] + [indicator for indicator in indicators if indicator != 'BOLLINGER']
+
+def add_indicators(df_history, indicators=None):
+
+    # Version: 1.03
+    # Last Updated: Oct-17-2026
+
+    # Returns the given history dataframe sorted by base_currency, granularity and date with
+    # indicator columns added for all currencies and granularities at once. The Bollinger bands are
+    # always added; further indicators can be chosen via the list indicators or the environment
+    # variable BOT_INDICATORS (see get_indicator_selection()):
+    # - BOLLINGER: SMA20, SMA20_std, bb_low, bb_up (always)
+    # - EMA: EMA12, EMA26
+    # - MACD: EMA12, EMA26, MACD, MACD_signal, macd_histogram, bull_bear
+    # - ATR: true_range, average_true_range
+
+    import numpy as np
+    indicators = get_indicator_selection(indicators)
+    # Oldest to newest date sorting per currency and granularity needed for all indicators
+    df_history_enhanced = df_history.sort_values(['base_currency','granularity','date'], ascending=True, kind='mergesort').reset_index(drop=True)
+    row_count = len(df_history_enhanced)
+    if row_count == 0:
+        return df_history_enhanced
+    base_currencies = df_history_enhanced['base_currency'].to_numpy()
+    granularities = df_history_enhanced['granularity'].to_numpy()
+    group_starts = np.r_[True, (base_currencies[1:] != base_currencies[:-1]) | (granularities[1:] != granularities[:-1])]
+    group_ids = np.cumsum(group_starts) - 1
+    group_positions = np.arange(row_count) - np.flatnonzero(group_starts)[group_ids]
+    group_count = int(group_ids[-1]) + 1
+    group_length = int(group_positions.max()) + 1
+    def to_matrix(column):
+        return get_indicator_matrix(df_history_enhanced[column].to_numpy(dtype=float), group_ids, group_positions, group_count, group_length)
+    def to_column(matrix):
+        return matrix[group_ids, group_positions]
+    close = to_matrix('close')
+    if 'BOLLINGER' in indicators:
+        sma20 = get_rolling_matrix(close, 20, np.mean)
+        sma20_std = get_rolling_matrix(close, 20, lambda windows, axis: np.std(windows, axis=axis, ddof=1))
+        df_history_enhanced['SMA20'] = to_column(sma20)
+        df_history_enhanced['SMA20_std'] = to_column(sma20_std)
+        bb_low, bb_up = get_bollinger_bands(sma20, sma20_std)
+        df_history_enhanced['bb_low'] = to_column(bb_low)
+        df_history_enhanced['bb_up'] = to_column(bb_up)
+    if 'EMA' in indicators or 'MACD' in indicators:
+        ema12 = get_ewm_matrix(close, 2 / (12 + 1))
+        ema26 = get_ewm_matrix(close, 2 / (26 + 1))
+        df_history_enhanced['EMA12'] = to_column(ema12)
+        df_history_enhanced['EMA26'] = to_column(ema26)
+    if 'MACD' in indicators:
+        macd = ema12 - ema26
+        macd_signal = get_ewm_matrix(macd, 2 / (9 + 1))
+        df_history_enhanced['MACD'] = to_column(macd)
+        df_history_enhanced['MACD_signal'] = to_column(macd_signal)
+        df_history_enhanced['macd_histogram'] = to_column(macd - macd_signal)
+        df_history_enhanced['bull_bear'] = np.where(df_history_enhanced['macd_histogram'] < 0, 'Bear', 'Bull')
+    if 'ATR' in indicators:
+        high = to_matrix('high')
+        low = to_matrix('low')
+        previous_close = np.full(close.shape, np.nan)
+        previous_close[:, 1:] = close[:, :-1]
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+        df_history_enhanced['true_range'] = to_column(true_range)
+        df_history_enhanced['average_true_range'] = to_column(get_ewm_matrix(true_range, 1 / AVERAGE_TRUE_RANGE_PERIODS, AVERAGE_TRUE_RANGE_PERIODS))
+    return df_history_enhanced
+
+# Indicator state per "product|granularity" for the streaming indicator mode. The state holds the
+# accumulators as of the newest closed candle (time), so each new candle is added in constant time.
+INDICATOR_STATE = {'states': None}
+# Indicator columns whose values do not depend on the start of the history window
+VERIFIED_INDICATOR_COLUMNS = ['SMA20','SMA20_std','bb_low','bb_up','true_range']
+
+def update_indicator_state(state, close, high, low):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Adds one candle to the given indicator state and returns the indicator values for it.
+    # Rolling sum and sum of squares give SMA20 and its standard deviation; EMA, MACD signal and
+    # ATR are exponentially smoothed like pandas ewm(adjust=False).
+
+    import math
+    values = {}
+    state['closes'].append(close)
+    state['sum'] += close
+    state['sumsq'] += close * close
+    if len(state['closes']) > 20:
+        dropped_close = state['closes'].pop(0)
+        state['sum'] -= dropped_close
+        state['sumsq'] -= dropped_close * dropped_close
+    if len(state['closes']) == 20:
+        values['SMA20'] = state['sum'] / 20
+        values['SMA20_std'] = math.sqrt(max(state['sumsq'] - state['sum'] * state['sum'] / 20, 0) / 19)
+    else:
+        values['SMA20'] = values['SMA20_std'] = math.nan
+    values['bb_low'], values['bb_up'] = get_bollinger_bands(values['SMA20'], values['SMA20_std'])
+    if state['ema12'] is None:
+        state['ema12'] = state['ema26'] = close
+    else:
+        state['ema12'] += 2 / (12 + 1) * (close - state['ema12'])
+        state['ema26'] += 2 / (26 + 1) * (close - state['ema26'])
+    values['EMA12'] = state['ema12']
+    values['EMA26'] = state['ema26']
+    values['MACD'] = state['ema12'] - state['ema26']
+    if state['macd_signal'] is None:
+        state['macd_signal'] = values['MACD']
+    else:
+        state['macd_signal'] += 2 / (9 + 1) * (values['MACD'] - state['macd_signal'])
+    values['MACD_signal'] = state['macd_signal']
+    values['macd_histogram'] = values['MACD'] - state['macd_signal']
+    if state['close'] is None:
+        values['true_range'] = high - low
+    else:
+        values['true_range'] = max(high - low, abs(high - state['close']), abs(low - state['close']))
+    if state['atr'] is None:
+        state['atr'] = values['true_range']
+    else:
+        state['atr'] += (values['true_range'] - state['atr']) / AVERAGE_TRUE_RANGE_PERIODS
+    state['atr_count'] += 1
+    values['average_true_range'] = state['atr'] if state['atr_count'] >= AVERAGE_TRUE_RANGE_PERIODS else math.nan
+    state['close'] = close
+    return values
+
+def load_indicator_states():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the indicator states; on a cold start they are read from BOT_DATA_PATH (if set)
+
+    import json
+    import os
+    if INDICATOR_STATE['states'] is None:
+        data = bot_data_read_blob('indicators/state.json') if os.environ.get('BOT_DATA_PATH') else None
+        INDICATOR_STATE['states'] = json.loads(data.decode('utf-8')) if data is not None else {}
+    return INDICATOR_STATE['states']
+
+def save_indicator_states():
+
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
 
-    # Returns a pandas dataframe which contains all fills in a nicer aggregated way.
-    # One line per fill. Optionally, can pass the product_id (like BTC-EUR)
+    # Writes the indicator states to BOT_DATA_PATH (if set). The rolling sums are recalculated from
+    # the stored closes first so that rounding errors cannot add up over many runs.
 
-    import pandas as pd
-    df_fills = cb_get_fills(product_id=product_id, order_id=order_id)
-    try:
-        df_fills['price'] = df_fills['price'].astype(float)
-        df_fills['size'] = df_fills['size'].astype(float)
-        df_fills['commission'] = df_fills['commission'].astype(float)
-        df_fills['total_price'] = df_fills['size'] + df_fills['commission']
-        df_fills['date'] = pd.to_datetime(df_fills['trade_time']).dt.floor('Min')
-        df_fills_agg = df_fills.groupby(['order_id','trade_type','product_id','price','size_in_quote', 'side', 'date'], as_index =False)[['size','commission','total_price']].sum()
-        return df_fills_agg
-    except:
-        return None
+    import json
+    import math
+    import os
+    for state in INDICATOR_STATE['states'].values():
+        state['sum'] = math.fsum(state['closes'])
+        state['sumsq'] = math.fsum(close * close for close in state['closes'])
+    if os.environ.get('BOT_DATA_PATH'):
+        bot_data_write_blob('indicators/state.json', json.dumps(INDICATOR_STATE['states']).encode('utf-8'))
 
-def cb_get_historic_data(start_date, end_date, interval, base_currency, quote_currency):
+def add_streaming_indicators(df_history, indicators=None):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
 
-    # Returns a pandas dataframe with historic information for the given currency and interval
+    # Returns the same dataframe as add_indicators(), but the indicators are only calculated for
+    # candles newer than the last closed candle of the previous run, using the stored indicator
+    # state (older rows are NaN). The newest candle may still be open, so its values are calculated
+    # on a copy of the state and the candle is only added to the state once a newer candle exists.
+    # In case there is no state yet, or the state is older than the given history, the state is
+    # built from the whole history.
 
-    import json
-    VALID_INTERVAL = {'DAILY', '60MIN', '15MIN', '1MIN'}
-    if interval not in VALID_INTERVAL:
-        raise ValueError("results: interval must be one of %r." % VALID_INTERVAL)
-    if interval == '1MIN':
-        granularity = '60'
-    elif interval == '15MIN':
-        granularity = '900'
-    elif interval == '60MIN':
-        granularity = '3600'
-    else: # DAILY as the default
-        granularity = '86400'
-    params = {'start':start_date, 'end':end_date, 'granularity':granularity}
-    data = json.loads(cb_pub_connect('https://api.exchange.coinbase.com/products/'+quote_currency+'-'+base_currency+'/candles',
-        param = params).text)
-    [x.append(quote_currency) for x in data]
-    [x.append(interval) for x in data]
-    return data
+    import copy
+    import numpy as np
+    indicators = get_indicator_selection(indicators)
+    df_history_enhanced = df_history.sort_values(['base_currency','granularity','date'], ascending=True, kind='mergesort').reset_index(drop=True)
+    columns = list(dict.fromkeys(column for indicator in indicators for column in INDICATOR_COLUMNS[indicator]))
+    values = {column: np.full(len(df_history_enhanced), np.nan) for column in columns}
+    states = load_indicator_states()
+    times = df_history_enhanced['time'].to_numpy()
+    closes = df_history_enhanced['close'].to_numpy(dtype=float)
+    highs = df_history_enhanced['high'].to_numpy(dtype=float)
+    lows = df_history_enhanced['low'].to_numpy(dtype=float)
+    for (base_currency, granularity), positions in df_history_enhanced.groupby(['base_currency','granularity'], sort=False).indices.items():
+        quote_currency = df_history_enhanced['quote_currency'].iat[positions[0]]
+        key = f'{base_currency}-{quote_currency}|{granularity}'
+        state = states.get(key)
+        if state is None or state['time'] < times[positions[0]]:
+            state = {'time': None, 'closes': [], 'sum': 0.0, 'sumsq': 0.0, 'ema12': None, 'ema26': None,
+                'macd_signal': None, 'close': None, 'atr': None, 'atr_count': 0}
+            states[key] = state
+        for number, position in enumerate(positions):
+            if state['time'] is not None and times[position] <= state['time']:
+                continue
+            if number == len(positions) - 1:
+                candle_values = update_indicator_state(copy.deepcopy(state), closes[position], highs[position], lows[position])
+            else:
+                candle_values = update_indicator_state(state, closes[position], highs[position], lows[position])
+                state['time'] = int(times[position])
+            for column in columns:
+                values[column][position] = candle_values[column]
+    for column in columns:
+        df_history_enhanced[column] = values[column]
+    if 'MACD' in indicators:
+        df_history_enhanced['bull_bear'] = np.where(df_history_enhanced['macd_histogram'] < 0, 'Bear', 'Bull')
+    save_indicator_states()
+    return df_history_enhanced
+
+def verify_streaming_indicators(df_streaming, df_full, tolerance=None):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Compares the values of the streaming indicators with a full recalculation (both sorted the
+    # same way) and returns the largest relative deviation per column. Only rows calculated by the
+    # streaming mode are compared, and only the columns that do not depend on where the history
+    # window starts (VERIFIED_INDICATOR_COLUMNS): the exponential averages (EMA, MACD, average
+    # true range) of the streaming state start at the first candle ever seen, those of the full
+    # recalculation at the first candle of the window. The true range of the first candle of a
+    # window is skipped as well since the full recalculation has no previous close for it.
+
+    import os
+    import numpy as np
+    if tolerance is None:
+        tolerance = float(os.environ.get('BOT_INDICATOR_VERIFY_TOLERANCE') or 1e-6)
+    reference_scale = np.nanmax(np.abs(df_full['close'].to_numpy(dtype=float))) * 1e-9
+    base_currencies = df_full['base_currency'].to_numpy()
+    granularities = df_full['granularity'].to_numpy()
+    first_rows = np.r_[True, (base_currencies[1:] != base_currencies[:-1]) | (granularities[1:] != granularities[:-1])]
+    deviations = {}
+    for column in [column for column in VERIFIED_INDICATOR_COLUMNS if column in df_streaming.columns and column in df_full.columns]:
+        streaming_values = df_streaming[column].to_numpy(dtype=float)
+        full_values = df_full[column].to_numpy(dtype=float)
+        compared = ~np.isnan(streaming_values)
+        if column == 'true_range':
+            compared &= ~first_rows
+        if not compared.any():
+            continue
+        deviation = np.abs(streaming_values[compared] - full_values[compared]) / np.maximum(np.abs(full_values[compared]), reference_scale)
+        # A value that only exists in one of both calculations counts as an infinite deviation
+        deviations[column] = float(np.max(np.where(np.isnan(deviation), np.inf, deviation)))
+        if deviations[column] > tolerance:
+            print(f'Streaming indicator {column} deviates from full recalculation (max relative deviation {deviations[column]})')
+    return deviations
 
 def cb_get_enhanced_history(quote_currency, crypto_currencies):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.05
+    # Last Updated: Oct-17-2026
 
     # Returns a pandas dataframe with time-sliced information about the choosen crypto currencies
     # One line in the dataframe represents one time-slice per currency.
 
+    import os
+    import json
     from datetime import timedelta
     import pandas as pd
-    import numpy as np
-    GRANULARITIES = ['DAILY','60MIN','15MIN','1MIN']
-    currency_history_rows = []
-    for currency in crypto_currencies:
-        end_date = cb_get_server_time()
-        # 1 minutes data:
-        ##start_date = (end_date - timedelta(hours=2)).isoformat()
-        ##currency_history_rows.extend(cb_get_historic_data(start_date,end_date,'1MIN', quote_currency, currency))
-        # 15 minutes data:
-        ##start_date = (end_date - timedelta(hours=75)).isoformat()
-        ##currency_history_rows.extend(cb_get_historic_data(start_date,end_date,'15MIN', quote_currency, currency))
-        # 60 minutes data:
-        ##start_date = (end_date - timedelta(hours=300)).isoformat()
-        ##currency_history_rows.extend(cb_get_historic_data(start_date,end_date,'60MIN', quote_currency, currency))
-        # Daily data:
-        start_date = (end_date - timedelta(days=90)).isoformat()
-        currency_history_rows.extend(cb_get_historic_data(start_date,end_date,'DAILY', quote_currency, currency))
-    df_history = pd.DataFrame(currency_history_rows)
-    # Add column names in line with the Coinbase documentation
-    df_history.columns = ['time','low','high','open','close','volume','base_currency','granularity']
+    GRANULARITIES = json.loads(os.environ.get('BOT_HISTORY_GRANULARITIES') or '["DAILY","60MIN","15MIN","1MIN"]')
+    end_date = cb_get_server_time()
+    def get_currency_history(currency_granularity):
+        currency, granularity = currency_granularity
+        start_date = (end_date - timedelta(seconds=HISTORY_PERIOD_SECONDS[granularity])).isoformat()
+        return cb_get_historic_data(start_date,end_date,granularity, quote_currency, currency)
+    with metrics_span('history_fetch', currencies=len(crypto_currencies), granularities=len(GRANULARITIES)):
+        currency_history_candles = cb_fetch_concurrent(get_currency_history, [(currency, granularity) for currency in crypto_currencies for granularity in GRANULARITIES])
+    # Column names are in line with the Coinbase documentation
+    df_history = candle_records_to_dataframe(currency_history_candles)
     # We will add a few more columns just for better readability
     df_history['quote_currency'] = quote_currency
     df_history['date'] = pd.to_datetime(df_history['time'], unit='s')
@@ -318,38 +1908,15 @@ def cb_get_enhanced_history(quote_currency, crypto_currencies):
     df_history['hour'] = pd.DatetimeIndex(df_history['date']).hour
     df_history['minute'] = pd.DatetimeIndex(df_history['date']).minute
 
-    #AVERAGE_TRUE_RANGE_PERIODS = 14
-    currency_history_rows_enhanced = []
-    for currency in crypto_currencies:
-        for granularity in GRANULARITIES:
-            df_history_currency = df_history.query('granularity == @granularity & base_currency == @currency').copy()
-            # Oldest to newest date sorting needed for SMA calculation
-            df_history_currency = df_history_currency.sort_values(['date'], ascending=True)
-            df_history_currency['SMA20'] = df_history_currency['close'].rolling(window=20).mean()
-            df_history_currency['SMA20_std'] = df_history_currency['close'].rolling(window=20).std()
-            df_history_currency['bb_low'] =  df_history_currency['SMA20'] - 2 * df_history_currency['SMA20_std']
-            df_history_currency['bb_up'] =  df_history_currency['SMA20'] + 2 * df_history_currency['SMA20_std']
-            #df_history_currency['SMA3'] = df_history_currency['close'].rolling(window=3).mean()
-            #df_history_currency['SMA7'] = df_history_currency['close'].rolling(window=7).mean()
-            #df_history_currency['EMA12'] = df_history_currency['close'].ewm(span=12, adjust=False).mean()
-            #df_history_currency['EMA26'] = df_history_currency['close'].ewm(span=26, adjust=False).mean()
-            #df_history_currency['MACD'] = df_history_currency['EMA12'] - df_history_currency['EMA26']
-            #df_history_currency['MACD_signal'] = df_history_currency['MACD'].ewm(span=9, adjust=False).mean()
-            #df_history_currency['macd_histogram'] = ((df_history_currency['MACD']-df_history_currency['MACD_signal']))
-            #df_history_currency['open_to_close_perf'] = ((df_history_currency['close']-df_history_currency['open']) / df_history_currency['open'])
-            #df_history_currency['high_low_diff'] = (df_history_currency['high']-df_history_currency['low'])
-            #df_history_currency['high_prev_close_abs'] = np.abs(df_history_currency['high'] - df_history_currency['close'].shift())
-            #df_history_currency['low_prev_close_abs'] = np.abs(df_history_currency['low'] - df_history_currency['close'].shift())
-            #df_history_currency['true_range'] = df_history_currency[['high_low_diff', 'high_prev_close_abs', 'low_prev_close_abs']].max(axis=1)
-            #df_history_currency['average_true_range'] = df_history_currency['true_range'].ewm(alpha=1/AVERAGE_TRUE_RANGE_PERIODS, min_periods=AVERAGE_TRUE_RANGE_PERIODS, adjust=False).mean()
-            #df_history_currency['high_low_perf'] = ((df_history_currency['high']-df_history_currency['low']) / df_history_currency['high'])
-            #df_history_currency['open_perf_last_3_period_abs'] = df_history_currency['open'].rolling(window=4).apply(lambda x: x.iloc[1] - x.iloc[0])
-            #df_history_currency['open_perf_last_3_period_per'] = df_history_currency['open'].rolling(window=4).apply(lambda x: (x.iloc[1] - x.iloc[0])/x.iloc[0])
-            #df_history_currency['bull_bear'] = np.where(df_history_currency['macd_histogram']< 0, 'Bear', 'Bull')
-            currency_history_rows_enhanced.append(df_history_currency)
-    df_history_enhanced = pd.concat(currency_history_rows_enhanced, ignore_index=True)
+    indicator_mode = os.environ.get('BOT_INDICATOR_MODE', 'batch')
+    with metrics_span('indicators', mode=indicator_mode, rows=len(df_history)):
+        if indicator_mode == 'streaming':
+            df_history_enhanced = add_streaming_indicators(df_history)
+            if os.environ.get('BOT_INDICATOR_VERIFY', '').lower() == 'true':
+                verify_streaming_indicators(df_history_enhanced, add_indicators(df_history))
+        else:
+            df_history_enhanced = add_indicators(df_history)
     # Last step to tag changes in market trends from one period to the other (sorting important)
-    df_history_enhanced = df_history_enhanced.sort_values(['base_currency','granularity','date'], ascending=True)
     #df_history_enhanced['market_trend_continued'] = df_history_enhanced.bull_bear.eq(df_history_enhanced.bull_bear.shift()) & df_history_enhanced.base_currency.eq(df_history_enhanced.base_currency.shift()) & df_history_enhanced.granularity.eq(df_history_enhanced.granularity.shift())
     return df_history_enhanced
 
@@ -364,59 +1931,375 @@ def get_decimal_places(number):
     import decimal
     return abs(decimal.Decimal(str(number)).as_tuple().exponent)
 
-def fire_create_order_record(doc_id, doc_data):
+# Firestore client shared by all calls of a warm instance and the order records that are waiting
+# to be written. While a batch is open, all merges for the same document are combined and written
+# together (at most FIRESTORE_MAX_BATCH_SIZE operations per commit) when the batch is committed.
+FIRESTORE = {'client': None, 'batch_open': False, 'pending': collections.OrderedDict(),
+    'stats': {'records': 0, 'writes': 0, 'commits': 0}, 'lock': threading.Lock(), 'client_lock': threading.Lock()}
+FIRESTORE_MAX_BATCH_SIZE = 500
+
+def fire_get_client():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns the Firestore client; it is created on first use and then reused
+    # The Firebase app is initialized here instead of at import time to keep cold starts short.
+
+    with FIRESTORE['client_lock']:
+        if FIRESTORE['client'] is None:
+            import firebase_admin
+            from firebase_admin import firestore
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                # Will automatically pull credentials from environment variable
+                firebase_admin.initialize_app()
+            FIRESTORE['client'] = firestore.client()
+    return FIRESTORE['client']
+
+def fire_start_batch():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Starts collecting order records instead of writing each of them immediately. The batch is
+    # shared by the whole process, so only one run may have it open at a time (see BOT_RUN).
+
+    FIRESTORE['batch_open'] = True
+
+def fire_commit_batch(transactional=None):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Writes all collected order records (one merge per document) and closes the batch. Records are
+    # written with Firestore write batches of up to 500 operations. In transactional mode (parameter
+    # or FIRESTORE_WRITE_MODE=transaction) each chunk is written in a transaction instead.
+    # Returns None if successful and else, the error
+
+    import os
+    from firebase_admin import firestore
+    if transactional is None:
+        transactional = os.environ.get('FIRESTORE_WRITE_MODE') == 'transaction'
+    with FIRESTORE['lock']:
+        FIRESTORE['batch_open'] = False
+        pending = list(FIRESTORE['pending'].values())
+        FIRESTORE['pending'].clear()
+    db = fire_get_client()
+    error = None
+    for chunk_start in range(0, len(pending), FIRESTORE_MAX_BATCH_SIZE):
+        chunk = pending[chunk_start:chunk_start+FIRESTORE_MAX_BATCH_SIZE]
+        try:
+            if transactional:
+                @firestore.transactional
+                def write_chunk(transaction):
+                    for ref, doc_data in chunk:
+                        transaction.set(ref, doc_data, merge=True)
+                write_chunk(db.transaction())
+            else:
+                batch = db.batch()
+                for ref, doc_data in chunk:
+                    batch.set(ref, doc_data, merge=True)
+                batch.commit()
+            FIRESTORE['stats']['writes'] += len(chunk)
+            FIRESTORE['stats']['commits'] += 1
+        except Exception as e:
+            # A single invalid record must not cost the other records, so write them one by one
+            print(f'Firestore batch commit failed, writing records one by one: {e}')
+            for ref, doc_data in chunk:
+                try:
+                    ref.set(doc_data, merge=True)
+                    FIRESTORE['stats']['writes'] += 1
+                except Exception as e:
+                    error = e
+                    # The open orders index might now contain records that were never written
+                    OPEN_ORDERS_INDEX['checked_at'] = None
+                FIRESTORE['stats']['commits'] += 1
+    fire_save_open_orders_index()
+    return error
+
+def fire_get_write_stats():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the number of order records, document writes and commits as well as the number of
+    # round trips saved compared to one round trip per order record
+
+    stats = dict(FIRESTORE['stats'])
+    stats['round_trips_saved'] = stats['records'] - stats['commits']
+    return stats
+
+def fire_create_order_record(doc_id, doc_data):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
 
     # Creates a document in the Firestore database containing the given data.
     # Returns the Firestore document ID if successful and else, the error
+    # While a batch is open (see fire_start_batch()), the data is only merged into the pending
+    # record of the document and written with fire_commit_batch().
 
-    import firebase_admin
-    from firebase_admin import firestore
     FIRESTORE_COLLECTION_NAME = 'coinbase-orders'
-    db = firestore.client()
+    db = fire_get_client()
     try:
         #ref = db.collection(FIRESTORE_COLLECTION_NAME).document()
         ref = db.collection(FIRESTORE_COLLECTION_NAME).document(doc_id)
+        with FIRESTORE['lock']:
+            FIRESTORE['stats']['records'] += 1
+            fire_update_open_orders_index(ref.id, doc_data)
+            if FIRESTORE['batch_open']:
+                FIRESTORE['pending'].setdefault(ref.id, (ref, {}))[1].update(doc_data)
+                return ref.id
         ref.set(doc_data, merge=True)
+        FIRESTORE['stats']['writes'] += 1
+        FIRESTORE['stats']['commits'] += 1
+        fire_save_open_orders_index()
         return ref.id
     except Exception as e:
+        OPEN_ORDERS_INDEX['checked_at'] = None
         return e
 
-def fire_get_orders_wo_sell_order_id():
+def fire_get_order_strategies(buy_order_ids):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
 
-    # Returns all orders with an empty sell_order_id from Firestore
+    # Returns a dictionary with the strategy name of the Firestore record per given buy order id
+    # (None if the record does not exist or has no strategy). Records still pending in an open
+    # batch are taken from the batch; the other records are read in one go.
 
-    import firebase_admin
-    from firebase_admin import firestore
     FIRESTORE_COLLECTION_NAME = 'coinbase-orders'
-    db = firestore.client()
-    docs = db.collection(FIRESTORE_COLLECTION_NAME).where(u'sell_order_id', u'==', u'').stream()
+    order_strategies = {}
+    with FIRESTORE['lock']:
+        for buy_order_id in buy_order_ids:
+            pending = FIRESTORE['pending'].get(buy_order_id)
+            if pending is not None and 'strategy' in pending[1]:
+                order_strategies[buy_order_id] = pending[1]['strategy']
+    missing_order_ids = [buy_order_id for buy_order_id in buy_order_ids if buy_order_id not in order_strategies]
+    if len(missing_order_ids) > 0:
+        db = fire_get_client()
+        refs = [db.collection(FIRESTORE_COLLECTION_NAME).document(buy_order_id) for buy_order_id in missing_order_ids]
+        for doc in db.get_all(refs, field_paths=[u'strategy']):
+            order_strategies[doc.id] = (doc.to_dict() or {}).get('strategy')
+    return order_strategies
+
+# Local index of the open orders (documents with an empty sell_order_id) as doc_id -> buy_order_id.
+# It is updated on every order record and stored in BOT_DATA_PATH (if set). checked_at is the time
+# of the last comparison with the Firestore collection; None means the index cannot be trusted.
+# changes holds the updates of this process (doc_id -> buy_order_id, None if closed) that are not
+# yet stored, so they can be merged with the updates of other instances and the streaming worker.
+OPEN_ORDERS_INDEX = {'orders': None, 'checked_at': None, 'changes': {}}
+
+def fire_update_open_orders_index(doc_id, doc_data):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Adds or removes the given order record to/from the open orders index
+
+    if 'sell_order_id' not in doc_data:
+        return
+    if doc_data['sell_order_id'] == '':
+        buy_order_id = doc_data.get('buy_order_id', (OPEN_ORDERS_INDEX['orders'] or {}).get(doc_id, doc_id))
+    else:
+        buy_order_id = None
+    OPEN_ORDERS_INDEX['changes'][doc_id] = buy_order_id
+    if OPEN_ORDERS_INDEX['orders'] is None:
+        return
+    if buy_order_id is not None:
+        OPEN_ORDERS_INDEX['orders'][doc_id] = buy_order_id
+    else:
+        OPEN_ORDERS_INDEX['orders'].pop(doc_id, None)
+
+def fire_load_open_orders_index():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Loads the open orders index from BOT_DATA_PATH. It is read again on every call since other
+    # function instances and the streaming worker update the stored index as well; the changes of
+    # this process that are not yet stored are applied on top. An index this process no longer
+    # trusts (checked_at None) stays untrusted.
+
+    import json
+    import os
+    if not os.environ.get('BOT_DATA_PATH'):
+        return
+    data = bot_data_read_blob('firestore/open_orders.json')
+    if data is None:
+        return
+    stored_index = json.loads(data.decode('utf-8'))
+    untrusted = OPEN_ORDERS_INDEX['orders'] is not None and OPEN_ORDERS_INDEX['checked_at'] is None
+    orders = stored_index['orders']
+    for doc_id, buy_order_id in OPEN_ORDERS_INDEX['changes'].items():
+        if buy_order_id is not None:
+            orders[doc_id] = buy_order_id
+        else:
+            orders.pop(doc_id, None)
+    OPEN_ORDERS_INDEX['orders'] = orders
+    OPEN_ORDERS_INDEX['checked_at'] = None if untrusted else stored_index['checked_at']
+
+def fire_save_open_orders_index(merge=True):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Writes the open orders index to BOT_DATA_PATH (if set). Unless merge is False (the index was
+    # just replaced by the state of the Firestore collection), the stored index is read first and
+    # only the changes of this process are applied to it.
+
+    import json
+    import os
+    if not os.environ.get('BOT_DATA_PATH'):
+        OPEN_ORDERS_INDEX['changes'] = {}
+        return
+    if merge:
+        fire_load_open_orders_index()
+    if OPEN_ORDERS_INDEX['orders'] is not None:
+        bot_data_write_blob('firestore/open_orders.json', json.dumps({'orders': OPEN_ORDERS_INDEX['orders'],
+            'checked_at': OPEN_ORDERS_INDEX['checked_at']}).encode('utf-8'))
+        OPEN_ORDERS_INDEX['changes'] = {}
+
+def fire_query_orders_wo_sell_order_id():
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns all orders with an empty sell_order_id from Firestore. Only the buy_order_id and
+    # strategy fields are read and the results are fetched page by page (FIRESTORE_PAGE_SIZE
+    # documents per page).
+
+    import os
+    FIRESTORE_COLLECTION_NAME = 'coinbase-orders'
+    page_size = int(os.environ.get('FIRESTORE_PAGE_SIZE') or 100)
+    db = fire_get_client()
+    query = db.collection(FIRESTORE_COLLECTION_NAME).where(u'sell_order_id', u'==', u'').select([u'buy_order_id', u'strategy']).order_by(u'__name__').limit(page_size)
+    docs = []
+    last_doc = None
+    while True:
+        page_query = query if last_doc is None else query.start_after(last_doc)
+        page_docs = list(page_query.stream())
+        docs.extend(page_docs)
+        if len(page_docs) < page_size:
+            return docs
+        last_doc = page_docs[-1]
+
+def fire_check_open_orders_index():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Compares the open orders index with the Firestore collection and replaces the index with the
+    # collection's state. Returns the queried documents and the differences that were found
+    # (documents missing in the index and documents in the index that are not open in Firestore).
+
+    import time
+    docs = fire_query_orders_wo_sell_order_id()
+    firestore_orders = {doc.id: (doc.to_dict() or {}).get('buy_order_id', doc.id) for doc in docs}
+    index_orders = OPEN_ORDERS_INDEX['orders'] or {}
+    differences = {'missing_in_index': sorted(set(firestore_orders) - set(index_orders)),
+        'not_open_in_firestore': sorted(set(index_orders) - set(firestore_orders))}
+    if OPEN_ORDERS_INDEX['orders'] is not None and (differences['missing_in_index'] or differences['not_open_in_firestore']):
+        print(f'Open orders index was out of sync with Firestore: {differences}')
+    OPEN_ORDERS_INDEX['orders'] = firestore_orders
+    OPEN_ORDERS_INDEX['checked_at'] = time.time()
+    OPEN_ORDERS_INDEX['changes'] = {}
+    fire_save_open_orders_index(merge=False)
+    return docs, differences
+
+def fire_get_orders_wo_sell_order_id():
+
+    # Version: 1.04
+    # Last Updated: Oct-17-2026
+
+    # Returns all orders with an empty sell_order_id from Firestore
+    # In case the open orders index is trusted and empty, Firestore is not queried at all. The index
+    # is compared with Firestore whenever Firestore is queried, but at least every
+    # OPEN_ORDERS_INDEX_CHECK_SECONDS. Without BOT_DATA_PATH the index only knows the orders of this
+    # process, so it is compared every 60 seconds by default instead of every hour.
+
+    import os
+    import time
+    check_interval = float(os.environ.get('OPEN_ORDERS_INDEX_CHECK_SECONDS') or (3600 if os.environ.get('BOT_DATA_PATH') else 60))
+    fire_load_open_orders_index()
+    if OPEN_ORDERS_INDEX['orders'] is not None and OPEN_ORDERS_INDEX['checked_at'] is not None \
+            and time.time() - OPEN_ORDERS_INDEX['checked_at'] < check_interval and len(OPEN_ORDERS_INDEX['orders']) == 0:
+        return []
+    docs = fire_check_open_orders_index()[0]
     return docs
 
+# 1-minute recommendations from Trading View per "EXCHANGE:SYMBOL". The recommendations are only
+# valid until the next 1-minute candle starts (expires_at as unix timestamp).
+TRADING_VIEW_CACHE = {'recommendations': {}, 'expires_at': 0, 'stats': {'hits': 0, 'misses': 0}, 'lock': threading.Lock()}
+
+def get_trading_view_recommendations(trading_view_symbols):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary with the 1-minute recommendation per "EXCHANGE:SYMBOL" for the given
+    # symbols. All symbols are requested in one multi-symbol request; in case that request fails
+    # (or a symbol is missing in its result), the symbols are requested one by one in parallel.
+    # The scanner URL can be changed via TRADING_VIEW_SCAN_URL (e.g. to a local stand-in).
+    # The requests use the read timeout of cb_get_timeout() as they run while the Trading View
+    # cache is locked.
+
+    import os
+    from tradingview_ta import TA_Handler, Interval, TradingView, get_multiple_analysis
+    if os.environ.get('TRADING_VIEW_SCAN_URL'):
+        TradingView.scan_url = os.environ.get('TRADING_VIEW_SCAN_URL')
+    timeout = cb_get_timeout()[1]
+    symbol_keys = [f'{symbol[1]}:{symbol[2]}'.upper() for symbol in trading_view_symbols]
+    recommendations = {}
+    try:
+        analyses = get_multiple_analysis(screener='crypto', interval=Interval.INTERVAL_1_MINUTE, symbols=symbol_keys, timeout=timeout)
+        for symbol_key, analysis in analyses.items():
+            if analysis is not None:
+                recommendations[symbol_key.upper()] = analysis.summary['RECOMMENDATION']
+    except Exception as err:
+        print(f'Trading View multi-symbol request failed, requesting symbols one by one: {err}')
+    def get_recommendation(symbol):
+        analysis = TA_Handler(
+            symbol=symbol[2],
+            screener="crypto",
+            exchange=symbol[1],
+            interval=Interval.INTERVAL_1_MINUTE,
+            timeout=timeout).get_analysis()
+        return analysis.summary['RECOMMENDATION']
+    missing_symbols = [symbol for symbol, symbol_key in zip(trading_view_symbols, symbol_keys) if symbol_key not in recommendations]
+    for symbol, recommendation in zip(missing_symbols, cb_fetch_concurrent(get_recommendation, missing_symbols)):
+        recommendations[f'{symbol[1]}:{symbol[2]}'.upper()] = recommendation
+    return recommendations
+
 def get_trading_view_signals(trading_view_symbols):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
 
     # Returns a pandas dataframe with 1-minute buy/sell signal from the trading view website 
     # for each chosen crypto currency passed in variable trading_view_symbols. One row in
     # dataframe equals one crypto currency. 
+    # Signals are cached until the next 1-minute candle starts, so repeated runs within the same
+    # minute do not request Trading View again.
 
-    from tradingview_ta import TA_Handler, Interval
+    import time
     import pandas as pd
+    with TRADING_VIEW_CACHE['lock']:
+        now = time.time()
+        if now >= TRADING_VIEW_CACHE['expires_at']:
+            TRADING_VIEW_CACHE['recommendations'] = {}
+            TRADING_VIEW_CACHE['expires_at'] = (int(now) // 60 + 1) * 60
+        cached_recommendations = TRADING_VIEW_CACHE['recommendations']
+        missing_symbols = [symbol for symbol in trading_view_symbols if f'{symbol[1]}:{symbol[2]}'.upper() not in cached_recommendations]
+        TRADING_VIEW_CACHE['stats']['hits'] += len(trading_view_symbols) - len(missing_symbols)
+        TRADING_VIEW_CACHE['stats']['misses'] += len(missing_symbols)
+        if len(missing_symbols) > 0:
+            cached_recommendations.update(get_trading_view_recommendations(missing_symbols))
     trading_view_rows = []
     for symbol in trading_view_symbols:
-        analysis = TA_Handler(
-            symbol=symbol[2],
-            screener="crypto",
-            exchange=symbol[1],
-            interval=Interval.INTERVAL_1_MINUTE).get_analysis()
-        row_data = [symbol[0],analysis.summary["RECOMMENDATION"]]
+        row_data = [symbol[0],cached_recommendations[f'{symbol[1]}:{symbol[2]}'.upper()]]
         trading_view_rows.append(row_data)
 
     df_trading_view_info = pd.DataFrame(trading_view_rows, columns = ['currency',
@@ -424,70 +2307,213 @@ def get_trading_view_signals(trading_view_symbols):
     df_trading_view_info.set_index('currency', inplace=True)
     return df_trading_view_info
 
-def make_investment_decision():
+def is_buy_recommendation(recommendations):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Returns True where the given TradingView recommendation (string or numpy array) is BUY or STRONG_BUY
+
+    import numpy as np
+    return np.isin(recommendations, ['BUY', 'STRONG_BUY'])
+
+def get_buy_decisions(current_values, bb_lows, buy_recommended, hours_since_last_buy, idle_hours):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # The buy rule of make_investment_decision(): returns True where the current value is below
+    # the lower Bollinger band, the signal recommends buying and at least idle_hours have passed
+    # since the last buy (hours_since_last_buy is inf if there was none). Works on scalars as well
+    # as on numpy arrays, e.g. all products and parameter combinations of a backtest at once.
+
+    import numpy as np
+    return (np.asarray(current_values) < bb_lows) & (np.asarray(hours_since_last_buy) >= idle_hours) & buy_recommended
+
+def get_sell_target_prices(buy_base_prices, target_margin_percentage):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # The exit rule of place_sell_orders(): returns the stop limit price that achieves the given
+    # target margin (in percent) for the given buy price(s)
+
+    return buy_base_prices * (1 + target_margin_percentage/100)
+
+def bot_get_strategies():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns the strategy configurations the bot runs. BOT_STRATEGIES is a JSON list of
+    # environment variable prefixes (default ["BOT_ONE"]); every prefix defines one strategy with
+    # <PREFIX>_CRYPTO_CURRENCIES, <PREFIX>_INVEST_EUR, <PREFIX>_IDLE_HOURS_BEFORE_NEXT_PURCHASE
+    # and <PREFIX>_TARGET_MARGIN_PERCENTAGE.
+
+    import os
+    import json
+    strategies = []
+    for name in json.loads(os.environ.get('BOT_STRATEGIES') or '["BOT_ONE"]'):
+        strategies.append({'name': name,
+            'crypto_currencies': json.loads(os.environ[f'{name}_CRYPTO_CURRENCIES']),
+            'invest': float(os.environ.get(f'{name}_INVEST_EUR') or 0),
+            'idle_hours': float(os.environ.get(f'{name}_IDLE_HOURS_BEFORE_NEXT_PURCHASE')),
+            'target_margin_percentage': float(os.environ.get(f'{name}_TARGET_MARGIN_PERCENTAGE'))})
+    return strategies
+
+def bot_get_last_buy_fill_dates(strategies, product_ids, server_time_now):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Returns a dictionary per strategy name with the date of the last settled buy of the strategy
+    # per given product id (None if the strategy did not buy the product within the longest idle
+    # hours of the strategies).
+    # Only buys within the longest idle hours of the strategies can block a purchase, so only
+    # those fills are read. Every buy order is assigned to the strategy of its Firestore record;
+    # buys without a known strategy (e.g. placed by hand) count for the first strategy.
+
+    from datetime import timedelta
+    since = server_time_now - timedelta(hours=max(strategy['idle_hours'] for strategy in strategies))
+    buy_fill_dates = cb_get_recent_buy_fill_dates(product_ids, since)
+    order_strategies = fire_get_order_strategies([order_id for order_dates in buy_fill_dates.values() for order_id in order_dates])
+    last_buy_fill_dates = {strategy['name']: dict.fromkeys(product_ids) for strategy in strategies}
+    for product_id, order_dates in buy_fill_dates.items():
+        for order_id, fill_date in order_dates.items():
+            strategy_name = order_strategies.get(order_id)
+            if strategy_name not in last_buy_fill_dates:
+                strategy_name = strategies[0]['name']
+            last_fill_date = last_buy_fill_dates[strategy_name][product_id]
+            if last_fill_date is None or fill_date > last_fill_date:
+                last_buy_fill_dates[strategy_name][product_id] = fill_date
+    return last_buy_fill_dates
+
+def get_market_snapshot(strategies):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Loads the market data all given strategies need in one go: the union of their watchlists is
+    # fetched once (history with indicators, TradingView signals, 24h stats and the last buy fill
+    # per strategy and product) and every strategy is evaluated against the returned snapshot.
+
+    import os
+    import json
+    quote_currency = os.environ.get('QUOTE_CURRENCY')
+    crypto_currencies = list(dict.fromkeys(currency for strategy in strategies for currency in strategy['crypto_currencies']))
+    trading_view_symbols = [symbol for symbol in json.loads(os.environ['TRADING_VIEW_SYMBOLS']) if symbol[0] in crypto_currencies]
+    with metrics_span('history'):
+        df_historic_data = cb_get_enhanced_history(quote_currency, crypto_currencies)
+        df_historic_data = df_historic_data.sort_values(['date'], ascending=True) #oldest to newest
+    # Only the latest daily lower Bollinger band per currency is needed for the decisions
+    df_daily = df_historic_data[df_historic_data['granularity'] == 'DAILY']
+    bb_lows = df_daily.groupby('base_currency')['bb_low'].last()
+    with metrics_span('signals'):
+        df_trading_view_signals = get_trading_view_signals(trading_view_symbols)
+    with metrics_span('24h_stats'):
+        df_24hstats = cb_get_24h_data(quote_currency, crypto_currencies)
+    server_time_now = cb_get_server_time()
+    with metrics_span('last_buy_fills'):
+        last_buy_fill_dates = bot_get_last_buy_fill_dates(strategies, [currency+'-'+quote_currency for currency in crypto_currencies], server_time_now)
+    return {'quote_currency': quote_currency,
+        'server_time': server_time_now,
+        'bb_lows': bb_lows,
+        'signals': df_trading_view_signals,
+        '24h_stats': df_24hstats,
+        'last_buy_fill_dates': last_buy_fill_dates}
+
+def make_investment_decision(strategy=None, snapshot=None):
+
+    # Version: 1.06
+    # Last Updated: Oct-17-2026
 
     # Will initiate a market buy for a currency in case the following criteria are met:
     # - the trading signal is BUY or STRONG_BUY
     # - the current price is below the lower Bollinger Band
-    # - no buy trade has been completed in the last BOT_ONE_IDLE_HOURS_BEFORE_NEXT_PURCHASE hours 
+    # - no buy trade has been completed in the last <PREFIX>_IDLE_HOURS_BEFORE_NEXT_PURCHASE hours
+    # The given strategy (default: the first of bot_get_strategies()) is evaluated against the
+    # given market snapshot (default: loaded for this strategy only, see get_market_snapshot()).
+    # Only the buys of the strategy itself count for its idle hours (see bot_get_last_buy_fill_dates()).
 
     import pandas as pd
-    import os
-    import json
-    IDLE_HOURS_BEFORE_NEXT_PURCHASE = float(os.environ.get('BOT_ONE_IDLE_HOURS_BEFORE_NEXT_PURCHASE'))
-    BOLLINGER_LOW_INVEST_EUR = float(os.environ.get('BOT_ONE_INVEST_EUR') or 0)
-    MY_CRYPTO_CURRENCIES = json.loads(os.environ['BOT_ONE_CRYPTO_CURRENCIES'])
-    MY_QUOTE_CURRENCY = os.environ.get('QUOTE_CURRENCY')
-    TRADING_VIEW_SYMBOLS = json.loads(os.environ['TRADING_VIEW_SYMBOLS'])
-    df_historic_data = cb_get_enhanced_history(MY_QUOTE_CURRENCY, MY_CRYPTO_CURRENCIES)
-    df_historic_data = df_historic_data.sort_values(['date'], ascending=True) #oldest to newest
-    df_trading_view_signals = get_trading_view_signals(TRADING_VIEW_SYMBOLS)
-    df_24hstats = cb_get_24h_data(MY_QUOTE_CURRENCY, MY_CRYPTO_CURRENCIES)
-    server_time_now = cb_get_server_time()
+    if strategy is None:
+        strategy = bot_get_strategies()[0]
+    if snapshot is None:
+        snapshot = get_market_snapshot([strategy])
+    IDLE_HOURS_BEFORE_NEXT_PURCHASE = strategy['idle_hours']
+    BOLLINGER_LOW_INVEST_EUR = strategy['invest']
+    MY_CRYPTO_CURRENCIES = strategy['crypto_currencies']
+    MY_QUOTE_CURRENCY = snapshot['quote_currency']
+    server_time_now = snapshot['server_time']
+    # A repeated run within the same minute derives the same client_order_ids and therefore
+    # cannot place the same buy order twice; the strategy name keeps the orders of strategies apart
+    decision_key = strategy['name'] + '|' + server_time_now.strftime('%Y-%m-%dT%H:%M')
     order_results = []
-    for currency in MY_CRYPTO_CURRENCIES:
-        product_id = currency+'-'+MY_QUOTE_CURRENCY
-        current_value = df_24hstats.loc[currency]['last']
-        trading_view_recommendation = df_trading_view_signals.loc[currency]['1min_recommendation']
-        bb_low = df_historic_data.query('granularity == \'DAILY\' and base_currency == @currency').tail(1)['bb_low'].iloc[0]
-        last_buy_fill_date = cb_get_last_buy_fill_date(product_id)
-        idle_hours_reached = True
-        if last_buy_fill_date is not None:
-            last_fill_delta = ((server_time_now - last_buy_fill_date).days*86400 + (server_time_now - last_buy_fill_date).seconds)/3600
-            if (last_fill_delta < IDLE_HOURS_BEFORE_NEXT_PURCHASE):
-                idle_hours_reached = False
-        if (current_value < bb_low and idle_hours_reached and (trading_view_recommendation == 'BUY' or trading_view_recommendation == 'STRONG_BUY')):
-            order_id = cb_create_market_order(product_id=product_id, quote_size=BOLLINGER_LOW_INVEST_EUR)
-            fire_doc_id = fire_create_order_record(doc_id=order_id,doc_data={'buy_order_id': order_id, 'bb_low': bb_low, 'trading_view_recommendation': trading_view_recommendation, 'sell_order_id': ''})
-            order_results.append(f'Order now: {product_id}, price: {current_value}{MY_QUOTE_CURRENCY}, amount: {BOLLINGER_LOW_INVEST_EUR}{MY_QUOTE_CURRENCY} and order id {order_id} and Firestore doc id {fire_doc_id}')
-        else:
-            order_results.append(f'No order placed for {currency}; current value: {current_value}{MY_QUOTE_CURRENCY}; bb low: {bb_low}{MY_QUOTE_CURRENCY}; signal: {trading_view_recommendation}; last trade was on {last_buy_fill_date} ({idle_hours_reached})')
+    buy_orders = []
+    with metrics_span('decision_loop', strategy=strategy['name'], currencies=len(MY_CRYPTO_CURRENCIES)):
+        for currency in MY_CRYPTO_CURRENCIES:
+            product_id = currency+'-'+MY_QUOTE_CURRENCY
+            current_value = snapshot['24h_stats'].loc[currency]['last']
+            trading_view_recommendation = snapshot['signals'].loc[currency]['1min_recommendation']
+            bb_low = snapshot['bb_lows'].loc[currency]
+            last_buy_fill_date = snapshot['last_buy_fill_dates'][strategy['name']][product_id]
+            last_fill_delta = float('inf')
+            if last_buy_fill_date is not None:
+                last_fill_delta = ((server_time_now - last_buy_fill_date).days*86400 + (server_time_now - last_buy_fill_date).seconds)/3600
+            idle_hours_reached = last_fill_delta >= IDLE_HOURS_BEFORE_NEXT_PURCHASE
+            if get_buy_decisions(current_value, bb_low, is_buy_recommendation(trading_view_recommendation), last_fill_delta, IDLE_HOURS_BEFORE_NEXT_PURCHASE):
+                buy_orders.append((product_id, current_value, bb_low, trading_view_recommendation))
+            else:
+                order_results.append(f'{strategy["name"]}: No order placed for {currency}; current value: {current_value}{MY_QUOTE_CURRENCY}; bb low: {bb_low}{MY_QUOTE_CURRENCY}; signal: {trading_view_recommendation}; last trade was on {last_buy_fill_date} ({idle_hours_reached})')
+    # All buy orders of this run are placed at the same time
+    with metrics_span('buy_orders', strategy=strategy['name'], orders=len(buy_orders)):
+        buy_order_results = cb_execute_orders([(cb_create_market_order, {'product_id': product_id,
+            'quote_size': BOLLINGER_LOW_INVEST_EUR,
+            'client_order_id': cb_get_client_order_id(product_id, 'BUY', decision_key)}) for product_id, _, _, _ in buy_orders])
+    for (product_id, current_value, bb_low, trading_view_recommendation), order_result in zip(buy_orders, buy_order_results):
+        if not order_result['success']:
+            order_results.append(f'{strategy["name"]}: Order failed: {product_id}, price: {current_value}{MY_QUOTE_CURRENCY}, amount: {BOLLINGER_LOW_INVEST_EUR}{MY_QUOTE_CURRENCY}, client order id {order_result["client_order_id"]}: {order_result["error"]}')
+            continue
+        order_id = order_result['order_id']
+        fire_doc_id = fire_create_order_record(doc_id=order_id,doc_data={'buy_order_id': order_id, 'strategy': strategy['name'], 'bb_low': bb_low, 'trading_view_recommendation': trading_view_recommendation, 'sell_order_id': ''})
+        order_results.append(f'{strategy["name"]}: Order now: {product_id}, price: {current_value}{MY_QUOTE_CURRENCY}, amount: {BOLLINGER_LOW_INVEST_EUR}{MY_QUOTE_CURRENCY} and order id {order_id} and Firestore doc id {fire_doc_id}')
     return pd.DataFrame(order_results)
 
-def place_sell_orders():
+def place_sell_orders(strategies=None):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.06
+    # Last Updated: Oct-17-2026
      
     # Scans through all buy orders in Firestore that do not yet have a sales_order_id.
     # For each buy order during that timeframe, a stop sell order is created that will achieve
-    # the defined target margin. 
+    # the target margin of the strategy that placed the buy order (records without a known
+    # strategy use the first of the given strategies, default: bot_get_strategies()).
 
     import pandas as pd
     from datetime import datetime
-    import os
-    TARGET_MARGIN_PERCENTAGE = float(os.environ.get('BOT_ONE_TARGET_MARGIN_PERCENTAGE'))
-    docs = fire_get_orders_wo_sell_order_id()
-    order_results = []
+    if strategies is None:
+        strategies = bot_get_strategies()
+    target_margin_percentages = {strategy['name']: strategy['target_margin_percentage'] for strategy in strategies}
+    with metrics_span('open_orders'):
+        docs = fire_get_orders_wo_sell_order_id()
+    buy_order_strategies = {}
     for doc in docs:
+        doc_data = doc.to_dict()
+        strategy_name = doc_data.get('strategy')
+        buy_order_strategies[doc_data['buy_order_id']] = strategy_name if strategy_name in target_margin_percentages else strategies[0]['name']
+    buy_order_ids = list(buy_order_strategies)
+    with metrics_span('buy_fills', orders=len(buy_order_ids)):
+        filled_orders = cb_get_aggregated_fills_by_order_ids(buy_order_ids)
+    order_results = []
+    sell_orders = []
+    for buy_order_id in buy_order_ids:
 
         # 1. Add missing data from filled buy orders (since data was not available when document was created)
         #print(f'{doc.id} => {doc.to_dict()}')
-        buy_order_id = doc.to_dict()['buy_order_id']
-        filled_order= cb_get_aggregated_fills(order_id=buy_order_id).iloc[0]
+        if buy_order_id not in filled_orders:
+            order_results.append(f'No fills found yet for market buy order {buy_order_id}; sell order will be created in one of the next runs')
+            continue
+        filled_order = filled_orders[buy_order_id]
         buy_order_id = filled_order['order_id']
         date = filled_order['date']
         product_id = filled_order['product_id']
@@ -498,8 +2524,11 @@ def place_sell_orders():
         buy_quote_size = filled_order['size']
         buy_quote_commission = filled_order['commission']
         buy_quote_total_size = filled_order['total_price']
+        strategy_name = buy_order_strategies[buy_order_id]
+        TARGET_MARGIN_PERCENTAGE = target_margin_percentages[strategy_name]
         order_data = {'buy_date': date,
             'buy_order_id': buy_order_id,
+            'strategy': strategy_name,
             'product_id': product_id,
             'base_currency': base_currency, 
             'quote_currency': quote_currency,
@@ -511,16 +2540,27 @@ def place_sell_orders():
             'sell_order_id': ''}
         fire_doc_id = fire_create_order_record(doc_id = buy_order_id, doc_data = order_data)
         
-        # 2. Initiate Stop Limit sell order with respective targeet margin: 
-        base_increment = cb_get_product_info(product_id)['base_increment']
-        base_decimals = get_decimal_places(base_increment)
-        quote_increment = cb_get_product_info(product_id)['quote_increment']
-        quote_decimals = get_decimal_places(quote_increment)
-        target_price = round(buy_base_price * (1 + TARGET_MARGIN_PERCENTAGE/100), quote_decimals)
+        # 2. Prepare Stop Limit sell order with respective targeet margin: 
+        base_decimals, quote_decimals = cb_get_product_precision(product_id)
+        target_price = round(get_sell_target_prices(buy_base_price, TARGET_MARGIN_PERCENTAGE), quote_decimals)
         buy_base_size = round(buy_base_size, base_decimals)
-        sell_order_id = cb_create_stop_limit_sell_order(product_id=product_id,base_size=buy_base_size,stop_price=target_price,limit_price=target_price)
-        
-        # 3. Update Firestore document with sell order data:
+        sell_orders.append((buy_order_id, quote_currency, target_price, TARGET_MARGIN_PERCENTAGE, (cb_create_stop_limit_sell_order, {'product_id': product_id,
+            'base_size': buy_base_size,
+            'stop_price': target_price,
+            'limit_price': target_price,
+            # One sell order per buy order, also if the Firestore update of an earlier run failed
+            'client_order_id': cb_get_client_order_id(product_id, 'SELL', buy_order_id)})))
+
+    # 3. Place all sell orders at the same time
+    with metrics_span('sell_orders', orders=len(sell_orders)):
+        sell_order_results = cb_execute_orders([sell_order for _, _, _, _, sell_order in sell_orders])
+
+    # 4. Update Firestore documents with sell order data:
+    for (buy_order_id, quote_currency, target_price, TARGET_MARGIN_PERCENTAGE, _), order_result in zip(sell_orders, sell_order_results):
+        if not order_result['success']:
+            order_results.append(f'Stop limit sell order for equivalent market buy order {buy_order_id} failed (client order id {order_result["client_order_id"]}): {order_result["error"]}; it will be retried in one of the next runs')
+            continue
+        sell_order_id = order_result['order_id']
         fire_doc_id = fire_create_order_record(doc_id=buy_order_id,doc_data={'sell_order_id': sell_order_id,
             'sell_base_target_price': target_price,
             'sell_order_created_at': datetime.now(),
@@ -528,18 +2568,67 @@ def place_sell_orders():
         order_results.append(f'Stop limit sell order {sell_order_id} for equivalent market buy order {buy_order_id} created with target price {target_price}{quote_currency} (target margin: {TARGET_MARGIN_PERCENTAGE}%); Firestore document updated ({fire_doc_id})')
     return pd.DataFrame(order_results)
 
-def cb_create_market_order(product_id, quote_size):
+# Namespace of the deterministic client_order_ids (see cb_get_client_order_id())
+CB_CLIENT_ORDER_NAMESPACE = 'investment-bot.coinbase-orders'
+
+def cb_get_client_order_id(product_id, side, decision_key):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
 
-    # Creates a market buy order for the given product_id (e.g. BTC-USD)
-    # It will invest the amount of quote_size for this order (e.g. 100 USD)
+    # Returns a deterministic client_order_id for the given product, side and decision key (e.g.
+    # the minute of the buy decision or the buy order id of a sell order). Coinbase does not
+    # create a second order for a known client_order_id but returns the existing one, so an
+    # order can be retried (also in a later run) without being placed twice.
 
     import uuid
+    return str(uuid.uuid5(uuid.uuid5(uuid.NAMESPACE_DNS, CB_CLIENT_ORDER_NAMESPACE), f'{product_id}|{side}|{decision_key}'))
+
+def cb_submit_order(payload):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Submits the given order payload to Coinbase and returns a result dictionary with
+    # product_id, side, client_order_id, order_id (None if the order failed), success, error and
+    # latency_seconds. Transient failures (429, 5xx, connection errors) are retried, which is safe
+    # since the client_order_id of the payload identifies the order.
+
     import json
-    client_order_id = uuid.uuid4()
+    import time
     url_path = '/api/v3/brokerage/orders'
+    started_at = time.monotonic()
+    result = {'product_id': payload['product_id'],
+        'side': payload['side'],
+        'client_order_id': payload['client_order_id'],
+        'order_id': None,
+        'success': False,
+        'error': None}
+    try:
+        response = cb_auth_post_connect(url_path=url_path, body=payload, priority=CB_PRIORITY_ORDER, idempotent=True)
+        json_orders = json.loads(response.text)
+        if json_orders.get('success', True) is False:
+            result['error'] = json_orders.get('failure_reason') or json.dumps(json_orders.get('error_response'))
+        else:
+            result['order_id'] = json_orders.get('order_id') or json_orders['success_response']['order_id']
+            result['success'] = True
+    except Exception as e:
+        result['error'] = repr(e)
+    result['latency_seconds'] = time.monotonic() - started_at
+    return result
+
+def cb_create_market_order(product_id, quote_size, client_order_id=None):
+
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
+
+    # Creates a market buy order for the given product_id (e.g. BTC-USD)
+    # It will invest the amount of quote_size for this order (e.g. 100 USD)
+    # Returns the order result of cb_submit_order(). Without a client_order_id a random one is used.
+
+    import uuid
+    if client_order_id is None:
+        client_order_id = str(uuid.uuid4())
     payload = {
         'product_id': product_id,
         'client_order_id': str(client_order_id),
@@ -551,26 +2640,20 @@ def cb_create_market_order(product_id, quote_size):
             }
         }
     }
-    try:
-        response = cb_auth_post_connect(url_path=url_path, body=payload)
-        json_orders = json.loads(response.text)
-        order_id = json_orders['order_id']
-        return order_id
-    except Exception as e:
-        return e
+    return cb_submit_order(payload)
 
-def cb_create_stop_limit_sell_order(product_id, base_size, stop_price, limit_price):
+def cb_create_stop_limit_sell_order(product_id, base_size, stop_price, limit_price, client_order_id=None):
 
-    # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Version: 1.02
+    # Last Updated: Oct-17-2026
 
     # Creates a stop limit sell order for the given product_id (e.g. BTC-USD)
     # It will spend the amount given in base_size (e.g. 0.01 BTC)
+    # Returns the order result of cb_submit_order(). Without a client_order_id a random one is used.
 
     import uuid
-    import json
-    client_order_id = uuid.uuid4()
-    url_path = '/api/v3/brokerage/orders'
+    if client_order_id is None:
+        client_order_id = str(uuid.uuid4())
     payload = {
         'product_id': product_id,
         'client_order_id': str(client_order_id),
@@ -584,31 +2667,383 @@ def cb_create_stop_limit_sell_order(product_id, base_size, stop_price, limit_pri
             }
         }
     }
-    try:
-        response = cb_auth_post_connect(url_path=url_path, body=payload)
-        json_orders = json.loads(response.text)
-        order_id = json_orders['order_id']
-        return order_id
-    except Exception as e:
-        return e
+    return cb_submit_order(payload)
 
-def investment_bot(request):
+def cb_execute_orders(orders):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Submits the given orders concurrently (at most CB_MAX_CONCURRENT_REQUESTS at a time, see
+    # cb_fetch_concurrent()) and returns their order results in the same order. Each order is a
+    # tuple of the create function (cb_create_market_order or cb_create_stop_limit_sell_order)
+    # and its keyword arguments. The rate limit scheduler still applies, but orders are served
+    # before any waiting data request.
+
+    return cb_fetch_concurrent(lambda order: order[0](**order[1]), orders)
+
+def cb_ws_subscribe_message(channel, product_ids):
 
     # Version: 1.00
-    # Last Updated: Feb-06-2023
+    # Last Updated: Oct-17-2026
+
+    # Returns the signed subscribe message of the Coinbase Advanced Trade WebSocket feed for the
+    # given channel (e.g. ticker, user or heartbeats) and product ids
+
+    import hmac
+    import hashlib
+    import time
+    api_key, secret_key = cb_get_credentials()
+    timestamp = str(int(time.time()))
+    message = timestamp + channel + ','.join(product_ids)
+    signature = hmac.new(secret_key, message.encode('utf-8'), digestmod=hashlib.sha256).digest()
+    return {'type': 'subscribe',
+        'product_ids': list(product_ids),
+        'channel': channel,
+        'api_key': api_key,
+        'timestamp': timestamp,
+        'signature': signature.hex()}
+
+# State of the streaming worker (see bot_stream_worker()). Per product it keeps the last price
+# and the window of the previous daily closes for the lower Bollinger band: 'window' holds count,
+# mean and M2 (sum of squared deviations) of the BOLLINGER_PERIODS-1 completed daily closes, so
+# the band of the current day is recalculated from every new price in constant time.
+STREAM = {'products': {}, 'day': None, 'sequence_num': None, 'sell_pending_since': None,
+    'stats': collections.Counter()}
+BOLLINGER_PERIODS = 20
+
+def get_streaming_bb_low(window, price):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Returns the lower Bollinger band of the current day for the given price (the close of the
+    # still open daily candle) and the window of previous daily closes, i.e. the same value as the
+    # bb_low of the newest DAILY row of add_indicators(). Returns nan if the window is incomplete.
+
+    import math
+    if window is None or window['count'] < BOLLINGER_PERIODS - 1:
+        return float('nan')
+    count = window['count'] + 1
+    mean = window['mean'] + (price - window['mean']) / count
+    m2 = window['m2'] + (price - window['mean']) * (price - mean)
+    bb_low = get_bollinger_bands(mean, math.sqrt(max(m2, 0) / (count - 1)))[0]
+    return bb_low
+
+def stream_load_indicator_windows(quote_currency, crypto_currencies):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Loads the daily candles of the given currencies and stores the window of the last
+    # BOLLINGER_PERIODS-1 completed daily closes per product in STREAM. Called on every
+    # (re)connect and when a new UTC day starts.
+
+    import time
+    from datetime import timedelta
+    import numpy as np
+    end_date = cb_get_server_time()
+    start_date = (end_date - timedelta(days=BOLLINGER_PERIODS + 5)).isoformat()
+    today_start = int(time.time()) // 86400 * 86400
+    def get_window(currency):
+        candles = cb_get_historic_data(start_date, end_date, 'DAILY', quote_currency, currency)
+        closes = candles['close'][candles['time'] < today_start][-(BOLLINGER_PERIODS - 1):]
+        if len(closes) == 0:
+            return {'count': 0, 'mean': 0.0, 'm2': 0.0}
+        return {'count': len(closes), 'mean': float(np.mean(closes)), 'm2': float(np.sum((closes - np.mean(closes)) ** 2))}
+    windows = cb_fetch_concurrent(get_window, crypto_currencies)
+    for currency, window in zip(crypto_currencies, windows):
+        product = STREAM['products'].setdefault(currency+'-'+quote_currency, {'currency': currency, 'price': None, 'evaluated_minute': None})
+        product['window'] = window
+    STREAM['day'] = today_start // 86400
+
+# The frozen server clock (cb_start_run_clock()), the open Firestore batch (fire_start_batch())
+# and the run metrics (metrics_start_run()) exist once per process. Overlapping runs (concurrent
+# requests of the same instance or a streaming run next to a scheduled one) would reset each
+# other's state, so investment_bot() and stream_run() hold the run lock and overlapping runs
+# wait for each other.
+BOT_RUN = {'lock': threading.Lock()}
+
+def stream_run(span_name, function):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Runs the given function like investment_bot() runs its phases: with a frozen server clock,
+    # batched Firestore writes and its own metrics summary. The result lines are printed.
+
+    with BOT_RUN['lock']:
+        metrics_start_run()
+        cb_start_run_clock()
+        try:
+            fire_start_batch()
+            try:
+                with metrics_span(span_name):
+                    df_results = function()
+            finally:
+                with metrics_span('firestore_writes'):
+                    fire_commit_batch()
+        finally:
+            cb_stop_run_clock()
+            metrics_finish_run()
+    for result in df_results.get(0, []):
+        print(result)
+    return df_results
+
+def stream_on_price(product_id, price):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Updates the price of the given product and returns its lower Bollinger band of the day in
+    # case the buy rule of make_investment_decision() has to be applied, i.e. the price is below
+    # the band. While the price stays below the band, the rule is applied at most once per minute
+    # (the TradingView signal is a 1-minute signal and the client_order_ids of buy orders are
+    # derived from the minute anyway). Returns None otherwise.
+
+    product = STREAM['products'].get(product_id)
+    if product is None:
+        return None
+    product['price'] = price
+    bb_low = get_streaming_bb_low(product.get('window'), price)
+    if not price < bb_low:
+        return None
+    minute = cb_get_server_time().strftime('%Y-%m-%dT%H:%M')
+    if product['evaluated_minute'] == minute:
+        return None
+    product['evaluated_minute'] = minute
+    return bb_low
+
+def stream_make_investment_decisions(bb_lows, strategies):
+
+    # Version: 1.01
+    # Last Updated: Oct-17-2026
+
+    # Applies make_investment_decision() of every strategy to the given products (product_id ->
+    # lower Bollinger band) with their streamed prices. The signals and last buy fills of all
+    # products are loaded in one go, so a ticker snapshot after a (re)connect is handled in one run.
+
+    import json
+    import os
+    import pandas as pd
+    STREAM['stats']['decisions'] += len(bb_lows)
+    currencies = [STREAM['products'][product_id]['currency'] for product_id in bb_lows]
+    def decide():
+        server_time_now = cb_get_server_time()
+        snapshot = {'quote_currency': os.environ.get('QUOTE_CURRENCY'),
+            'server_time': server_time_now,
+            'bb_lows': pd.Series(list(bb_lows.values()), index=currencies),
+            'signals': get_trading_view_signals([symbol for symbol in json.loads(os.environ['TRADING_VIEW_SYMBOLS']) if symbol[0] in currencies]),
+            '24h_stats': pd.DataFrame({'last': [STREAM['products'][product_id]['price'] for product_id in bb_lows]}, index=currencies),
+            'last_buy_fill_dates': bot_get_last_buy_fill_dates(strategies, list(bb_lows), server_time_now)}
+        return pd.concat([make_investment_decision(dict(strategy, crypto_currencies=[currency for currency in currencies if currency in strategy['crypto_currencies']]), snapshot)
+            for strategy in strategies if set(currencies) & set(strategy['crypto_currencies'])], ignore_index=True)
+    return stream_run('buy_decision', decide)
+
+def stream_handle_message(message, strategies):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Handles one message of the WebSocket feed: ticker prices go to stream_on_price() and the
+    # products below their band to stream_make_investment_decisions(), filled buy orders of the
+    # user channel schedule a sell reconciliation. The sequence_num of the messages
+    # increases by one per connection; in case messages were lost, a sell reconciliation is
+    # scheduled as well since a fill event might have been among them (prices are refreshed by
+    # the next ticker anyway).
+
+    import time
+    sequence_num = message.get('sequence_num')
+    if sequence_num is not None:
+        if STREAM['sequence_num'] is not None and sequence_num != STREAM['sequence_num'] + 1:
+            STREAM['stats']['sequence_gaps'] += 1
+            if STREAM['sell_pending_since'] is None:
+                STREAM['sell_pending_since'] = time.monotonic()
+        STREAM['sequence_num'] = sequence_num
+    channel = message.get('channel')
+    bb_lows = {}
+    for event in message.get('events', []):
+        if channel == 'ticker':
+            for ticker in event.get('tickers', []):
+                STREAM['stats']['tickers'] += 1
+                bb_low = stream_on_price(ticker['product_id'], float(ticker['price']))
+                if bb_low is not None:
+                    bb_lows[ticker['product_id']] = bb_low
+        elif channel == 'user' and event.get('type') == 'update':
+            for order in event.get('orders', []):
+                if order.get('status') == 'FILLED' and order.get('order_side') == 'BUY':
+                    STREAM['stats']['fill_events'] += 1
+                    if STREAM['sell_pending_since'] is None:
+                        STREAM['sell_pending_since'] = time.monotonic()
+    if bb_lows:
+        stream_make_investment_decisions(bb_lows, strategies)
+
+def bot_stream_worker(stop_event=None):
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Long-running alternative to the scheduled investment_bot(): subscribes to the ticker, user
+    # and heartbeats channels of the Coinbase WebSocket feed (CB_WEBSOCKET_API_URL) for the
+    # currencies of all strategies. Prices and the lower Bollinger bands are kept in memory and
+    # the buy rule runs as soon as a price drops below its band (see stream_on_price()). Sell
+    # orders are placed by place_sell_orders() once buy orders are filled; fill events arriving
+    # within BOT_STREAM_SELL_DELAY_SECONDS are handled in one go.
+    # On every (re)connect the indicator windows are reloaded and a sell reconciliation runs, so
+    # fills missed while disconnected are caught up. Without any message (the heartbeats channel
+    # sends one per second) for BOT_STREAM_HEARTBEAT_TIMEOUT_SECONDS the connection is considered
+    # dead and reopened with backoff. Runs until the given threading.Event is set and returns the
+    # worker statistics.
+
+    import json
+    import os
+    import time
+    import websocket
+    if stop_event is None:
+        stop_event = threading.Event()
+    heartbeat_timeout = float(os.environ.get('BOT_STREAM_HEARTBEAT_TIMEOUT_SECONDS') or 30)
+    sell_delay = float(os.environ.get('BOT_STREAM_SELL_DELAY_SECONDS') or 2)
+    strategies = bot_get_strategies()
+    quote_currency = os.environ.get('QUOTE_CURRENCY')
+    crypto_currencies = list(dict.fromkeys(currency for strategy in strategies for currency in strategy['crypto_currencies']))
+    product_ids = [currency+'-'+quote_currency for currency in crypto_currencies]
+    attempt = 0
+    while not stop_event.is_set():
+        ws = None
+        try:
+            ws = websocket.create_connection(cb_get_api_url('websocket'), timeout=cb_get_timeout()[0])
+            # Short receive timeout to check stop_event, the heartbeat and pending sells regularly
+            ws.settimeout(min(1.0, heartbeat_timeout))
+            for channel in ['heartbeats', 'ticker', 'user']:
+                ws.send(json.dumps(cb_ws_subscribe_message(channel, product_ids)))
+            STREAM['sequence_num'] = None
+            STREAM['stats']['connects'] += 1
+            stream_load_indicator_windows(quote_currency, crypto_currencies)
+            STREAM['sell_pending_since'] = time.monotonic() - sell_delay
+            last_message_at = time.monotonic()
+            while not stop_event.is_set():
+                try:
+                    data = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    data = None
+                now = time.monotonic()
+                if data:
+                    last_message_at = now
+                    attempt = 0
+                    STREAM['stats']['messages'] += 1
+                    stream_handle_message(json.loads(data), strategies)
+                elif now - last_message_at > heartbeat_timeout:
+                    raise TimeoutError(f'no message from the WebSocket feed within {heartbeat_timeout}s')
+                if int(time.time()) // 86400 != STREAM['day']:
+                    # A new daily candle started, so yesterday's close joins the window
+                    stream_load_indicator_windows(quote_currency, crypto_currencies)
+                if STREAM['sell_pending_since'] is not None and now - STREAM['sell_pending_since'] >= sell_delay:
+                    STREAM['sell_pending_since'] = None
+                    STREAM['stats']['sell_runs'] += 1
+                    stream_run('sell_reconciliation', lambda: place_sell_orders(strategies))
+        except Exception as err:
+            if stop_event.is_set():
+                break
+            attempt += 1
+            STREAM['stats']['reconnects'] += 1
+            delay = cb_get_retry_delay(None, attempt)
+            print(f'WebSocket feed failed ({err!r}); reconnecting in {delay:.1f}s')
+            stop_event.wait(delay)
+        finally:
+            if ws is not None:
+                ws.close()
+    return dict(STREAM['stats'])
+
+def bot_warm_up():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Does the expensive one-off work of a cold start: imports the heavy libraries, creates the
+    # Firestore client and opens the connection to Coinbase (by syncing the server clock).
+    # Returns the seconds spent per step. Errors are only printed since the step is retried
+    # once it is really needed.
+
+    import time
+    durations = {}
+    def import_libraries():
+        import numpy
+        import pandas
+        import tradingview_ta
+    for step, function in [('imports', import_libraries), ('firestore_client', fire_get_client), ('server_clock', cb_sync_server_clock)]:
+        started = time.perf_counter()
+        try:
+            function()
+        except Exception as err:
+            print(f'Warm up step {step} failed: {err}')
+        durations[step] = time.perf_counter() - started
+    return durations
+
+def bot_start_prewarm():
+
+    # Version: 1.00
+    # Last Updated: Oct-17-2026
+
+    # Runs bot_warm_up() in a background thread in case BOT_PREWARM is set to true, so that the
+    # cold start work overlaps with the time until the first request arrives
+
+    if os.environ.get('BOT_PREWARM', '').lower() == 'true':
+        prewarm_thread = threading.Thread(target=bot_warm_up, name='bot-prewarm', daemon=True)
+        prewarm_thread.start()
+        return prewarm_thread
+
+def investment_bot(request):
+
+    # Version: 1.04
+    # Last Updated: Oct-17-2026
 
     # The main function that is invoked on GCP. It connects to coinbase via authentication using
     # the provided API key and secret. 
 
-    # make_investment_decision(): It then loads historic data for all chosen crypto currencies.
-    # It then checks if buy conditions are met per defined currency. In case a buy
-    # condition is met, a market order will be issued. A record is created in Firestore for each 
-    # market order buy.
+    # get_market_snapshot(): It then loads historic data for the crypto currencies of all
+    # strategies (see bot_get_strategies()) once.
+
+    # make_investment_decision(): For every strategy, it then checks if buy conditions are met per
+    # defined currency. In case a buy condition is met, a market order will be issued. A record
+    # is created in Firestore for each market order buy.
 
     # place_sell_orders(): It will then check in Firestore which purchase orders do not yet have a
     # an order id for the sales operation. For those market orders, an equivalent sales order will
     # be created in coinbase taking into consideration the defined target margin. 
 
-    df_buy_order_results = make_investment_decision()
-    df_sell_order_results = place_sell_orders()
-    return df_buy_order_results.to_json(orient='index')+df_sell_order_results.to_json(orient='index') , 200
\ No newline at end of file
+    # Concurrent requests of the same instance are run one after the other (see BOT_RUN).
+
+    import pandas as pd
+    with BOT_RUN['lock']:
+        # The timing of every stage is summarized at the end of the run (see metrics_finish_run())
+        metrics_start_run()
+        cb_start_run_clock()
+        try:
+            # Firestore records are collected per phase and written together at the end of the phase
+            strategies = bot_get_strategies()
+            fire_start_batch()
+            try:
+                with metrics_span('market_data', strategies=len(strategies)):
+                    snapshot = get_market_snapshot(strategies)
+                with metrics_span('buy_decision'):
+                    df_buy_order_results = pd.concat([make_investment_decision(strategy, snapshot) for strategy in strategies], ignore_index=True)
+            finally:
+                with metrics_span('firestore_writes', phase='buy'):
+                    fire_commit_batch()
+            fire_start_batch()
+            try:
+                with metrics_span('sell_reconciliation'):
+                    df_sell_order_results = place_sell_orders(strategies)
+            finally:
+                with metrics_span('firestore_writes', phase='sell'):
+                    fire_commit_batch()
+        finally:
+            cb_stop_run_clock()
+            metrics_finish_run()
+    return df_buy_order_results.to_json(orient='index')+df_sell_order_results.to_json(orient='index') , 200
+
+bot_start_prewarm()
+
+if __name__ == '__main__':
+    # python main.py runs the long-running streaming worker instead of the scheduled function
+    bot_stream_worker()